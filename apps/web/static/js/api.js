@@ -0,0 +1,44 @@
+// Shared by every page; load it before the page's own script.
+
+const API_BASE = (() => {
+  if (window.API_BASE) return window.API_BASE;
+  const { protocol, hostname, port } = window.location;
+  // use same host to keep cookies same-site in dev
+  if (port === "5173") return `${protocol}//${hostname}:4000`;
+  return "/api";
+})();
+
+function api(path) {
+  if (!path.startsWith("/")) return `${API_BASE}/${path}`;
+  return `${API_BASE}${path}`;
+}
+
+// Access tokens are short-lived: on a 401, trade the refresh cookie for a new
+// pair once (shared by concurrent callers) and retry the request.
+const rawFetch = window.fetch.bind(window);
+let refreshing = null;
+window.fetch = async (input, init) => {
+  const res = await rawFetch(input, init);
+  const url = typeof input === "string" ? input : input.url;
+  if (res.status !== 401 || url.includes("/auth/login") || url.includes("/auth/refresh")) return res;
+  refreshing =
+    refreshing ||
+    rawFetch(api("/auth/refresh"), { method: "POST", credentials: "include" })
+      .then((r) => r.ok)
+      .catch(() => false)
+      .finally(() => {
+        refreshing = null;
+      });
+  return (await refreshing) ? rawFetch(input, init) : res;
+};
+
+// One Idempotency-Key per action (path + body), kept until the action
+// succeeds, so a retry after a dropped response is not processed twice.
+const idempotencyKeys = new Map();
+function idempotencyKey(action) {
+  if (!idempotencyKeys.has(action)) {
+    const key = window.crypto?.randomUUID?.() || `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    idempotencyKeys.set(action, key);
+  }
+  return idempotencyKeys.get(action);
+}
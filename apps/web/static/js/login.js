@@ -8,19 +8,6 @@ function showMessage(text, type) {
   messageBox.style.display = "block";
 }
 
-const API_BASE = (() => {
-  if (window.API_BASE) return window.API_BASE;
-  const { protocol, hostname, port } = window.location;
-  // use same host to keep cookies same-site in dev
-  if (port === "5173") return `${protocol}//${hostname}:4000`;
-  return "/api";
-})();
-
-function api(path) {
-  if (!path.startsWith("/")) return `${API_BASE}/${path}`;
-  return `${API_BASE}${path}`;
-}
-
 async function checkSession() {
   try {
     const res = await fetch(api("/auth/me"), { credentials: "include" });
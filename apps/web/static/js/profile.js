@@ -1,15 +1,3 @@
-const API_BASE = (() => {
-  if (window.API_BASE) return window.API_BASE;
-  const { protocol, hostname, port } = window.location;
-  if (port === "5173") return `${protocol}//${hostname}:4000`;
-  return "/api";
-})();
-
-function api(path) {
-  if (!path.startsWith("/")) return `${API_BASE}/${path}`;
-  return `${API_BASE}${path}`;
-}
-
 const els = {
   logout: document.querySelector("#logoutBtn"),
   avatar: document.querySelector("#profile-avatar"),
@@ -230,8 +218,11 @@ function renderProfile(data) {
 
 async function fetchProfile() {
   try {
+    // revalidate with the cached ETag: an unchanged profile comes back as a
+    // bodiless 304 and the browser hands us the cached copy
     const res = await fetch(api("/students/profile"), {
       credentials: "include",
+      cache: "no-cache",
     });
     if (res.status === 401) {
       window.location.href = "/login.html";
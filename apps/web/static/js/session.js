@@ -1,14 +1,3 @@
-const API_BASE = (() => {
-  const { protocol, hostname, port } = window.location;
-  if (port === "5173") return `${protocol}//${hostname}:4000`;
-  return "/api";
-})();
-
-function api(path) {
-  if (!path.startsWith("/")) return `${API_BASE}/${path}`;
-  return `${API_BASE}${path}`;
-}
-
 function qs(k) {
   return new URLSearchParams(window.location.search).get(k);
 }
@@ -39,27 +28,35 @@ function setMsg(el, text, error = false) {
   el.style.color = error ? "#fca5a5" : "#9ca3af";
 }
 
+// One round trip for the screen: the session with its booking status plus
+// the candidates for the reschedule picker.
 async function fetchSession(id) {
-  const res = await fetch(api(`/students/session/${id}`), { credentials: "include" });
+  const res = await fetch(api(`/students/sessions?ids=${encodeURIComponent(id)}&alternatives=20`), {
+    credentials: "include",
+  });
   if (res.status === 401) {
     window.location.href = "/login.html";
     return null;
   }
   if (!res.ok) return null;
-  return res.json();
+  const payload = await res.json();
+  return { detail: payload.sessions?.[0] || null, alternatives: payload.alternatives?.[id] || [] };
 }
 
 async function mutate(path, body) {
+  const payload = JSON.stringify(body);
+  const action = `${path} ${payload}`;
   const res = await fetch(api(path), {
     method: "POST",
     credentials: "include",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify(body),
+    headers: { "Content-Type": "application/json", "Idempotency-Key": idempotencyKey(action) },
+    body: payload,
   });
   if (res.status === 401) {
     window.location.href = "/login.html";
     return null;
   }
+  if (res.ok) idempotencyKeys.delete(action);
   return res.json();
 }
 
@@ -101,22 +98,6 @@ function populateRescheduleSelect(matches) {
   });
 }
 
-async function loadReplacements(code, excludeId) {
-  try {
-    const res = await fetch(api("/sessions/browse"), { credentials: "include" });
-    if (!res.ok) return;
-    const payload = await res.json();
-    const list = payload.sessions || [];
-    let matches = list.filter((x) => x.code === code && x.id !== excludeId);
-    if (!matches.length) {
-      matches = list.filter((x) => x.id !== excludeId).slice(0, 30);
-    }
-    populateRescheduleSelect(matches);
-  } catch (err) {
-    console.error(err);
-  }
-}
-
 async function init() {
   const id = qs("id");
   if (!id) {
@@ -125,9 +106,8 @@ async function init() {
   }
   currentSessionId = id;
   const data = await fetchSession(currentSessionId);
-  const sessionData = data?.session || data;
-  renderSession(data);
-  loadReplacements(sessionData?.code, currentSessionId);
+  renderSession(data?.detail);
+  populateRescheduleSelect(data?.alternatives || []);
 
   els.cancelForm?.addEventListener("submit", async (e) => {
     e.preventDefault();
@@ -150,11 +130,12 @@ async function init() {
       setMsg(els.reschedMsg, newSessionId ? "Rescheduled to a new session." : "Reschedule submitted.");
       if (newSessionId) {
         currentSessionId = newSessionId;
-        const nextSession = await fetchSession(newSessionId);
-        renderSession(nextSession || res.booking);
-        const nextCode = (nextSession?.session || nextSession || res.booking)?.code;
-        loadReplacements(nextCode, newSessionId);
+        const next = await fetchSession(newSessionId);
+        renderSession(next?.detail || res.booking);
+        populateRescheduleSelect(next?.alternatives || []);
       }
+    } else if (res?.conflicts?.length) {
+      setMsg(els.reschedMsg, `That time clashes with ${res.conflicts[0].conflictsWith.join(", ")}.`, true);
     } else {
       setMsg(els.reschedMsg, "Failed to reschedule.", true);
     }
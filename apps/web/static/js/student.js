@@ -1,15 +1,3 @@
-const API_BASE = (() => {
-  if (window.API_BASE) return window.API_BASE;
-  const { protocol, hostname, port } = window.location;
-  if (port === "5173") return `${protocol}//${hostname}:4000`;
-  return "/api";
-})();
-
-function api(path) {
-  if (!path.startsWith("/")) return `${API_BASE}/${path}`;
-  return `${API_BASE}${path}`;
-}
-
 const DAY_LABELS = ["MON", "TUE", "WED", "THU", "FRI", "SAT"];
 const state = {
   query: "",
@@ -24,6 +12,8 @@ const state = {
   sidebar: null,
   activeConvId: null,
   activeConvTitle: "",
+  // cursor for the page before the oldest loaded message; null at the start
+  messagesBefore: null,
   messages: [],
 };
 
@@ -194,7 +184,8 @@ function renderCart() {
   });
 }
 
-function renderMessages() {
+function renderMessages({ keepScroll = false } = {}) {
+  const fromBottom = els.messageList.scrollHeight - els.messageList.scrollTop;
   els.messageList.innerHTML = "";
   if (!state.activeConvId) {
     const div = document.createElement("div");
@@ -204,6 +195,14 @@ function renderMessages() {
     return;
   }
 
+  if (state.messagesBefore) {
+    const older = document.createElement("button");
+    older.className = "btn small ghost";
+    older.textContent = "Load older messages";
+    older.addEventListener("click", loadOlderMessages);
+    els.messageList.appendChild(older);
+  }
+
   state.messages.forEach((m) => {
     const bubble = document.createElement("div");
     const self = state.sidebar?.me?.id === m.sender.id;
@@ -212,6 +211,11 @@ function renderMessages() {
     els.messageList.appendChild(bubble);
   });
 
+  if (keepScroll) {
+    // older messages went in above; keep the ones being read in place
+    els.messageList.scrollTop = els.messageList.scrollHeight - fromBottom;
+    return;
+  }
   // keep view at bottom
   els.messageList.scrollTop = els.messageList.scrollHeight;
   const msgWindow = document.querySelector(".msg-window");
@@ -345,6 +349,7 @@ async function openConversation(conv) {
   state.activeConvTitle = conv.title;
   els.activeTitle.textContent = conv.title;
   state.messages = [];
+  state.messagesBefore = null;
   renderMessages();
 
   try {
@@ -354,6 +359,7 @@ async function openConversation(conv) {
     if (res.ok) {
       const data = await res.json();
       state.messages = data.messages || [];
+      state.messagesBefore = data.before ?? null;
       renderMessages();
     }
   } catch (err) {
@@ -361,19 +367,43 @@ async function openConversation(conv) {
   }
 }
 
+// history comes a page at a time, newest first; walk back with `before`
+async function loadOlderMessages() {
+  const convId = state.activeConvId;
+  const before = state.messagesBefore;
+  if (!convId || before == null) return;
+  try {
+    const res = await fetch(api(`/messaging/conversations/${convId}/messages?before=${before}`), {
+      credentials: "include",
+    });
+    if (!res.ok || state.activeConvId !== convId) return;
+    const data = await res.json();
+    state.messages = [...(data.messages || []), ...state.messages];
+    state.messagesBefore = data.before ?? null;
+    renderMessages({ keepScroll: true });
+  } catch (err) {
+    console.error(err);
+  }
+}
+
 async function sendMessage() {
   if (!state.activeConvId) return;
   const content = els.messageInput.value.trim();
   if (!content) return;
 
+  const action = `send ${state.activeConvId} ${content}`;
   try {
     const res = await fetch(api(`/messaging/conversations/${state.activeConvId}/messages`), {
       method: "POST",
       credentials: "include",
-      headers: { "Content-Type": "application/x-www-form-urlencoded" },
+      headers: {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Idempotency-Key": idempotencyKey(action),
+      },
       body: new URLSearchParams({ content }).toString(),
     });
     if (res.ok) {
+      idempotencyKeys.delete(action);
       const data = await res.json();
       if (data.message) {
         state.messages.push(data.message);
@@ -491,16 +521,28 @@ function attachEvents() {
       alert("No sessions selected.");
       return;
     }
+    const payload = JSON.stringify({ sessionIds: state.cart });
+    const action = `register ${payload}`;
     fetch(api("/students/register"), {
       method: "POST",
       credentials: "include",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ sessionIds: state.cart }),
+      headers: { "Content-Type": "application/json", "Idempotency-Key": idempotencyKey(action) },
+      body: payload,
     })
-      .then((res) => res.json())
-      .then(() => {
-        alert("Sessions registered.");
-        state.cart.forEach((id) => state.registered.add(id));
+      .then((res) => {
+        if (!res.ok) throw new Error(`register failed: ${res.status}`);
+        idempotencyKeys.delete(action);
+        return res.json();
+      })
+      .then((data) => {
+        const conflicts = data.conflicts || [];
+        if (conflicts.length) {
+          const lines = conflicts.map((c) => `${c.sessionId} clashes with ${c.conflictsWith.join(", ")}`);
+          alert(`Some sessions were not registered:\n${lines.join("\n")}`);
+        } else {
+          alert("Sessions registered.");
+        }
+        (data.added || []).forEach((b) => state.registered.add(b.sessionId));
         state.cart = [];
         renderCart();
         renderCourses();
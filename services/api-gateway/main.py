@@ -1,10 +1,29 @@
+import asyncio
+import importlib.util
 import os
+import sys
+from contextlib import AsyncExitStack, asynccontextmanager
+from types import ModuleType
+from typing import Dict, Optional
 
 import httpx
-import jwt
-from fastapi import FastAPI, HTTPException, Request, Response
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import FastAPI, Request, Response
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# services/ holds the shared `common` package
+SERVICES_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICES_ROOT not in sys.path:
+    sys.path.insert(0, SERVICES_ROOT)
+
+from common.auth import COOKIE_NAME, Claims, add_cors, verify_token  # noqa: E402
+from common.bulkhead import Bulkhead, Overloaded  # noqa: E402
+from common.compression import CompressionMiddleware, new_compression_stats  # noqa: E402
+from common.profiling import add_profiling  # noqa: E402
+from common.responses import FastJSONResponse  # noqa: E402
+from common.revocation import RevocationList  # noqa: E402
+from common.tracing import add_tracing, span  # noqa: E402
+from common.upstream import close_upstream_clients, upstream_client  # noqa: E402
 
 
 AUTH_UPSTREAM = os.getenv("AUTH_UPSTREAM", "http://localhost:4010")
@@ -12,53 +31,226 @@ STUDENTS_UPSTREAM = os.getenv("STUDENTS_UPSTREAM", "http://localhost:4011")
 USERS_UPSTREAM = os.getenv("USERS_UPSTREAM", "http://localhost:4015")
 SESSIONS_UPSTREAM = os.getenv("SESSIONS_UPSTREAM", "http://localhost:4016")
 MESSAGES_UPSTREAM = os.getenv("MESSAGES_UPSTREAM", "http://localhost:4017")
-JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
-ALGORITHM = "HS256"
-COOKIE_NAME = "access_token"
+REFRESH_COOKIE_NAME = "refresh_token"
+# how often each worker copies new revocations from the auth service
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "1"))
+# "proxy" forwards over HTTP to the *_UPSTREAM URLs; "monolith" imports every
+# service app into this process and dispatches to it as an ASGI sub-app.
+GATEWAY_MODE = os.getenv("GATEWAY_MODE", "proxy").strip().lower()
+# answer /auth/me from the verified token's claims instead of asking the auth
+# service; per request, `X-Auth-Validate: upstream` forces the upstream check
+AUTH_ME_FROM_TOKEN = os.getenv("AUTH_ME_FROM_TOKEN", "1") != "0"
+TOKEN_PROFILE_CLAIMS = ("email", "role", "name")
+# per-upstream bulkheads: in-flight limit, wait queue length, longest wait,
+# and the queue delay past which new arrivals are shed (see common.bulkhead)
+BULKHEAD_LIMIT = int(os.getenv("BULKHEAD_LIMIT", "64"))
+BULKHEAD_QUEUE = int(os.getenv("BULKHEAD_QUEUE", "256"))
+BULKHEAD_MAX_WAIT_MS = float(os.getenv("BULKHEAD_MAX_WAIT_MS", "1000"))
+BULKHEAD_TARGET_WAIT_MS = float(os.getenv("BULKHEAD_TARGET_WAIT_MS", "50"))
+# per-upstream limit overrides, e.g. "students=32,auth=16"
+BULKHEAD_LIMITS = dict(
+    (name.strip(), int(limit)) for name, _, limit in
+    (item.partition("=") for item in os.getenv("BULKHEAD_LIMITS", "").split(",") if item.strip())
+)
+UPSTREAM_NAMES = {
+    AUTH_UPSTREAM: "auth",
+    STUDENTS_UPSTREAM: "students",
+    USERS_UPSTREAM: "users",
+    SESSIONS_UPSTREAM: "sessions",
+    MESSAGES_UPSTREAM: "messages",
+}
+BULKHEADS: Dict[str, Bulkhead] = {
+    target: Bulkhead(
+        limit=BULKHEAD_LIMITS.get(name, BULKHEAD_LIMIT),
+        queue_size=BULKHEAD_QUEUE,
+        max_wait=BULKHEAD_MAX_WAIT_MS / 1000,
+        target_wait=BULKHEAD_TARGET_WAIT_MS / 1000,
+    )
+    for target, name in UPSTREAM_NAMES.items()
+}
+
+
+def load_service(name: str) -> ModuleType:
+    # every service lives in services/<name>/main.py, so give each module a
+    # unique name instead of letting them all fight over "main"
+    spec = importlib.util.spec_from_file_location(f"cnpm_{name}_main", os.path.join(SERVICES_ROOT, name, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# upstream URL -> in-process app; empty in proxy mode
+LOCAL_APPS: Dict[str, ASGIApp] = {}
+# revoked token ids; a per-worker copy of the auth service's list
+REVOCATIONS = RevocationList(capacity=int(os.getenv("REVOCATION_CAPACITY", "100000")))
+if GATEWAY_MODE == "monolith":
+    services = {name: load_service(name) for name in ("auth", "students", "users", "sessions", "messages")}
+    LOCAL_APPS = {
+        AUTH_UPSTREAM: services["auth"].app,
+        STUDENTS_UPSTREAM: services["students"].app,
+        USERS_UPSTREAM: services["users"].app,
+        SESSIONS_UPSTREAM: services["sessions"].app,
+        MESSAGES_UPSTREAM: services["messages"].app,
+    }
+    # the students catalog replica reads straight from the owner in-process
+    services["students"].CATALOG_REPLICA.attach_local(services["sessions"].CATALOG)
+    services["sessions"].CATALOG_SUBSCRIBERS.clear()
+    # one process: share the auth service's list instead of copying it
+    REVOCATIONS = services["auth"].REVOCATIONS
+
+
+async def sync_revocations() -> None:
+    pruned_at = asyncio.get_running_loop().time()
+    while True:
+        try:
+            client, base_url = upstream_client(AUTH_UPSTREAM)
+            resp = await client.get(f"{base_url}/revocations", params={"since": REVOCATIONS.synced_seq})
+            resp.raise_for_status()
+            body = resp.json()
+            entries = [(jti, exp) for jti, exp in body["revoked"]]
+            if body["full"]:
+                REVOCATIONS.replace(entries, body["seq"])
+            else:
+                REVOCATIONS.extend(entries, body["seq"])
+        except (httpx.HTTPError, ValueError, KeyError):
+            # auth down: keep checking against what we have
+            pass
+        if asyncio.get_running_loop().time() - pruned_at > 60:
+            REVOCATIONS.prune()
+            pruned_at = asyncio.get_running_loop().time()
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # run startup/shutdown of the mounted services alongside the gateway's own
+    async with AsyncExitStack() as stack:
+        for sub_app in LOCAL_APPS.values():
+            await stack.enter_async_context(sub_app.router.lifespan_context(sub_app))
+        syncer = asyncio.create_task(sync_revocations()) if not LOCAL_APPS else None
+        yield
+        if syncer is not None:
+            syncer.cancel()
+        await close_upstream_clients()
+
+
+app = FastAPI(
+    title="API Gateway",
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
 
-app = FastAPI(title="API Gateway", version="1.0.0")
+add_cors(app)
 
-origins = os.getenv(
-    "CORS_ORIGINS",
-    "http://localhost:5173,http://127.0.0.1:5173,http://localhost,http://127.0.0.1,http://172.20.95.15:5173,http://172.20.95.15",
-).split(",")
+COMPRESSION_STATS = new_compression_stats()
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[o.strip() for o in origins if o],
-    allow_origin_regex=".*",
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    CompressionMiddleware,
+    stats=COMPRESSION_STATS,
+    minimum_size=int(os.getenv("COMPRESS_MIN_BYTES", "1024")),
+    cache_entries=int(os.getenv("COMPRESS_CACHE_ENTRIES", "64")),
 )
 
 
+def access_claims(token: str) -> Optional[Claims]:
+    """Claims of a valid, unrevoked access token; None otherwise.
+
+    Refresh tokens are refused: they only open /auth/refresh, which the
+    auth service checks itself.
+    """
+    claims = verify_token(token)
+    if claims is None or claims.get("typ") == "refresh" or claims.get("jti") in REVOCATIONS:
+        return None
+    return claims
+
+
 @app.middleware("http")
 async def auth_guard(request: Request, call_next):
     path = request.url.path
     if request.method == "OPTIONS":
         return await call_next(request)
-    if path.startswith("/auth") or path in {"/health", "/students/health"}:
+    if path.startswith("/auth") or path in {"/health", "/metrics", "/students/health"}:
         return await call_next(request)
 
     token = request.cookies.get(COOKIE_NAME)
     if not token:
         return JSONResponse(status_code=401, content={"error": "unauthorized"})
 
-    try:
-        request.state.user = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-    except jwt.InvalidTokenError:
+    claims = access_claims(token)
+    if claims is None:
         return JSONResponse(status_code=401, content={"error": "unauthorized"})
 
+    request.state.user = claims
     return await call_next(request)
 
 
+# last, so they are outermost and also time compression and auth_guard
+add_profiling(app, "gateway")
+add_tracing(app, "gateway")
+
+
 @app.get("/health")
 async def health():
-    return {"ok": True, "svc": "api-gateway"}
+    return {"ok": True, "svc": "api-gateway", "mode": GATEWAY_MODE}
+
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "compression": COMPRESSION_STATS,
+        "bulkheads": {UPSTREAM_NAMES[target]: b.snapshot() for target, b in BULKHEADS.items()},
+    }
+
+
+class LocalDispatch(Response):
+    """Runs the request through an in-process service app.
+
+    Path rewriting matches proxy_request, while headers, cookies and the body
+    stream are handed over untouched, so the service sees exactly what it
+    would have received over HTTP without the extra hop.
+    """
+
+    def __init__(self, target_app: ASGIApp, path: str, bulkhead: Bulkhead) -> None:
+        self.target_app = target_app
+        self.path = "/" + path.lstrip("/")
+        self.bulkhead = bulkhead
+        self.background = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        sub_scope = dict(scope)
+        sub_scope["path"] = self.path
+        sub_scope["raw_path"] = self.path.encode()
+        sub_scope["root_path"] = ""
+        sub_scope["path_params"] = {}
+        for key in ("app", "router", "route", "endpoint"):
+            sub_scope.pop(key, None)
+        try:
+            await self.target_app(sub_scope, receive, send)
+        finally:
+            self.bulkhead.release()
+
+
+def upstream_busy(target: str, reason: str) -> Response:
+    return JSONResponse(
+        status_code=503,
+        content={"error": "upstream busy", "upstream": UPSTREAM_NAMES[target], "reason": reason},
+        headers={"Retry-After": "1"},
+    )
 
 
 async def proxy_request(target: str, path: str, request: Request) -> Response:
-    url = target.rstrip("/")
+    bulkhead = BULKHEADS[target]
+    local_app = LOCAL_APPS.get(target)
+    if local_app is not None:
+        try:
+            await bulkhead.acquire()
+        except Overloaded as exc:
+            return upstream_busy(target, exc.args[0])
+        # released once the sub-app has sent the response
+        return LocalDispatch(local_app, path, bulkhead)
+
+    client, url = upstream_client(target)
     if path:
         url = f"{url}/{path.lstrip('/')}"
 
@@ -70,15 +262,21 @@ async def proxy_request(target: str, path: str, request: Request) -> Response:
 
     body = await request.body()
 
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        upstream_resp = await client.request(
-            request.method,
-            url,
-            params=request.query_params,
-            headers=headers,
-            content=body,
-            cookies=request.cookies,
-        )
+    try:
+        await bulkhead.acquire()
+    except Overloaded as exc:
+        return upstream_busy(target, exc.args[0])
+    try:
+        with span("upstream", target=target, path="/" + path.lstrip("/")):
+            upstream_resp = await client.request(
+                request.method,
+                url,
+                params=request.query_params,
+                headers=headers,
+                content=body,
+            )
+    finally:
+        bulkhead.release()
 
     proxied = Response(
         content=upstream_resp.content,
@@ -104,6 +302,35 @@ async def auth_root(request: Request):
     return await proxy_request(AUTH_UPSTREAM, "", request)
 
 
+@app.get("/auth/me")
+async def auth_me(request: Request):
+    if AUTH_ME_FROM_TOKEN and request.headers.get("x-auth-validate", "").lower() != "upstream":
+        token = request.cookies.get(COOKIE_NAME)
+        if not token:
+            return JSONResponse(status_code=401, content={"detail": "unauthorized"})
+        claims = access_claims(token)
+        if claims is None:
+            return JSONResponse(status_code=401, content={"detail": "unauthorized"})
+        # tokens issued before the profile claims existed go upstream
+        if all(key in claims for key in TOKEN_PROFILE_CLAIMS):
+            user = {"id": claims["sub"], **{key: claims[key] for key in TOKEN_PROFILE_CLAIMS}}
+            return {"ok": True, "user": user}
+    return await proxy_request(AUTH_UPSTREAM, "me", request)
+
+
+@app.post("/auth/logout")
+async def auth_logout(request: Request):
+    # revoke in this worker right away; the others pick it up on their next sync
+    for name in (COOKIE_NAME, REFRESH_COOKIE_NAME):
+        token = request.cookies.get(name)
+        if not token:
+            continue
+        claims = verify_token(token)
+        if claims is not None and claims.get("jti"):
+            REVOCATIONS.add(str(claims["jti"]), int(claims["exp"]))
+    return await proxy_request(AUTH_UPSTREAM, "logout", request)
+
+
 @app.api_route("/auth/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
 async def auth_proxy(path: str, request: Request):
     return await proxy_request(AUTH_UPSTREAM, path, request)
@@ -171,5 +398,6 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=int(os.getenv("PORT", "4000")),
+        uds=os.getenv("UDS") or None,
         reload=False,
     )
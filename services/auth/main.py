@@ -1,39 +1,142 @@
+import asyncio
+import base64
+import hashlib
+import hmac
 import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterable, Optional, TypeVar
 
 import jwt
 from fastapi import Depends, FastAPI, HTTPException, Request, Response
-from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
+# services/ holds the shared `common` package
+SERVICES_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICES_ROOT not in sys.path:
+    sys.path.insert(0, SERVICES_ROOT)
 
-JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
+from common.admin import require_admin, seed_records  # noqa: E402
+from common.auth import ALGORITHM, COOKIE_NAME, JWT_SECRET, add_cors, verify_token  # noqa: E402
+from common.profiling import add_profiling  # noqa: E402
+from common.responses import FastJSONResponse, fast_loads  # noqa: E402
+from common.revocation import RevocationList  # noqa: E402
+from common.tracing import add_tracing  # noqa: E402
+
+
+# lifetime of the refresh token; access tokens only live ACCESS_TOKEN_MINUTES
 JWT_EXPIRY_HOURS = int(os.getenv("JWT_EXPIRY_HOURS", "24"))
-ALGORITHM = "HS256"
-COOKIE_NAME = "access_token"
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "15"))
+REFRESH_COOKIE_NAME = "refresh_token"
+# scrypt cost: n=2**14, r=8 needs 16 MiB and ~50 ms of CPU per hash
+SCRYPT_N = int(os.getenv("SCRYPT_N", str(2**14)))
+SCRYPT_R = int(os.getenv("SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("SCRYPT_P", "1"))
+# hashes run on this many threads (hashlib.scrypt releases the GIL);
+# 0 hashes inline on the event loop, which only the login benchmark wants
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_EXECUTOR: Optional[ThreadPoolExecutor] = (
+    ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="scrypt") if HASH_WORKERS > 0 else None
+)
+
+T = TypeVar("T")
+User = Dict[str, Optional[str]]
+
+
+def hash_password(password: str, salt: Optional[bytes] = None) -> str:
+    """Returns `scrypt$n$r$p$salt$hash` (base64 fields) for storing."""
+    salt = salt or os.urandom(16)
+    digest = hashlib.scrypt(
+        password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, maxmem=128 * SCRYPT_N * SCRYPT_R * 2
+    )
+    encoded = [base64.b64encode(part).decode() for part in (salt, digest)]
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${encoded[0]}${encoded[1]}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    try:
+        scheme, n, r, p, salt, expected = stored.split("$")
+    except ValueError:
+        return False
+    if scheme != "scrypt":
+        return False
+    expected_bytes = base64.b64decode(expected)
+    digest = hashlib.scrypt(
+        password.encode(),
+        salt=base64.b64decode(salt),
+        n=int(n),
+        r=int(r),
+        p=int(p),
+        maxmem=128 * int(n) * int(r) * 2,
+        dklen=len(expected_bytes),
+    )
+    return hmac.compare_digest(digest, expected_bytes)
+
+
+async def run_hashing(fn: Callable[..., T], *args) -> T:
+    if HASH_EXECUTOR is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(HASH_EXECUTOR, fn, *args)
+
+
+class UserStore:
+    """Accounts indexed by lower-cased email and by id."""
+
+    def __init__(self, users: Iterable[User] = ()) -> None:
+        self.by_email: Dict[str, User] = {}
+        self.by_id: Dict[str, User] = {}
+        for user in users:
+            self.add(user)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def add(self, user: User) -> None:
+        previous = self.by_id.get(user["id"])
+        if previous is not None:
+            self.by_email.pop(previous["email"], None)
+        self.by_email[user["email"]] = user
+        self.by_id[user["id"]] = user
+
+    def get_by_email(self, email: str) -> Optional[User]:
+        return self.by_email.get(email.strip().lower())
+
+    def get_by_id(self, user_id: str) -> Optional[User]:
+        return self.by_id.get(user_id)
+
+    def clear(self) -> None:
+        self.by_email.clear()
+        self.by_id.clear()
+
 
 # Hard-coded demo users (no database)
-USERS: Dict[str, Dict[str, Optional[str]]] = {
-    "student@hcmut.edu.vn": {
-        "id": "stu-001",
-        "email": "student@hcmut.edu.vn",
-        "password": "demo123",
-        "role": "STUDENT",
-        "name": "Alex Student",
-        "phone": "+84 900 111 222",
-        "major": "Computer Science",
-    },
-    "admin@hcmut.edu.vn": {
-        "id": "adm-001",
-        "email": "admin@hcmut.edu.vn",
-        "password": "admin123",
-        "role": "ADMIN",
-        "name": "Admin",
-        "phone": None,
-        "major": None,
-    },
-}
+USERS = UserStore(
+    [
+        {
+            "id": "stu-001",
+            "email": "student@hcmut.edu.vn",
+            "passwordHash": hash_password("demo123"),
+            "role": "STUDENT",
+            "name": "Alex Student",
+            "phone": "+84 900 111 222",
+            "major": "Computer Science",
+        },
+        {
+            "id": "adm-001",
+            "email": "admin@hcmut.edu.vn",
+            "passwordHash": hash_password("admin123"),
+            "role": "ADMIN",
+            "name": "Admin",
+            "phone": None,
+            "major": None,
+        },
+    ]
+)
+# checked against when the email is unknown, so both failures cost the same
+DUMMY_HASH = hash_password(os.urandom(8).hex())
 
 
 class LoginRequest(BaseModel):
@@ -50,50 +153,101 @@ class UserResponse(BaseModel):
     major: Optional[str] = None
 
 
-def create_token(user: Dict[str, Optional[str]]) -> str:
+# jti of every logged-out or rotated token; gateways copy it via /revocations
+REVOCATIONS = RevocationList(capacity=int(os.getenv("REVOCATION_CAPACITY", "100000")))
+
+
+def create_token(user: User) -> str:
     payload = {
         "sub": user["id"],
         "role": user["role"],
+        # lets the gateway answer /auth/me without calling this service
+        "name": user["name"],
+        "email": user["email"],
+        "jti": uuid.uuid4().hex,
+        "exp": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_MINUTES),
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=ALGORITHM)
+
+
+def create_refresh_token(user: User) -> str:
+    payload = {
+        "sub": user["id"],
+        "typ": "refresh",
+        "jti": uuid.uuid4().hex,
         "exp": datetime.utcnow() + timedelta(hours=JWT_EXPIRY_HOURS),
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=ALGORITHM)
 
 
 def decode_token(token: str) -> Dict:
-    try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-    except jwt.InvalidTokenError as exc:
-        raise HTTPException(status_code=401, detail="unauthorized") from exc
+    payload = verify_token(token)
+    if payload is None or payload.get("jti") in REVOCATIONS:
+        raise HTTPException(status_code=401, detail="unauthorized")
+    return payload
+
+
+def revoke(payload: Dict) -> None:
+    if payload.get("jti"):
+        REVOCATIONS.add(str(payload["jti"]), int(payload["exp"]))
 
 
-def get_current_user(request: Request) -> Dict[str, Optional[str]]:
+def set_session_cookies(response: Response, user: User) -> None:
+    response.set_cookie(
+        COOKIE_NAME,
+        create_token(user),
+        httponly=True,
+        samesite="lax",
+        secure=False,
+        max_age=60 * ACCESS_TOKEN_MINUTES,
+        path="/",
+    )
+    response.set_cookie(
+        REFRESH_COOKIE_NAME,
+        create_refresh_token(user),
+        httponly=True,
+        samesite="lax",
+        secure=False,
+        max_age=60 * 60 * JWT_EXPIRY_HOURS,
+        path="/",
+    )
+
+
+def get_current_user(request: Request) -> User:
     token = request.cookies.get(COOKIE_NAME)
     if not token:
         raise HTTPException(status_code=401, detail="unauthorized")
     payload = decode_token(token)
-    user_id = payload.get("sub")
-    role = payload.get("role")
-    for user in USERS.values():
-        if user["id"] == user_id and user["role"] == role:
-            return user
-    raise HTTPException(status_code=401, detail="unauthorized")
-
-
-app = FastAPI(title="Auth service", version="1.0.0")
-
-origins = os.getenv(
-    "CORS_ORIGINS",
-    "http://localhost:5173,http://127.0.0.1:5173,http://localhost,http://127.0.0.1,http://172.20.95.15:5173",
-).split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[o.strip() for o in origins if o],
-    allow_origin_regex=".*",
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    user = USERS.get_by_id(str(payload.get("sub")))
+    if user is None or payload.get("typ") == "refresh" or user["role"] != payload.get("role"):
+        raise HTTPException(status_code=401, detail="unauthorized")
+    return user
+
+
+async def prune_revocations() -> None:
+    while True:
+        await asyncio.sleep(60)
+        REVOCATIONS.prune()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    pruner = asyncio.create_task(prune_revocations())
+    yield
+    pruner.cancel()
+
+
+app = FastAPI(
+    title="Auth service",
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
 )
 
+add_cors(app)
+add_profiling(app, "auth")
+add_tracing(app, "auth")
+
 
 @app.get("/health")
 async def health():
@@ -102,36 +256,86 @@ async def health():
 
 @app.post("/login")
 async def login(data: LoginRequest, response: Response):
-    email = data.email.strip().lower()
-    user = USERS.get(email)
-    if not user or data.password != user["password"]:
+    user = USERS.get_by_email(data.email)
+    stored = user["passwordHash"] if user else DUMMY_HASH
+    if not await run_hashing(verify_password, data.password, stored) or not user:
         raise HTTPException(status_code=401, detail="invalid credentials")
 
-    token = create_token(user)
-    response.set_cookie(
-        COOKIE_NAME,
-        token,
-        httponly=True,
-        samesite="lax",
-        secure=False,
-        max_age=60 * 60 * JWT_EXPIRY_HOURS,
-        path="/",
-    )
+    set_session_cookies(response, user)
+    return {"ok": True, "user": UserResponse(**user)}
 
+
+@app.post("/refresh")
+async def refresh(request: Request, response: Response):
+    token = request.cookies.get(REFRESH_COOKIE_NAME)
+    if not token:
+        raise HTTPException(status_code=401, detail="unauthorized")
+    payload = decode_token(token)
+    user = USERS.get_by_id(str(payload.get("sub")))
+    if user is None or payload.get("typ") != "refresh":
+        raise HTTPException(status_code=401, detail="unauthorized")
+    # refresh tokens are single use: a replayed one is already revoked
+    revoke(payload)
+    set_session_cookies(response, user)
     return {"ok": True, "user": UserResponse(**user)}
 
 
 @app.post("/logout")
-async def logout(response: Response):
-    response.delete_cookie(COOKIE_NAME, path="/")
+async def logout(request: Request, response: Response):
+    for name in (COOKIE_NAME, REFRESH_COOKIE_NAME):
+        token = request.cookies.get(name)
+        if not token:
+            continue
+        payload = verify_token(token)
+        if payload is not None:
+            revoke(payload)
+        response.delete_cookie(name, path="/")
     return {"ok": True}
 
 
+@app.get("/revocations")
+async def revocations(since: int = -1):
+    # polled by every gateway worker; jtis of revoked tokens are not secrets
+    full, entries = REVOCATIONS.since(since)
+    return {"ok": True, "seq": REVOCATIONS.seq, "full": full, "revoked": entries}
+
+
 @app.get("/me")
 async def me(user=Depends(get_current_user)):
     return {"ok": True, "user": UserResponse(**user)}
 
 
+@app.post("/admin/seed")
+async def admin_seed(request: Request, _admin=Depends(require_admin)):
+    body = fast_loads(await request.body())
+    # check the whole batch before touching the store
+    records = seed_records(body, "users", ("id", "email"))
+    for i, record in enumerate(records):
+        if not record.get("passwordHash") and record.get("password") is None:
+            raise HTTPException(status_code=400, detail=f"users[{i}]: password or passwordHash required")
+    if body.get("replace"):
+        USERS.clear()
+    # one hash per distinct plaintext in the batch: synthetic accounts all
+    # share a password, and 100k scrypt runs would take over an hour
+    hashes: Dict[str, str] = {}
+    for record in records:
+        password = record.get("password")
+        if password is not None and password not in hashes:
+            hashes[password] = await run_hashing(hash_password, password)
+    for record in records:
+        email = str(record["email"]).strip().lower()
+        USERS.add({
+            "id": record["id"],
+            "email": email,
+            "passwordHash": record.get("passwordHash") or hashes[record["password"]],
+            "role": record.get("role", "STUDENT"),
+            "name": record.get("name"),
+            "phone": record.get("phone"),
+            "major": record.get("major"),
+        })
+    return {"ok": True, "seeded": len(records), "users": len(USERS)}
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -139,5 +343,6 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=int(os.getenv("PORT", "4010")),
+        uds=os.getenv("UDS") or None,
         reload=False,
     )
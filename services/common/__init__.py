@@ -0,0 +1,5 @@
+"""Code shared by every service in services/*.
+
+Services are started from their own directory (`uvicorn main:app`), so each
+main.py puts services/ on sys.path before importing from here.
+"""
@@ -0,0 +1,37 @@
+import hmac
+import os
+from typing import Dict, Iterable, List
+
+from fastapi import HTTPException, Request
+
+# Bulk/admin endpoints (e.g. /admin/seed for load tests) are disabled unless
+# ADMIN_TOKEN is set; callers send it back in the X-Admin-Token header.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def require_admin(request: Request) -> None:
+    supplied = request.headers.get("x-admin-token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(supplied, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="forbidden")
+
+
+def seed_records(body: object, key: str, fields: Iterable[str] = (), label: str = "") -> List[Dict[str, object]]:
+    """`body[key]` as a list of objects that all have `fields`, else 400.
+
+    Seed endpoints check a whole batch with this before touching their
+    store, so a malformed record changes nothing instead of failing halfway
+    with a 500.
+    """
+    label = label or key
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="expected a JSON object")
+    records = body.get(key) or []
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail=f"{label} must be a list")
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise HTTPException(status_code=400, detail=f"{label}[{i}]: expected an object")
+        missing = [field for field in fields if record.get(field) in (None, "")]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"{label}[{i}]: {', '.join(missing)} required")
+    return records
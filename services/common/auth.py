@@ -0,0 +1,109 @@
+"""Cookie JWT auth shared by the gateway and every service.
+
+    from common.auth import add_cors, require_role, require_user_id
+
+    add_cors(app)
+
+    @app.get("/thing")
+    async def thing(user_id: str = Depends(require_user_id)): ...
+
+Missing or invalid tokens are 401 {"detail": "unauthorized"}, a wrong role is
+403 {"detail": "forbidden"}, the same in every service.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import jwt
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+
+from .tracing import span
+
+JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
+ALGORITHM = "HS256"
+COOKIE_NAME = "access_token"
+CORS_ORIGINS = os.getenv(
+    "CORS_ORIGINS",
+    "http://localhost:5173,http://127.0.0.1:5173,http://localhost,http://127.0.0.1,http://172.20.95.15:5173,http://172.20.95.15",
+)
+
+Claims = Dict[str, object]
+
+
+class TokenCache:
+    """Verified claims by raw token, so a token's HMAC is checked once.
+
+    Each page view sends the same cookie to several endpoints; a hit costs a
+    dict lookup and an expiry comparison instead of base64 + JSON + HMAC.
+    Entries leave at their `exp` or when the cache is full (LRU).
+    """
+
+    def __init__(self, maxsize: int = 10_000) -> None:
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[str, Claims]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def verify(self, token: str) -> Optional[Claims]:
+        claims = self.entries.get(token)
+        if claims is not None:
+            if claims.get("exp", 0) > time.time():
+                self.hits += 1
+                self.entries.move_to_end(token)
+                return claims
+            del self.entries[token]
+        self.misses += 1
+        try:
+            claims = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
+        except jwt.InvalidTokenError:
+            return None
+        if self.maxsize > 0 and "exp" in claims:
+            self.entries[token] = claims
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return claims
+
+
+TOKEN_CACHE = TokenCache(int(os.getenv("TOKEN_CACHE_SIZE", "10000")))
+
+
+def verify_token(token: str) -> Optional[Claims]:
+    """Claims of a valid token, or None. The dict is shared: do not mutate it."""
+    with span("auth"):
+        return TOKEN_CACHE.verify(token)
+
+
+def require_claims(request: Request) -> Claims:
+    token = request.cookies.get(COOKIE_NAME)
+    claims = verify_token(token) if token else None
+    # refresh tokens only open /auth/refresh, never an API endpoint
+    if claims is None or not claims.get("sub") or claims.get("typ") == "refresh":
+        raise HTTPException(status_code=401, detail="unauthorized")
+    return claims
+
+
+def require_user_id(request: Request) -> str:
+    return str(require_claims(request)["sub"])
+
+
+def require_role(*roles: str) -> Callable[[Request], Claims]:
+    def dependency(request: Request) -> Claims:
+        claims = require_claims(request)
+        if claims.get("role") not in roles:
+            raise HTTPException(status_code=403, detail="forbidden")
+        return claims
+
+    return dependency
+
+
+def add_cors(app: FastAPI) -> None:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[o.strip() for o in CORS_ORIGINS.split(",") if o.strip()],
+        allow_origin_regex=".*",
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
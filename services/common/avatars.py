@@ -0,0 +1,219 @@
+import asyncio
+import base64
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .conditional import body_etag, etag_matches, not_modified
+from .responses import FastJSONResponse
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: pip install pillow
+    Image = None
+
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(10 * 1024 * 1024)))
+# square thumbnails kept per avatar; the largest becomes avatarUrl, the
+# others are served on their own (AvatarStore) rather than in the profile
+AVATAR_SIZES = sorted((int(s) for s in os.getenv("AVATAR_SIZES", "256,64").split(",")), reverse=True)
+AVATAR_WORKERS = int(os.getenv("AVATAR_WORKERS", "2"))
+# without Pillow nothing can be resized, so only small files are kept as-is
+PASSTHROUGH_MAX_BYTES = int(os.getenv("AVATAR_PASSTHROUGH_BYTES", str(256 * 1024)))
+MAX_PIXELS = 40_000_000
+CHUNK = 64 * 1024
+# multipart boundaries and part headers around the file itself
+FORM_OVERHEAD = 64 * 1024
+
+AVATAR_STATS: Dict[str, float] = {"uploads": 0, "bytesIn": 0, "bytesOut": 0, "bytesSaved": 0, "processingMs": 0.0}
+_POOL: Optional[ProcessPoolExecutor] = None
+
+
+class UploadLimitMiddleware:
+    """413 for an avatar upload past the cap while its body is still arriving.
+
+    By the time a handler sees the UploadFile, the multipart parser has
+    already received and spooled the whole body. This middleware refuses a
+    declared Content-Length over the cap before reading anything, and
+    otherwise counts bytes as they arrive, cutting a chunked or understated
+    upload off at the cap. It must sit outside anything that buffers the
+    body (idempotency).
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].endswith("/avatar"):
+            await self.app(scope, receive, send)
+            return
+        declared = Headers(scope=scope).get("content-length", "")
+        if declared.isdigit() and int(declared) > self.max_bytes:
+            await FastJSONResponse({"detail": "file too large"}, status_code=413)(scope, receive, send)
+            return
+        received = 0
+
+        async def limited() -> Message:
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > self.max_bytes:
+                # raised inside body parsing, so the app answers it as a 413
+                raise HTTPException(status_code=413, detail="file too large")
+            return message
+
+        await self.app(scope, limited, send)
+
+
+def add_upload_limit(app: FastAPI) -> None:
+    app.add_middleware(UploadLimitMiddleware, max_bytes=AVATAR_MAX_BYTES + FORM_OVERHEAD)
+
+
+class AvatarStore:
+    """Encoded thumbnails per owner, served apart from the profile JSON.
+
+    Profiles carry only `avatarUrl`. The other sizes are fetched on demand,
+    each with its own ETag, so a client downloads a size once and then only
+    revalidates it instead of receiving every size base64-encoded with each
+    profile response.
+    """
+
+    def __init__(self) -> None:
+        # owner id -> (mime, {size: (etag, bytes)})
+        self.by_owner: Dict[str, Tuple[str, Dict[int, Tuple[str, bytes]]]] = {}
+
+    def put(self, owner: str, mime: str, variants: Dict[int, bytes]) -> List[int]:
+        """Replaces the owner's thumbnails; returns the sizes now available."""
+        self.by_owner[owner] = (mime, {size: (body_etag(content), content) for size, content in variants.items()})
+        return sorted(variants, reverse=True)
+
+    def drop(self, owner: str) -> None:
+        self.by_owner.pop(owner, None)
+
+    def response(self, owner: str, size: int, if_none_match: Optional[str]) -> Response:
+        found = self.by_owner.get(owner)
+        if found is None or size not in found[1]:
+            raise HTTPException(status_code=404, detail="avatar not found")
+        mime, variants = found
+        etag, content = variants[size]
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, headers)
+        return Response(content, media_type=mime, headers=headers)
+
+
+def avatar_stats() -> Dict[str, float]:
+    uploads = AVATAR_STATS["uploads"]
+    return {**AVATAR_STATS, "avgProcessingMs": round(AVATAR_STATS["processingMs"] / uploads, 2) if uploads else 0.0}
+
+
+def make_thumbnails(path: str, sizes: List[int]) -> Tuple[str, Dict[int, bytes]]:
+    """Decodes the image at `path` and returns (mime, {size: encoded bytes}).
+
+    Runs in a worker process. Raises ValueError for anything that is not a
+    decodable image of sane dimensions.
+    """
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    try:
+        with Image.open(path) as img:
+            # JPEG can decode at 1/2..1/8 scale directly, far cheaper than full size
+            img.draft("RGB", (sizes[0] * 2, sizes[0] * 2))
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("RGB")
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise ValueError(str(exc)) from exc
+    variants: Dict[int, bytes] = {}
+    for size in sizes:
+        thumb = ImageOps.fit(img, (size, size), Image.LANCZOS)
+        out = io.BytesIO()
+        thumb.save(out, "JPEG", quality=85, optimize=True)
+        variants[size] = out.getvalue()
+    return "image/jpeg", variants
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(max_workers=AVATAR_WORKERS)
+    return _POOL
+
+
+def shutdown_pool() -> None:
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+
+
+async def spool_upload(file: UploadFile, max_bytes: int) -> Tuple[str, int]:
+    """Copies the upload to a temp file chunk by chunk; 413 past `max_bytes`."""
+    fd, path = tempfile.mkstemp(prefix="avatar-")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail="file too large")
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, size
+
+
+def data_url(mime: str, content: bytes) -> str:
+    return f"data:{mime};base64,{base64.b64encode(content).decode('ascii')}"
+
+
+async def process_avatar(file: UploadFile) -> Dict[str, object]:
+    """Upload -> small encoded variants, with what it cost and saved.
+
+    Returns {"avatarUrl", "mime", "variants": {size: bytes}, "stats": {...}};
+    `avatarUrl` is a data URL of the largest variant. The variants go into an
+    AvatarStore, not into the response or the profile.
+    """
+    start = time.perf_counter()
+    # the multipart parser knows the size already; fail before copying anything
+    if file.size is not None and file.size > AVATAR_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="file too large")
+    path, size_in = await spool_upload(file, AVATAR_MAX_BYTES)
+    try:
+        if Image is not None:
+            try:
+                mime, variants = await asyncio.get_running_loop().run_in_executor(
+                    _pool(), make_thumbnails, path, AVATAR_SIZES
+                )
+            except ValueError as exc:
+                raise HTTPException(status_code=415, detail="unsupported image") from exc
+        else:
+            if size_in > PASSTHROUGH_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="file too large")
+            with open(path, "rb") as fh:
+                mime, variants = file.content_type or "image/png", {AVATAR_SIZES[0]: fh.read()}
+    finally:
+        os.unlink(path)
+
+    size_out = sum(len(v) for v in variants.values())
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    stats = {
+        "bytesIn": size_in,
+        "bytesOut": size_out,
+        "bytesSaved": size_in - size_out,
+        "processingMs": round(elapsed_ms, 2),
+    }
+    AVATAR_STATS["uploads"] += 1
+    for key, value in stats.items():
+        AVATAR_STATS[key] += value
+    return {"avatarUrl": data_url(mime, variants[max(variants)]), "mime": mime, "variants": variants, "stats": stats}
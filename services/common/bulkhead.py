@@ -0,0 +1,124 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class Overloaded(Exception):
+    """Raised by Bulkhead.acquire() when a request is shed; args[0] is the reason."""
+
+
+class Bulkhead:
+    """Concurrency limit with a bounded FIFO wait queue for one upstream.
+
+    At most `limit` requests are in flight. Up to `queue_size` more wait in
+    line, and a request is shed (Overloaded) when:
+
+    - the queue is full ("queue_full");
+    - it waited longer than `max_wait` seconds ("timeout");
+    - the queue has stayed slow ("overload"). This is CoDel-style: if even
+      the fastest dequeue in the last `interval` waited more than
+      `target_wait`, the backlog is not draining. New arrivals that would
+      have to queue are then rejected at once instead of adding to it,
+      until an interval passes with a dequeue under the target.
+
+    A degraded upstream thus costs other upstreams nothing: its requests
+    fail fast instead of holding gateway connections and memory.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        queue_size: int,
+        max_wait: float,
+        target_wait: float,
+        interval: float = 0.1,
+    ) -> None:
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.target_wait = target_wait
+        self.interval = interval
+        self.inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._interval_end = 0.0
+        self._interval_min: Optional[float] = None
+        self._overloaded = False
+        self.stats: Dict[str, float] = {
+            "admitted": 0,
+            "queuedTotal": 0,
+            "shedQueueFull": 0,
+            "shedTimeout": 0,
+            "shedOverload": 0,
+            "queueWaitMsMax": 0.0,
+        }
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def overloaded(self, now: float) -> bool:
+        if now >= self._interval_end:
+            slow = self._interval_min is not None and self._interval_min > self.target_wait
+            # an empty queue with free slots is never overloaded
+            self._overloaded = slow and self.queued > 0
+            self._interval_min = None
+            self._interval_end = now + self.interval
+        return self._overloaded
+
+    def _observe_wait(self, waited: float) -> None:
+        if self._interval_min is None or waited < self._interval_min:
+            self._interval_min = waited
+        self.stats["queueWaitMsMax"] = max(self.stats["queueWaitMsMax"], round(waited * 1000, 3))
+
+    async def acquire(self) -> None:
+        if self.inflight < self.limit:
+            self.inflight += 1
+            self.stats["admitted"] += 1
+            return
+        if self.queued >= self.queue_size:
+            self.stats["shedQueueFull"] += 1
+            raise Overloaded("queue_full")
+        start = time.monotonic()
+        if self.overloaded(start):
+            self.stats["shedOverload"] += 1
+            raise Overloaded("overload")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["queuedTotal"] += 1
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            # release() may have handed us a slot just as the wait timed out
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            self._observe_wait(time.monotonic() - start)
+            self.stats["shedTimeout"] += 1
+            raise Overloaded("timeout") from None
+        except asyncio.CancelledError:
+            # the client went away; hand on a slot we may already hold
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        self._observe_wait(time.monotonic() - start)
+        self.stats["admitted"] += 1
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        # hand the slot straight to the oldest waiter; inflight stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.inflight -= 1
+
+    def snapshot(self) -> Dict[str, float]:
+        return {"limit": self.limit, "inflight": self.inflight, "queued": self.queued, **self.stats}
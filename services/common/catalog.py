@@ -0,0 +1,254 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from .upstream import upstream_client
+
+Session = Dict[str, object]
+
+
+class Catalog:
+    """Session catalog with a version number and a bounded change log.
+
+    Every mutation bumps `version` and is appended to the log. Clients
+    that cached the catalog at some version ask for `delta(since)` and get only
+    the sessions added, updated or removed after it, or None when the log no
+    longer reaches back that far and a full snapshot is needed.
+
+    Versions start at the creation time in milliseconds, so versions handed
+    out by an earlier process are older than anything this one can answer
+    and fall back to a snapshot instead of a wrong delta.
+
+    A replica passes the owner's `version` to every mutation and so carries
+    the owner's numbers (and ETag) exactly; a version a client got from
+    either side means the same catalog on both.
+    """
+
+    def __init__(self, sessions: Iterable[Session] = (), log_limit: int = 1000) -> None:
+        self.version = int(time.time() * 1000)
+        self.by_id: Dict[str, Session] = {str(s["id"]): s for s in sessions}
+        self.log_limit = log_limit
+        # (version, session id, whether the id existed before this change)
+        self.changes: Deque[Tuple[int, str, bool]] = deque()
+        # oldest version a delta can be computed from
+        self.floor = self.version
+        self._snapshot: List[Session] = []
+        self._snapshot_version = -1
+        self._by_code: Dict[str, List[Session]] = {}
+        self._by_code_version = -1
+        # called with the new version after every mutation
+        self.listeners: List[Callable[[int], None]] = []
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        return self.by_id.get(session_id)
+
+    def sessions(self) -> List[Session]:
+        """All sessions in insertion order; rebuilt only after a change."""
+        if self._snapshot_version != self.version:
+            self._snapshot = list(self.by_id.values())
+            self._snapshot_version = self.version
+        return self._snapshot
+
+    def with_code(self, code: str) -> List[Session]:
+        """Sessions of one course code; the index is rebuilt only after a change."""
+        if self._by_code_version != self.version:
+            index: Dict[str, List[Session]] = {}
+            for session in self.by_id.values():
+                index.setdefault(str(session.get("code")), []).append(session)
+            self._by_code = index
+            self._by_code_version = self.version
+        return self._by_code.get(code, [])
+
+    def etag(self) -> str:
+        return f'"catalog-{self.version}"'
+
+    def upsert(self, session: Session, version: Optional[int] = None) -> int:
+        session_id = str(session["id"])
+        existed = session_id in self.by_id
+        self.by_id[session_id] = session
+        return self._record(session_id, existed, version)
+
+    def remove(self, session_id: str, version: Optional[int] = None) -> bool:
+        if self.by_id.pop(session_id, None) is None:
+            return False
+        self._record(session_id, True, version)
+        return True
+
+    def replace(self, sessions: Iterable[Session], version: Optional[int] = None) -> int:
+        """Swaps the whole catalog; cached copies need a fresh snapshot."""
+        self.by_id = {str(s["id"]): s for s in sessions}
+        self.version = self.version + 1 if version is None else version
+        self.changes.clear()
+        self.floor = self.version
+        self._notify()
+        return self.version
+
+    def delta(self, since: int) -> Optional[Dict[str, List]]:
+        if since > self.version or since < self.floor:
+            return None
+        recent: List[Tuple[int, str, bool]] = []
+        for change in reversed(self.changes):
+            if change[0] <= since:
+                break
+            recent.append(change)
+        # whether each touched id existed at `since`: known from its first change after it
+        existed_at_since: Dict[str, bool] = {}
+        for _version, session_id, existed in reversed(recent):
+            existed_at_since.setdefault(session_id, existed)
+        added: List[Session] = []
+        updated: List[Session] = []
+        removed: List[str] = []
+        for session_id, existed in existed_at_since.items():
+            current = self.by_id.get(session_id)
+            if current is None:
+                if existed:
+                    removed.append(session_id)
+            elif existed:
+                updated.append(current)
+            else:
+                added.append(current)
+        return {"added": added, "updated": updated, "removed": removed}
+
+    def _record(self, session_id: str, existed: bool, version: Optional[int] = None) -> int:
+        self.version = self.version + 1 if version is None else version
+        self.changes.append((self.version, session_id, existed))
+        while len(self.changes) > self.log_limit:
+            self.floor = self.changes.popleft()[0]
+        self._notify()
+        return self.version
+
+    def _notify(self) -> None:
+        for listener in self.listeners:
+            listener(self.version)
+
+
+def browse_payload(catalog: Catalog, since: Optional[str], keep: Optional[Callable[[Session], bool]] = None) -> Dict:
+    """Response body for the browse endpoints.
+
+    With a usable `since` version only the changes after it are returned
+    (`full: false`); otherwise the whole catalog. `keep` narrows either form to
+    the sessions matching the caller's filters: changed sessions that no longer
+    match are reported as removed so a filtered client cache stays right.
+    """
+    delta = catalog.delta(int(since)) if since and since.isdigit() else None
+    if delta is None:
+        sessions = catalog.sessions()
+        if keep is not None:
+            sessions = [s for s in sessions if keep(s)]
+        return {"ok": True, "version": catalog.version, "full": True, "sessions": sessions}
+    if keep is not None:
+        changed = delta["added"] + delta["updated"]
+        delta = {
+            "added": [s for s in delta["added"] if keep(s)],
+            "updated": [s for s in delta["updated"] if keep(s)],
+            "removed": delta["removed"] + [str(s["id"]) for s in changed if not keep(s)],
+        }
+    return {"ok": True, "version": catalog.version, "full": False, "sinceVersion": int(since), **delta}
+
+
+class CatalogReplica:
+    """Read-through copy of a catalog owned by another service.
+
+    Loads the owner's full catalog once at startup, then keeps it current
+    with `GET {source_url}/catalog?sinceVersion=` conditional requests: an
+    unchanged owner answers 304, a changed one sends only the delta. The loop
+    polls every `refresh_seconds` and wakes early when the owner calls
+    `invalidate()`. In monolith mode `attach_local(owner)` skips HTTP and
+    reads the owner's Catalog object directly.
+    """
+
+    def __init__(self, catalog: Catalog, source_url: str, refresh_seconds: float = 30.0) -> None:
+        self.catalog = catalog
+        self.source_url = source_url
+        self.refresh_seconds = refresh_seconds
+        # owner version the local copy corresponds to; None until first load
+        self.source_version: Optional[int] = None
+        self.local_owner: Optional[Catalog] = None
+        self._etag: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def attach_local(self, owner: Catalog) -> None:
+        self.local_owner = owner
+        owner.listeners.append(lambda _version: self.invalidate())
+        self._apply(browse_payload(owner, None))
+
+    async def refresh(self) -> bool:
+        """Brings the copy up to the owner's version; False if nothing changed."""
+        async with self._lock:
+            if self.local_owner is not None:
+                since = str(self.source_version) if self.source_version is not None else None
+                payload = browse_payload(self.local_owner, since)
+            else:
+                payload = await self._fetch()
+                if payload is None:
+                    return False
+            if payload["version"] == self.source_version:
+                return False
+            self._apply(payload)
+            return True
+
+    async def _fetch(self) -> Optional[Dict]:
+        client, base_url = upstream_client(self.source_url)
+        params = {"sinceVersion": str(self.source_version)} if self.source_version is not None else {}
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        resp = await client.get(f"{base_url}/catalog", params=params, headers=headers)
+        if resp.status_code == 304:
+            return None
+        resp.raise_for_status()
+        self._etag = resp.headers.get("etag")
+        return resp.json()
+
+    def _apply(self, payload: Dict) -> None:
+        # every change is numbered with the owner's version, so versions and
+        # ETags match the owner's and a `sinceVersion` from either side works
+        version = int(payload["version"])
+        if payload["full"]:
+            self.catalog.replace(payload["sessions"], version)
+        else:
+            for session in payload["added"] + payload["updated"]:
+                self.catalog.upsert(session, version)
+            for session_id in payload["removed"]:
+                self.catalog.remove(session_id, version)
+            # a delta that touched nothing locally still moves to the owner's version
+            self.catalog.version = version
+        self.source_version = version
+
+    def invalidate(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except (httpx.HTTPError, ValueError, KeyError):
+                # owner down or mid-restart: keep serving the last copy
+                pass
+            # retry soon while nothing has been loaded yet (owner still starting)
+            timeout = self.refresh_seconds if self.source_version is not None else min(1.0, self.refresh_seconds)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
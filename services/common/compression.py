@@ -0,0 +1,269 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+STAT_KEYS = (
+    "responses",
+    "compressed",
+    "streamed",
+    "bytesIn",
+    "bytesOut",
+    "bytesSaved",
+    "cacheHits",
+    "cacheMisses",
+    "gzip",
+    "br",
+)
+
+
+def new_compression_stats() -> Dict[str, int]:
+    return {key: 0 for key in STAT_KEYS}
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Picks br over gzip when the client accepts both (q > 0)."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(token)
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+class CompressionMiddleware:
+    """Negotiated gzip/brotli compression for responses leaving the gateway.
+
+    Bodies smaller than `minimum_size` pass through untouched. Complete bodies
+    are compressed in `chunk_size` slices and streamed out as they are
+    produced; bodies that keep streaming past `buffer_limit` are compressed on
+    the fly. Cacheable responses (GET, 200, no Set-Cookie, not no-store) keep
+    their compressed variant in a small LRU keyed by encoding and body digest,
+    so an unchanged catalog is compressed once, not once per request.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        stats: Dict[str, int],
+        minimum_size: int = 1024,
+        cache_entries: int = 64,
+        chunk_size: int = 64 * 1024,
+        buffer_limit: int = 1024 * 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+    ) -> None:
+        self.app = app
+        self.stats = stats
+        self.minimum_size = minimum_size
+        self.cache_entries = cache_entries
+        self.chunk_size = chunk_size
+        self.buffer_limit = buffer_limit
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, scope["method"], send)
+        await self.app(scope, receive, responder.send)
+
+    def new_compressor(self, encoding: str) -> _Compressor:
+        return _Compressor(encoding, self.gzip_level, self.brotli_quality)
+
+    def cached(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        body = self.cache.get(key)
+        if body is not None:
+            self.cache.move_to_end(key)
+        return body
+
+    def remember(self, key: Tuple[str, bytes], body: bytes) -> None:
+        self.cache[key] = body
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_entries:
+            self.cache.popitem(last=False)
+
+
+class _CompressionResponder:
+    def __init__(self, owner: CompressionMiddleware, encoding: str, method: str, send: Send) -> None:
+        self.owner = owner
+        self.encoding = encoding
+        self.method = method
+        self.downstream = send
+        self.start: Optional[Message] = None
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        # None until decided; then "passthrough" or "stream"
+        self.mode: Optional[str] = None
+        self.compressor: Optional[_Compressor] = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message.get("headers", []))
+            if not self._compressible(message["status"], headers):
+                self.mode = "passthrough"
+                await self.downstream(message)
+            return
+        if message["type"] != "http.response.body" or self.mode == "passthrough":
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.mode == "stream":
+            await self._stream(body, more_body)
+            return
+
+        self.buffer.append(body)
+        self.buffered += len(body)
+        if more_body and self.buffered < self.owner.buffer_limit:
+            return
+        whole = b"".join(self.buffer)
+        self.buffer = []
+        if not more_body:
+            await self._send_complete(whole)
+            return
+        # still streaming past the buffer limit: compress on the fly
+        self.mode = "stream"
+        self.owner.stats["responses"] += 1
+        self.owner.stats["streamed"] += 1
+        await self._start_compressed(content_length=None)
+        await self._stream(whole, more_body)
+
+    def _compressible(self, status: int, headers: Headers) -> bool:
+        if status < 200 or status in (204, 206, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        length = headers.get("content-length")
+        return not (length is not None and length.isdigit() and int(length) < self.owner.minimum_size)
+
+    def _cacheable(self) -> bool:
+        headers = Headers(raw=self.start.get("headers", []))
+        return (
+            self.method == "GET"
+            and self.start["status"] == 200
+            and "set-cookie" not in headers
+            and "no-store" not in headers.get("cache-control", "")
+        )
+
+    async def _send_complete(self, body: bytes) -> None:
+        stats = self.owner.stats
+        stats["responses"] += 1
+        if len(body) < self.owner.minimum_size:
+            await self.downstream(self.start)
+            await self.downstream({"type": "http.response.body", "body": body})
+            return
+
+        key = (self.encoding, hashlib.blake2b(body, digest_size=16).digest()) if self._cacheable() else None
+        compressed = self.owner.cached(key) if key else None
+        if compressed is not None:
+            stats["cacheHits"] += 1
+            await self._start_compressed(content_length=len(compressed))
+            await self.downstream({"type": "http.response.body", "body": compressed})
+        else:
+            if key:
+                stats["cacheMisses"] += 1
+            pieces: List[bytes] = []
+            await self._start_compressed(content_length=None)
+            for piece in self._compress_slices(body):
+                pieces.append(piece)
+                await self.downstream({"type": "http.response.body", "body": piece, "more_body": True})
+            await self.downstream({"type": "http.response.body", "body": b""})
+            compressed = b"".join(pieces)
+            if key:
+                self.owner.remember(key, compressed)
+        self._account(len(body), len(compressed))
+
+    def _compress_slices(self, body: bytes) -> Iterator[bytes]:
+        compressor = self.owner.new_compressor(self.encoding)
+        size = self.owner.chunk_size
+        for offset in range(0, len(body), size):
+            piece = compressor.compress(body[offset:offset + size])
+            if piece:
+                yield piece
+        yield compressor.finish()
+
+    async def _stream(self, body: bytes, more_body: bool) -> None:
+        if self.compressor is None:
+            self.compressor = self.owner.new_compressor(self.encoding)
+        piece = self.compressor.compress(body) if body else b""
+        if not more_body:
+            piece += self.compressor.finish()
+        self.owner.stats["bytesIn"] += len(body)
+        self.owner.stats["bytesOut"] += len(piece)
+        self.owner.stats["bytesSaved"] += len(body) - len(piece)
+        await self.downstream({"type": "http.response.body", "body": piece, "more_body": more_body})
+
+    async def _start_compressed(self, content_length: Optional[int]) -> None:
+        headers = MutableHeaders(scope=self.start)
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            if "content-length" in headers:
+                del headers["content-length"]
+        else:
+            headers["content-length"] = str(content_length)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # the bytes differ from the upstream representation
+            headers["etag"] = f"W/{etag}"
+        self.owner.stats["compressed"] += 1
+        self.owner.stats[self.encoding] += 1
+        await self.downstream(self.start)
+
+    def _account(self, size_in: int, size_out: int) -> None:
+        stats = self.owner.stats
+        stats["bytesIn"] += size_in
+        stats["bytesOut"] += size_out
+        stats["bytesSaved"] += size_in - size_out
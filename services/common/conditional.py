@@ -0,0 +1,32 @@
+import hashlib
+from typing import Dict, Optional
+
+from starlette.responses import Response
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires.
+
+    Also absorbs the W/ prefix the gateway puts on ETags of bodies it
+    compresses, so a revalidation through the gateway still matches.
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = _opaque(etag)
+    return any(_opaque(candidate) == target for candidate in header.split(","))
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag from the rendered bytes, for payloads without a version."""
+    return '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def not_modified(etag: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **(headers or {})})
@@ -0,0 +1,171 @@
+"""`Idempotency-Key` support for unsafe requests (POST/PUT/PATCH/DELETE).
+
+    add_idempotency(app)
+
+A request that carries the header is processed once per (user, method,
+path, key). The response is kept for IDEMPOTENCY_TTL_SECONDS (default a
+day) in a store bounded to IDEMPOTENCY_MAX_ENTRIES, and later retries get
+it back with `Idempotent-Replayed: true` without running the handler.
+A duplicate that arrives while the first is still running waits for it
+and gets the same response. Reusing a key with a different body is 422.
+5xx responses and outcomes a retry may change (401, 403, 408, 409, 429)
+are not kept, so the next retry runs for real.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import FastAPI
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .auth import COOKIE_NAME, verify_token
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+NOT_STORED = {401, 403, 408, 409, 429}
+MAX_KEY_LENGTH = 255
+
+# (user, method, path, key)
+StoreKey = Tuple[str, str, str, str]
+
+
+class StoredResponse(NamedTuple):
+    expires: float
+    fingerprint: bytes
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class IdempotencyStore:
+    """Completed responses (TTL + LRU bounded) and the requests still running."""
+
+    def __init__(self, ttl: float, maxsize: int) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[StoreKey, StoredResponse]" = OrderedDict()
+        self.inflight: Dict[StoreKey, Tuple[asyncio.Future, bytes]] = {}
+        self.replays = 0
+
+    def get(self, key: StoreKey) -> Optional[StoredResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: StoreKey, fingerprint: bytes, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+        now = time.monotonic()
+        self.entries[key] = StoredResponse(now + self.ttl, fingerprint, status, headers, body)
+        self.entries.move_to_end(key)
+        while self.entries:
+            oldest = next(iter(self.entries.values()))
+            if len(self.entries) <= self.maxsize and oldest.expires > now:
+                break
+            self.entries.popitem(last=False)
+
+
+async def send_json(send: Send, status: int, body: bytes) -> None:
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: ASGIApp, store: IdempotencyStore) -> None:
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+        conn = HTTPConnection(scope)
+        key = conn.headers.get("idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await send_json(send, 400, b'{"detail":"invalid Idempotency-Key"}')
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        token = conn.cookies.get(COOKIE_NAME)
+        claims = verify_token(token) if token else None
+        user = str(claims.get("sub")) if claims else ""
+        store_key = (user, scope["method"], scope["path"], key)
+        fingerprint = hashlib.blake2b(body, digest_size=16).digest()
+
+        while True:
+            stored = self.store.get(store_key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    await send_json(send, 422, b'{"detail":"Idempotency-Key reused with a different request"}')
+                    return
+                self.store.replays += 1
+                await send({
+                    "type": "http.response.start",
+                    "status": stored.status,
+                    "headers": stored.headers + [(b"idempotent-replayed", b"true")],
+                })
+                await send({"type": "http.response.body", "body": stored.body})
+                return
+            running = self.store.inflight.get(store_key)
+            if running is None:
+                break
+            if running[1] != fingerprint:
+                await send_json(send, 422, b'{"detail":"Idempotency-Key reused with a different request"}')
+                return
+            # wait for the first attempt, then replay it (or run, if it was not kept)
+            await asyncio.shield(running[0])
+
+        done = asyncio.get_running_loop().create_future()
+        self.store.inflight[store_key] = (done, fingerprint)
+        body_sent = False
+        status = 500
+        headers: List[Tuple[bytes, bytes]] = []
+        out: List[bytes] = []
+
+        async def replay_body() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def capture(message: Message) -> None:
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                out.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+            if status < 500 and status not in NOT_STORED:
+                self.store.put(store_key, fingerprint, status, headers, b"".join(out))
+        finally:
+            del self.store.inflight[store_key]
+            done.set_result(None)
+
+
+def add_idempotency(app: FastAPI) -> IdempotencyStore:
+    store = IdempotencyStore(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_ENTRIES)
+    app.add_middleware(IdempotencyMiddleware, store=store)
+    return store
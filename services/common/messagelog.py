@@ -0,0 +1,339 @@
+import asyncio
+import mmap
+import os
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from .responses import fast_dumps, fast_loads
+
+Message = Dict[str, object]
+
+
+class Segment:
+    """One append-only file of newline-delimited JSON messages.
+
+    `base` is the sequence number of its first message; the file is named
+    after it. `offsets` (start of each record) is built on first use, so
+    opening a large log only scans the active segment of each conversation.
+    """
+
+    __slots__ = ("base", "path", "size", "offsets")
+
+    def __init__(self, base: int, path: str, size: int) -> None:
+        self.base = base
+        self.path = path
+        self.size = size
+        self.offsets: Optional[array] = None
+
+    def index(self) -> array:
+        if self.offsets is None:
+            offsets = array("Q")
+            with open(self.path, "rb") as fh:
+                data = fh.read()
+            start = 0
+            while start < len(data):
+                end = data.find(b"\n", start)
+                if end < 0:
+                    break
+                offsets.append(start)
+                start = end + 1
+            if start != len(data):
+                # torn write from a crash: drop the partial record
+                with open(self.path, "r+b") as fh:
+                    fh.truncate(start)
+            self.size = start
+            self.offsets = offsets
+        return self.offsets
+
+    @property
+    def count(self) -> int:
+        return len(self.index())
+
+
+class ConversationLog:
+    def __init__(self, owner: "MessageLog", conv_id: str, directory: str) -> None:
+        self.owner = owner
+        self.conv_id = conv_id
+        self.directory = directory
+        self.meta: Dict[str, object] = {}
+        self.segments: List[Segment] = []
+        self.last: Optional[Message] = None
+
+    def load(self) -> None:
+        meta_path = os.path.join(self.directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "rb") as fh:
+                self.meta = fast_loads(fh.read())
+        names = sorted(os.listdir(self.directory))
+        for name in names:
+            if name.endswith(".tmp"):
+                os.unlink(os.path.join(self.directory, name))
+        for name in names:
+            if name.endswith(".merged"):
+                self._finish_merge(os.path.join(self.directory, name))
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".log"):
+                path = os.path.join(self.directory, name)
+                self.segments.append(Segment(int(name[:-4]), path, os.path.getsize(path)))
+        if self.segments:
+            active = self.segments[-1]
+            if active.count:
+                self.last = self._read(active, active.count - 1, active.count)[0]
+
+    def save_meta(self, meta: Dict[str, object]) -> None:
+        self.meta = meta
+        tmp = os.path.join(self.directory, "meta.json.tmp")
+        with open(tmp, "wb") as fh:
+            fh.write(fast_dumps(meta))
+        os.replace(tmp, os.path.join(self.directory, "meta.json"))
+
+    @property
+    def count(self) -> int:
+        if not self.segments:
+            return 0
+        active = self.segments[-1]
+        return active.base + active.count
+
+    def append(self, message: Message) -> int:
+        """Writes one message; returns its sequence number."""
+        return self.append_many([message])
+
+    def append_many(self, messages: List[Message]) -> int:
+        seq = self.count
+        segment = self.segments[-1] if self.segments else None
+        pending: List[bytes] = []
+        pending_size = 0
+        for message in messages:
+            record = fast_dumps(message) + b"\n"
+            used = segment.size + pending_size if segment is not None else 0
+            if segment is None or (used and used + len(record) > self.owner.segment_bytes):
+                if segment is not None and pending:
+                    self._write(segment, pending)
+                    pending, pending_size = [], 0
+                segment = self._roll(seq)
+            segment.index().append(segment.size + pending_size)
+            pending.append(record)
+            pending_size += len(record)
+            seq += 1
+        if pending:
+            self._write(segment, pending)
+        if messages:
+            self.last = messages[-1]
+        return seq - 1
+
+    def page(self, before: Optional[int], limit: int) -> Tuple[List[Message], int]:
+        """Up to `limit` messages with seq < `before` (default: the newest),
+        oldest first, and the seq of the first one returned."""
+        end = self.count if before is None else max(0, min(before, self.count))
+        start = max(0, end - limit)
+        out: List[Message] = []
+        for segment, lo, hi in self._ranges(start, end):
+            out.extend(self._read(segment, lo, hi))
+        return out, start
+
+    def scan(self) -> Iterator[Tuple[int, Message]]:
+        """Every message with its seq, oldest first (for rebuilding indexes)."""
+        for segment in list(self.segments):
+            for i, message in enumerate(self._read(segment, 0, segment.count)):
+                yield segment.base + i, message
+
+    def _ranges(self, start: int, end: int) -> Iterator[Tuple[Segment, int, int]]:
+        if start >= end:
+            return
+        bases = [s.base for s in self.segments]
+        i = bisect_right(bases, start) - 1
+        while i < len(self.segments) and start < end:
+            segment = self.segments[i]
+            hi = min(end, segment.base + segment.count)
+            if hi > start:
+                yield segment, start - segment.base, hi - segment.base
+                start = hi
+            i += 1
+
+    def _read(self, segment: Segment, lo: int, hi: int) -> List[Message]:
+        offsets = segment.index()
+        if lo >= hi:
+            return []
+        first = offsets[lo]
+        last = offsets[hi] if hi < len(offsets) else segment.size
+        mapping = self.owner.mapped(segment.path, last)
+        return [fast_loads(line) for line in mapping[first:last].splitlines()]
+
+    def _roll(self, base: int) -> Segment:
+        path = os.path.join(self.directory, f"{base:012d}.log")
+        open(path, "ab").close()
+        segment = Segment(base, path, 0)
+        segment.offsets = array("Q")
+        self.segments.append(segment)
+        return segment
+
+    def _write(self, segment: Segment, records: List[bytes]) -> None:
+        data = b"".join(records)
+        fd = self.owner.append_fd(segment.path)
+        os.write(fd, data)
+        if self.owner.fsync:
+            os.fsync(fd)
+        segment.size += len(data)
+
+    def _finish_merge(self, merged_path: str) -> None:
+        # a compaction crashed after the merged file was complete: drop the
+        # segments it covers and move it into place
+        base = int(os.path.basename(merged_path)[:-len(".merged")])
+        with open(merged_path, "rb") as fh:
+            end = base + fh.read().count(b"\n")
+        for name in os.listdir(self.directory):
+            if name.endswith(".log") and base < int(name[:-4]) < end:
+                os.unlink(os.path.join(self.directory, name))
+        os.replace(merged_path, os.path.join(self.directory, f"{base:012d}.log"))
+
+    def mergeable_runs(self) -> List[List[Segment]]:
+        """Adjacent sealed segments that together fit in one segment."""
+        runs: List[List[Segment]] = []
+        run: List[Segment] = []
+        size = 0
+        for segment in self.segments[:-1]:
+            if run and size + segment.size > self.owner.segment_bytes:
+                if len(run) > 1:
+                    runs.append(run)
+                run, size = [], 0
+            run.append(segment)
+            size += segment.size
+        if len(run) > 1:
+            runs.append(run)
+        return runs
+
+    def merge_files(self, run: List[Segment]) -> str:
+        """Runs in a worker thread: writes and syncs the merged file."""
+        tmp = os.path.join(self.directory, f"{run[0].base:012d}.tmp")
+        with open(tmp, "wb") as out:
+            for segment in run:
+                with open(segment.path, "rb") as fh:
+                    out.write(fh.read(segment.size))
+            out.flush()
+            os.fsync(out.fileno())
+        merged = tmp[:-len(".tmp")] + ".merged"
+        os.replace(tmp, merged)
+        return merged
+
+    def swap_in(self, run: List[Segment], merged_path: str) -> None:
+        """On the loop thread: replaces `run` by the merged segment."""
+        for segment in run:
+            self.owner.forget(segment.path)
+        for segment in run[1:]:
+            os.unlink(segment.path)
+        target = run[0].path
+        os.replace(merged_path, target)
+        merged = Segment(run[0].base, target, sum(s.size for s in run))
+        position = self.segments.index(run[0])
+        self.segments[position:position + len(run)] = [merged]
+
+
+class MessageLog:
+    """Persistent per-conversation message history.
+
+    Each conversation is a directory of append-only segment files capped at
+    `segment_bytes`. Appends are one write() to the active segment, history
+    pages are slices of memory-mapped segments located through the offset
+    index, so both cost the same at ten messages or ten million. `compact()`
+    merges runs of small sealed segments (left by a lowered cap or by
+    seeding) so the number of files and mappings stays bounded.
+    """
+
+    def __init__(self, root: str, segment_bytes: int = 4 * 1024 * 1024, fsync: bool = False, max_open: int = 256) -> None:
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.max_open = max_open
+        self.conversations: Dict[str, ConversationLog] = {}
+        self._fds: "OrderedDict[str, int]" = OrderedDict()
+        self._maps: "OrderedDict[str, mmap.mmap]" = OrderedDict()
+        os.makedirs(root, exist_ok=True)
+        for name in sorted(os.listdir(root)):
+            if name.startswith("c-"):
+                log = ConversationLog(self, "", os.path.join(root, name))
+                log.load()
+                log.conv_id = str(log.meta.get("id", name[2:]))
+                self.conversations[log.conv_id] = log
+
+    def __contains__(self, conv_id: str) -> bool:
+        return conv_id in self.conversations
+
+    def get(self, conv_id: str) -> Optional[ConversationLog]:
+        return self.conversations.get(conv_id)
+
+    def create(self, conv_id: str, meta: Dict[str, object]) -> ConversationLog:
+        log = self.conversations.get(conv_id)
+        if log is None:
+            directory = os.path.join(self.root, "c-" + quote(conv_id, safe=""))
+            os.makedirs(directory, exist_ok=True)
+            log = ConversationLog(self, conv_id, directory)
+            self.conversations[conv_id] = log
+        log.save_meta(meta)
+        return log
+
+    def drop(self, conv_id: str) -> None:
+        log = self.conversations.pop(conv_id, None)
+        if log is None:
+            return
+        for segment in log.segments:
+            self.forget(segment.path)
+        for name in os.listdir(log.directory):
+            os.unlink(os.path.join(log.directory, name))
+        os.rmdir(log.directory)
+
+    def append_fd(self, path: str) -> int:
+        fd = self._fds.get(path)
+        if fd is None:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._fds[path] = fd
+            while len(self._fds) > self.max_open:
+                os.close(self._fds.popitem(last=False)[1])
+        self._fds.move_to_end(path)
+        return fd
+
+    def mapped(self, path: str, length: int) -> mmap.mmap:
+        """A read-only mapping of at least `length` bytes of `path`, remapped as it grows."""
+        mapping = self._maps.get(path)
+        if mapping is None or len(mapping) < length:
+            if mapping is not None:
+                mapping.close()
+            with open(path, "rb") as fh:
+                mapping = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[path] = mapping
+            while len(self._maps) > self.max_open:
+                self._maps.popitem(last=False)[1].close()
+        self._maps.move_to_end(path)
+        return mapping
+
+    def forget(self, path: str) -> None:
+        fd = self._fds.pop(path, None)
+        if fd is not None:
+            os.close(fd)
+        mapping = self._maps.pop(path, None)
+        if mapping is not None:
+            mapping.close()
+
+    async def compact(self) -> int:
+        """Merges small sealed segments; returns how many files went away."""
+        removed = 0
+        for log in list(self.conversations.values()):
+            for run in log.mergeable_runs():
+                merged = await asyncio.to_thread(log.merge_files, run)
+                if self.conversations.get(log.conv_id) is not log:
+                    os.unlink(merged)
+                    continue
+                log.swap_in(run, merged)
+                removed += len(run) - 1
+        return removed
+
+    async def compact_forever(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.compact()
+
+    def close(self) -> None:
+        for path in list(self._fds) + list(self._maps):
+            self.forget(path)
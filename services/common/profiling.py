@@ -0,0 +1,79 @@
+"""Opt-in per-request profiling for every service.
+
+    PROFILE_REQUESTS=1                 # requests sent with `X-Profile: 1`
+    PROFILE_SAMPLE_RATE=0.01           # plus 1% of all requests
+
+Each profiled request runs under cProfile and is written to PROFILE_DIR
+(default logs/profiles) as `<service>-<METHOD>-<route>-<ms>ms-<time>.prof`;
+aggregate them with `python tools/profiles.py`. With both settings off the
+middleware is never installed, so there is nothing on the request path.
+"""
+import cProfile
+import os
+import random
+import re
+import time
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "logs", "profiles"),
+)
+PROFILE_HEADER = b"x-profile"
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def profile_filename(service: str, method: str, route: str, elapsed_ms: float) -> str:
+    route_part = _UNSAFE.sub("_", route.strip("/")).strip("_") or "root"
+    return f"{service}-{method}-{route_part}-{elapsed_ms:.0f}ms-{time.time_ns()}.prof"
+
+
+class ProfilingMiddleware:
+    # only one profiler can be active per interpreter; while one request is
+    # being profiled, others (including a mounted app in monolith mode) run
+    # unprofiled
+    active = False
+
+    def __init__(self, app: ASGIApp, service: str, sample_rate: float, directory: str) -> None:
+        self.app = app
+        self.service = service
+        self.sample_rate = sample_rate
+        self.directory = directory
+
+    def wanted(self, scope: Scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return PROFILE_REQUESTS and any(k == PROFILE_HEADER and v == b"1" for k, v in scope["headers"])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or ProfilingMiddleware.active or not self.wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        ProfilingMiddleware.active = True
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            ProfilingMiddleware.active = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            # the router leaves the matched route in the scope; catch-all
+            # proxy routes say more by their actual path
+            route = getattr(scope.get("route"), "path", None)
+            if route is None or ":path}" in route:
+                route = scope["path"]
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(
+                os.path.join(self.directory, profile_filename(self.service, scope["method"], route, elapsed_ms))
+            )
+
+
+def add_profiling(app: FastAPI, service: str) -> None:
+    if PROFILE_REQUESTS or PROFILE_SAMPLE_RATE > 0:
+        app.add_middleware(ProfilingMiddleware, service=service, sample_rate=PROFILE_SAMPLE_RATE, directory=PROFILE_DIR)
@@ -0,0 +1,84 @@
+import heapq
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .catalog import Catalog, Session
+
+# score = PREFERRED_MODE if the mode is one the student prefers
+#       + KNOWN_COURSE if the course code is in their history
+#       + rating / 5
+PREFERRED_MODE = 1.0
+KNOWN_COURSE = 2.0
+
+# (rating / 5, session id, course code, session)
+Feature = Tuple[float, str, str, Session]
+Scored = Tuple[float, Session]
+
+
+class SessionRanker:
+    """Top-k sessions of the catalog for one student's preferences and history.
+
+    Sessions are grouped once per catalog version into per-mode lists and
+    per-(mode, course) lists, each sorted by rating. Within a list every
+    session gets the same bonus, so the list is already in score order.
+    A query merges a handful of lists with a heap: one per mode (courses
+    the student has taken are left out of these), plus one per (mode,
+    known course). It stops after k sessions survive `skip`. The cost
+    depends on k and the student's history, not on the catalog size.
+    """
+
+    def __init__(self, catalog: Catalog) -> None:
+        self.catalog = catalog
+        self.by_mode: Dict[str, List[Feature]] = {}
+        self.by_course: Dict[Tuple[str, str], List[Feature]] = {}
+        self.version = -1
+
+    def _refresh(self) -> None:
+        if self.version == self.catalog.version:
+            return
+        by_mode: Dict[str, List[Feature]] = {}
+        by_course: Dict[Tuple[str, str], List[Feature]] = {}
+        for session in self.catalog.by_id.values():
+            mode, code = str(session.get("mode")), str(session.get("code"))
+            feature = (float(session.get("rating") or 0) / 5, str(session["id"]), code, session)
+            by_mode.setdefault(mode, []).append(feature)
+            by_course.setdefault((mode, code), []).append(feature)
+        for features in (*by_mode.values(), *by_course.values()):
+            features.sort(key=lambda f: (-f[0], f[1]))
+        self.by_mode, self.by_course = by_mode, by_course
+        self.version = self.catalog.version
+
+    def top(
+        self,
+        k: int,
+        modes: Iterable[str],
+        codes: Iterable[str],
+        skip: Callable[[Session], bool],
+    ) -> List[Scored]:
+        self._refresh()
+        modes, codes = set(modes), set(codes)
+        # (bonus, features, leave out known courses)
+        streams: List[Tuple[float, List[Feature], bool]] = []
+        for mode, features in self.by_mode.items():
+            bonus = PREFERRED_MODE if mode in modes else 0.0
+            streams.append((bonus, features, True))
+            for code in codes:
+                course = self.by_course.get((mode, code))
+                if course:
+                    streams.append((bonus + KNOWN_COURSE, course, False))
+        # (-score, session id, stream, position)
+        heap = [(-(bonus + features[0][0]), features[0][1], n, 0) for n, (bonus, features, _) in enumerate(streams)]
+        heapq.heapify(heap)
+        out: List[Scored] = []
+        while heap and len(out) < k:
+            neg, _sid, n, i = heap[0]
+            bonus, features, only_new = streams[n]
+            if i + 1 < len(features):
+                nxt = features[i + 1]
+                heapq.heapreplace(heap, (-(bonus + nxt[0]), nxt[1], n, i + 1))
+            else:
+                heapq.heappop(heap)
+            _rating, _id, code, session = features[i]
+            if (only_new and code in codes) or skip(session):
+                continue
+            out.append((round(-neg, 3), session))
+        return out
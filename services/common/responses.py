@@ -0,0 +1,44 @@
+import json
+import os
+
+from starlette.responses import JSONResponse
+
+from .tracing import span
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+# auto: orjson when installed, stdlib otherwise; stdlib: always json.dumps
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto").strip().lower()
+USE_ORJSON = orjson is not None and JSON_BACKEND != "stdlib"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available.
+
+    Used as every app's default_response_class. Handlers whose payload is
+    already plain dicts/lists/str/numbers can return it wrapped in this class
+    directly, which skips FastAPI's jsonable_encoder walk over the whole tree.
+    """
+
+    def render(self, content) -> bytes:
+        with span("serialize"):
+            if USE_ORJSON:
+                return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+            return super().render(content)
+
+
+def fast_loads(data: bytes):
+    """json.loads counterpart of FastJSONResponse, for large request bodies."""
+    if USE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def fast_dumps(obj) -> bytes:
+    """Compact single-line JSON bytes, orjson when available."""
+    if USE_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
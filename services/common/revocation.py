@@ -0,0 +1,112 @@
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+Entry = Tuple[str, int]
+
+
+class RevocationList:
+    """Revoked token ids (`jti`) until the token would have expired anyway.
+
+    Membership goes through a Bloom filter first: almost every token checked
+    is not revoked, and a miss costs `hashes` bit tests with no allocation.
+    Only possible hits are confirmed against the exact dict, so there are no
+    false positives.
+
+    Every `add` gets a sequence number so other processes (each gateway
+    worker) can copy the list incrementally with `since(seq)`; `prune` drops
+    expired entries and makes older sequence numbers ask for a full copy.
+
+    A copy tracks how far it has read the source in `synced_seq`, apart from
+    its own numbering: a gateway also `add`s the tokens it logs out itself,
+    and those must not move the cursor past source entries it has not seen.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.01) -> None:
+        self.error_rate = error_rate
+        self.expires: Dict[str, int] = {}
+        self.log: List[Entry] = []
+        # sequence number of log[0]; `seq` is one past the last entry
+        self.floor = 0
+        # the source's `seq` this copy has caught up to
+        self.synced_seq = 0
+        self._size(capacity)
+
+    @property
+    def seq(self) -> int:
+        return self.floor + len(self.log)
+
+    def __len__(self) -> int:
+        return len(self.expires)
+
+    def __contains__(self, jti: str) -> bool:
+        h = hash(jti)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        bits = self.bits
+        m = self.m
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % m
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return jti in self.expires
+
+    def add(self, jti: str, exp: int) -> None:
+        if jti in self.expires:
+            return
+        self.expires[jti] = exp
+        self.log.append((jti, exp))
+        if len(self.expires) > self.capacity:
+            self._size(self.capacity * 2)
+            self._fill()
+        else:
+            self._set_bits(jti)
+
+    def since(self, seq: int) -> Tuple[bool, List[Entry]]:
+        """(full, entries) added at or after `seq`; full when that is too old."""
+        if seq < self.floor or seq > self.seq:
+            return True, list(self.expires.items())
+        return False, self.log[seq - self.floor:]
+
+    def replace(self, entries: List[Entry], seq: int) -> None:
+        self.expires = {jti: int(exp) for jti, exp in entries}
+        self.log = []
+        self.floor = seq
+        self.synced_seq = seq
+        self._fill()
+
+    def extend(self, entries: List[Entry], seq: int) -> None:
+        for jti, exp in entries:
+            self.add(jti, int(exp))
+        self.synced_seq = seq
+
+    def prune(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        live = {jti: exp for jti, exp in self.expires.items() if exp > now}
+        dropped = len(self.expires) - len(live)
+        if dropped:
+            # older sequence numbers now get a full copy; the sync cursor stays
+            self.floor = self.seq
+            self.expires = live
+            self.log = []
+            self._fill()
+        return dropped
+
+    def _size(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.m = max(64, int(-capacity * math.log(self.error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.m / capacity * math.log(2)))
+        self.bits = bytearray((self.m + 7) // 8)
+
+    def _fill(self) -> None:
+        self.bits = bytearray(len(self.bits))
+        for jti in self.expires:
+            self._set_bits(jti)
+
+    def _set_bits(self, jti: str) -> None:
+        h = hash(jti)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.m
+            self.bits[pos >> 3] |= 1 << (pos & 7)
@@ -0,0 +1,56 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+# (start minute, end minute, key)
+Slot = Tuple[int, int, str]
+
+
+def minutes(hhmm: str) -> int:
+    hours, _, mins = str(hhmm).partition(":")
+    return int(hours) * 60 + int(mins or 0)
+
+
+class ScheduleIndex:
+    """Weekly time slots of one student's bookings, for conflict checks.
+
+    Slots are kept per weekday, sorted by start. Ranges are half-open, so a
+    09:00-11:00 session does not clash with one ending at 09:00. A slot
+    overlapping [start, end) must start before `end` and, being no longer
+    than the longest slot of that day, after `start - longest`: two
+    bisections bound the candidates, so a check costs O(log n) plus the
+    few slots in that window rather than a pass over every booking.
+    """
+
+    def __init__(self) -> None:
+        self.days: Dict[str, List[Slot]] = {}
+        # only grows; a stale maximum merely widens the window
+        self.longest: Dict[str, int] = {}
+        self.slots: Dict[str, Tuple[str, Slot]] = {}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def add(self, key: str, day: str, start: str, end: str) -> None:
+        self.remove(key)
+        slot = (minutes(start), minutes(end), key)
+        insort(self.days.setdefault(day, []), slot)
+        self.longest[day] = max(self.longest.get(day, 0), slot[1] - slot[0])
+        self.slots[key] = (day, slot)
+
+    def remove(self, key: str) -> bool:
+        found = self.slots.pop(key, None)
+        if found is None:
+            return False
+        day, slot = found
+        entries = self.days[day]
+        del entries[bisect_left(entries, slot)]
+        return True
+
+    def conflicts(self, day: str, start: str, end: str, ignore: Optional[str] = None) -> List[str]:
+        entries = self.days.get(day)
+        if not entries:
+            return []
+        lo, hi = minutes(start), minutes(end)
+        first = bisect_left(entries, (lo - self.longest[day] + 1,))
+        last = bisect_left(entries, (hi,), first)
+        return [key for s, e, key in entries[first:last] if e > lo and key != ignore]
@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import math
+import re
+import unicodedata
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+WORD = re.compile(r"\w+")
+# đ is a letter of its own, not d + a combining mark, so NFD leaves it alone
+_FOLD = str.maketrans({"đ": "d", "Đ": "d"})
+
+# (score, conversation id, seq)
+Hit = Tuple[float, str, int]
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics: "Đường Lê Lợi" -> "duong le loi"."""
+    decomposed = unicodedata.normalize("NFD", text.translate(_FOLD))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    return WORD.findall(fold(text))
+
+
+class MessageIndex:
+    """Inverted index over message text, scoped by conversation.
+
+    Postings are term -> conversation -> {seq: term frequency}, so a search
+    only visits the conversations the caller belongs to. Results are ranked
+    with BM25, newest first on ties.
+
+    Senders only pay for `enqueue()` (a deque append); a background task
+    started with `start()` tokenizes in batches, yielding to the event loop
+    between them. `search()` flushes what is still queued first, so a
+    message is findable as soon as its send returned.
+    """
+
+    def __init__(self, batch: int = 500, k1: float = 1.2, b: float = 0.75) -> None:
+        self.batch = batch
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, Dict[int, int]]] = {}
+        self.df: Dict[str, int] = {}
+        # conversation -> {seq: number of tokens}
+        self.lengths: Dict[str, Dict[int, int]] = {}
+        self.terms: Dict[str, Set[str]] = {}
+        self.docs = 0
+        self.total_length = 0
+        self.pending: Deque[Tuple[str, int, str]] = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, conv_id: str, seq: int, text: str) -> None:
+        self.pending.append((conv_id, seq, text))
+        if self._wake is not None:
+            self._wake.set()
+
+    def add(self, conv_id: str, seq: int, text: str) -> None:
+        lengths = self.lengths.setdefault(conv_id, {})
+        if seq in lengths:
+            return
+        tokens = tokenize(text)
+        lengths[seq] = len(tokens)
+        self.docs += 1
+        self.total_length += len(tokens)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        conv_terms = self.terms.setdefault(conv_id, set())
+        for token, tf in counts.items():
+            self.postings.setdefault(token, {}).setdefault(conv_id, {})[seq] = tf
+            self.df[token] = self.df.get(token, 0) + 1
+            conv_terms.add(token)
+
+    def add_many(self, conv_id: str, items: Iterable[Tuple[int, str]]) -> None:
+        for seq, text in items:
+            self.add(conv_id, seq, text)
+
+    def drop(self, conv_id: str) -> None:
+        """Forgets a conversation, including anything of it still queued."""
+        if any(item[0] == conv_id for item in self.pending):
+            self.pending = deque(item for item in self.pending if item[0] != conv_id)
+        lengths = self.lengths.pop(conv_id, {})
+        self.docs -= len(lengths)
+        self.total_length -= sum(lengths.values())
+        for token in self.terms.pop(conv_id, ()):
+            by_conv = self.postings[token]
+            self.df[token] -= len(by_conv.pop(conv_id))
+            if not by_conv:
+                del self.postings[token]
+                del self.df[token]
+
+    def flush(self, limit: Optional[int] = None) -> int:
+        """Indexes up to `limit` queued messages (all by default)."""
+        done = 0
+        while self.pending and (limit is None or done < limit):
+            self.add(*self.pending.popleft())
+            done += 1
+        return done
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self.flush(self.batch):
+                await asyncio.sleep(0)
+
+    def start(self) -> None:
+        if self._task is None:
+            # created here so it belongs to the running loop
+            self._wake = asyncio.Event()
+            if self.pending:
+                self._wake.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+
+    def search(self, query: str, conv_ids: Iterable[str], offset: int = 0, limit: int = 20) -> Tuple[List[Hit], int]:
+        """Messages containing every query term, in `conv_ids` only.
+
+        Returns the hits at [offset, offset + limit) and the total match count.
+        """
+        self.flush()
+        terms = sorted(set(tokenize(query)), key=lambda t: self.df.get(t, 0))
+        if not terms or terms[0] not in self.df:
+            return [], 0
+        avg_length = self.total_length / max(1, self.docs)
+        idf = {t: math.log(1 + (self.docs - self.df[t] + 0.5) / (self.df[t] + 0.5)) for t in terms}
+        rarest = self.postings[terms[0]]
+        hits: List[Hit] = []
+        for conv_id in set(conv_ids):
+            first = rarest.get(conv_id)
+            if not first:
+                continue
+            lists = [first]
+            for term in terms[1:]:
+                postings = self.postings[term].get(conv_id)
+                if not postings:
+                    break
+                lists.append(postings)
+            else:
+                lengths = self.lengths[conv_id]
+                for seq in first:
+                    if not all(seq in p for p in lists[1:]):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * lengths[seq] / avg_length)
+                    score = 0.0
+                    for term, postings in zip(terms, lists):
+                        tf = postings[seq]
+                        score += idf[term] * tf * (self.k1 + 1) / (tf + norm)
+                    hits.append((score, conv_id, seq))
+        top = heapq.nlargest(offset + limit, hits, key=lambda h: (h[0], h[2]))
+        return top[offset:], len(hits)
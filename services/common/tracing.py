@@ -0,0 +1,149 @@
+"""Request ids, timing spans and the JSON access log.
+
+    add_tracing(app, "students")          # last, so it wraps everything
+
+    with span("upstream", target="students"):
+        ...
+
+Off unless ACCESS_LOG=1: each line is a blocking write() on the event
+loop, so it is switched on while investigating latency, not left running.
+With it on, the gateway accepts `X-Request-ID` (or makes one up), the
+upstream clients forward it, and every service writes one JSON line per
+request to ACCESS_LOG_DIR/<service>.access.log (default logs/) with its
+spans: "handler" (until the response starts), "auth", "serialize",
+"upstream". `python tools/waterfall.py <request id>` lines them up across
+services.
+"""
+import json
+import os
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+ACCESS_LOG = os.getenv("ACCESS_LOG", "0") == "1"
+ACCESS_LOG_DIR = os.getenv(
+    "ACCESS_LOG_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "logs"),
+)
+REQUEST_ID_HEADER = "x-request-id"
+
+
+class Trace:
+    __slots__ = ("request_id", "started", "spans")
+
+    def __init__(self, request_id: str) -> None:
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, object]] = []
+
+    def record(self, name: str, start: float, end: float, attrs: Dict[str, object]) -> None:
+        entry = {
+            "name": name,
+            "startMs": round((start - self.started) * 1000, 3),
+            "durationMs": round((end - start) * 1000, 3),
+        }
+        if attrs:
+            entry.update(attrs)
+        self.spans.append(entry)
+
+
+CURRENT_TRACE: ContextVar[Optional[Trace]] = ContextVar("CURRENT_TRACE", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    trace = CURRENT_TRACE.get()
+    return trace.request_id if trace is not None else None
+
+
+class span:
+    """Times a block into the current request's trace; a no-op outside one."""
+
+    __slots__ = ("name", "attrs", "trace", "start")
+
+    def __init__(self, name: str, **attrs: object) -> None:
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> "span":
+        self.trace = CURRENT_TRACE.get()
+        if self.trace is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.trace is not None:
+            self.trace.record(self.name, self.start, time.perf_counter(), self.attrs)
+
+
+class AccessLog:
+    """Appends JSON lines with one write() each, so workers can share a file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def write(self, record: Dict[str, object]) -> None:
+        if self._fd is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(self._fd, json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode() + b"\n")
+
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp, service: str, log: AccessLog) -> None:
+        self.app = app
+        self.service = service
+        self.log = log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # a mounted service in monolith mode runs inside the gateway's trace
+        request_id = next(
+            (v.decode("latin-1")[:128] for k, v in scope["headers"] if k == b"x-request-id"),
+            None,
+        ) or current_request_id() or uuid.uuid4().hex
+        trace = Trace(request_id)
+        token = CURRENT_TRACE.set(trace)
+        wall_start = time.time()
+        status = 500
+
+        async def traced_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                trace.record("handler", trace.started, time.perf_counter(), {})
+                headers = MutableHeaders(scope=message)
+                # already there when a proxied or mounted service set it
+                if REQUEST_ID_HEADER not in headers:
+                    headers.append(REQUEST_ID_HEADER, request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            CURRENT_TRACE.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            self.log.write({
+                "ts": round(wall_start, 6),
+                "service": self.service,
+                "requestId": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status,
+                "durationMs": round((time.perf_counter() - trace.started) * 1000, 3),
+                "spans": trace.spans,
+            })
+
+
+def add_tracing(app: FastAPI, service: str) -> None:
+    if ACCESS_LOG:
+        log = AccessLog(os.path.join(ACCESS_LOG_DIR, f"{service}.access.log"))
+        app.add_middleware(TracingMiddleware, service=service, log=log)
@@ -0,0 +1,59 @@
+from http.cookiejar import CookieJar
+from typing import Dict, Tuple
+
+import httpx
+
+from .tracing import REQUEST_ID_HEADER, current_request_id
+
+
+class _NoCookieJar(CookieJar):
+    # the browser's Cookie header is forwarded verbatim; a pooled client must
+    # never remember one user's Set-Cookie and replay it for the next request
+    def extract_cookies(self, response, request) -> None:
+        return None
+
+    def set_cookie(self, cookie) -> None:
+        return None
+
+
+async def _forward_request_id(request: httpx.Request) -> None:
+    request_id = current_request_id()
+    if request_id is not None:
+        request.headers[REQUEST_ID_HEADER] = request_id
+
+
+# upstream URL -> (pooled client, base URL); built lazily, closed on shutdown
+UPSTREAM_CLIENTS: Dict[str, Tuple[httpx.AsyncClient, str]] = {}
+
+
+def upstream_client(target: str) -> Tuple[httpx.AsyncClient, str]:
+    """Returns a keep-alive client for an upstream.
+
+    `unix:/run/cnpm/auth.sock` (or `unix:///run/cnpm/auth.sock`) talks HTTP
+    over a Unix domain socket; anything else is treated as a regular URL.
+    """
+    cached = UPSTREAM_CLIENTS.get(target)
+    if cached is not None:
+        return cached
+    if target.startswith("unix:"):
+        sock_path = "/" + target[len("unix:"):].lstrip("/")
+        transport = httpx.AsyncHTTPTransport(uds=sock_path)
+        base_url = "http://localhost"
+    else:
+        transport = httpx.AsyncHTTPTransport()
+        base_url = target.rstrip("/")
+    client = httpx.AsyncClient(
+        transport=transport,
+        follow_redirects=True,
+        cookies=httpx.Cookies(_NoCookieJar()),
+        event_hooks={"request": [_forward_request_id]},
+    )
+    UPSTREAM_CLIENTS[target] = (client, base_url)
+    return client, base_url
+
+
+async def close_upstream_clients() -> None:
+    clients = list(UPSTREAM_CLIENTS.values())
+    UPSTREAM_CLIENTS.clear()
+    for client, _base_url in clients:
+        await client.aclose()
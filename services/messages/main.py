@@ -1,31 +1,33 @@
+import asyncio
 import os
-from typing import Dict, List
+import sys
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 
-import jwt
 from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
-
-JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
-ALGORITHM = "HS256"
-COOKIE_NAME = "access_token"
-
-app = FastAPI(title="Messages service", version="1.0.0")
-
-origins = os.getenv(
-    "CORS_ORIGINS",
-    "http://localhost:5173,http://127.0.0.1:5173,http://localhost,http://127.0.0.1,http://172.20.95.15:5173,http://172.20.95.15",
-).split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[o.strip() for o in origins if o],
-    allow_origin_regex=".*",
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
+# services/ holds the shared `common` package
+SERVICES_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICES_ROOT not in sys.path:
+    sys.path.insert(0, SERVICES_ROOT)
+
+from common.admin import require_admin, seed_records  # noqa: E402
+from common.auth import add_cors, require_user_id  # noqa: E402
+from common.idempotency import add_idempotency  # noqa: E402
+from common.messagelog import MessageLog  # noqa: E402
+from common.profiling import add_profiling  # noqa: E402
+from common.responses import FastJSONResponse, fast_loads  # noqa: E402
+from common.search import MessageIndex  # noqa: E402
+from common.tracing import add_tracing  # noqa: E402
+
+
+MESSAGE_LOG_DIR = os.getenv("MESSAGE_LOG_DIR", os.path.join(os.path.dirname(SERVICES_ROOT), "data", "messages"))
+PAGE_SIZE = int(os.getenv("MESSAGE_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = 500
+SEARCH_PAGE_SIZE = 20
 
-CONVERSATIONS: Dict[str, Dict[str, object]] = {
+# written to the log on first start only
+DEMO_CONVERSATIONS: Dict[str, Dict[str, object]] = {
     "group-1": {
         "id": "group-1",
         "title": "CS101 - Intro group",
@@ -60,18 +62,54 @@ CONVERSATIONS: Dict[str, Dict[str, object]] = {
 }
 
 
-def require_user(request: Request) -> str:
-    token = request.cookies.get(COOKIE_NAME)
-    if not token:
-        raise HTTPException(status_code=401, detail="unauthorized")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-    except jwt.InvalidTokenError as exc:
-        raise HTTPException(status_code=401, detail="unauthorized") from exc
-    uid = payload.get("sub")
-    if not uid:
-        raise HTTPException(status_code=401, detail="unauthorized")
-    return uid
+LOG = MessageLog(
+    MESSAGE_LOG_DIR,
+    segment_bytes=int(os.getenv("MESSAGE_SEGMENT_BYTES", str(4 * 1024 * 1024))),
+    fsync=os.getenv("MESSAGE_LOG_FSYNC", "0") == "1",
+)
+for demo in DEMO_CONVERSATIONS.values():
+    if demo["id"] not in LOG:
+        LOG.create(demo["id"], {k: v for k, v in demo.items() if k != "messages"}).append_many(demo["messages"])
+# conversation id -> {id, title, type, members}; messages live in LOG
+CONVERSATIONS: Dict[str, Dict[str, object]] = {conv_id: log.meta for conv_id, log in LOG.conversations.items()}
+SEARCH = MessageIndex()
+
+
+async def index_history() -> None:
+    """Indexes what is already on disk, a batch at a time, after startup."""
+    for conv_id, log in list(LOG.conversations.items()):
+        for seq, message in log.scan():
+            if LOG.get(conv_id) is not log:
+                break  # re-seeded meanwhile; the seed indexed the new history
+            SEARCH.add(conv_id, seq, str(message.get("content", "")))
+            if seq % SEARCH.batch == 0:
+                await asyncio.sleep(0)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    compactor = asyncio.create_task(LOG.compact_forever(float(os.getenv("MESSAGE_COMPACT_SECONDS", "300"))))
+    indexer = asyncio.create_task(index_history())
+    SEARCH.start()
+    yield
+    compactor.cancel()
+    indexer.cancel()
+    await SEARCH.stop()
+    LOG.close()
+
+
+app = FastAPI(
+    title="Messages service",
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
+
+# inside CORS, so replayed responses get the current CORS headers
+IDEMPOTENCY = add_idempotency(app)
+add_cors(app)
+add_profiling(app, "messages")
+add_tracing(app, "messages")
 
 
 @app.get("/health")
@@ -80,13 +118,14 @@ async def health():
 
 
 @app.get("/sidebar")
-async def sidebar(user_id=Depends(require_user)):
+async def sidebar(user_id=Depends(require_user_id)):
     groups: List[Dict[str, object]] = []
     directs: List[Dict[str, object]] = []
     for conv in CONVERSATIONS.values():
         if user_id not in conv["members"]:
             continue
-        last = conv["messages"][-1]["content"] if conv["messages"] else "No messages yet"
+        newest = LOG.get(conv["id"]).last
+        last = newest["content"] if newest else "No messages yet"
         entry = {
             "id": conv["id"],
             "title": conv["title"],
@@ -105,15 +144,22 @@ async def sidebar(user_id=Depends(require_user)):
 
 
 @app.get("/conversations/{conv_id}/messages")
-async def messages(conv_id: str, user_id=Depends(require_user)):
+async def messages(
+    conv_id: str,
+    before: Optional[int] = None,
+    limit: int = PAGE_SIZE,
+    user_id=Depends(require_user_id),
+):
     conv = CONVERSATIONS.get(conv_id)
     if not conv or user_id not in conv["members"]:
         raise HTTPException(status_code=403, detail="forbidden")
-    return {"messages": conv.get("messages", [])}
+    page, start = LOG.get(conv_id).page(before, max(1, min(limit, MAX_PAGE_SIZE)))
+    # pass `before` back to get the previous page; null at the beginning
+    return FastJSONResponse({"messages": page, "before": start or None})
 
 
 @app.post("/conversations/{conv_id}/messages")
-async def send(conv_id: str, request: Request, user_id=Depends(require_user)):
+async def send(conv_id: str, request: Request, user_id=Depends(require_user_id)):
     conv = CONVERSATIONS.get(conv_id)
     if not conv or user_id not in conv["members"]:
         raise HTTPException(status_code=403, detail="forbidden")
@@ -121,16 +167,76 @@ async def send(conv_id: str, request: Request, user_id=Depends(require_user)):
     content = (form.get("content") or "").strip()
     if not content:
         raise HTTPException(status_code=400, detail="content required")
+    log = LOG.get(conv_id)
     msg = {
-        "id": f"m{len(conv['messages'])+1}",
+        "id": f"m{log.count + 1}",
         "content": content,
         "sender": {"id": user_id, "displayName": "Student", "role": "STUDENT"},
     }
-    conv.setdefault("messages", []).append(msg)
+    SEARCH.enqueue(conv_id, log.append(msg), content)
     return {"message": msg}
 
 
+@app.get("/search")
+async def search(q: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE, user_id=Depends(require_user_id)):
+    mine = [conv_id for conv_id, conv in CONVERSATIONS.items() if user_id in conv["members"]]
+    offset = max(0, offset)
+    hits, total = SEARCH.search(q, mine, offset, max(1, min(limit, 100)))
+    results = [
+        {
+            "conversationId": conv_id,
+            "conversationTitle": CONVERSATIONS[conv_id]["title"],
+            "message": LOG.get(conv_id).page(seq + 1, 1)[0][0],
+            "score": round(score, 3),
+        }
+        for score, conv_id, seq in hits
+    ]
+    end = offset + len(results)
+    return {"results": results, "total": total, "next": end if end < total else None}
+
+
+@app.post("/admin/seed")
+async def admin_seed(request: Request, _admin=Depends(require_admin)):
+    body = fast_loads(await request.body())
+    records = seed_records(body, "conversations", ("id", "title", "members"))
+    for i, record in enumerate(records):
+        if not isinstance(record["members"], list):
+            raise HTTPException(status_code=400, detail=f"conversations[{i}]: members must be a list")
+        seed_records(record, "messages", ("content", "senderId"), label=f"conversations[{i}].messages")
+    if body.get("replace"):
+        for conv_id in list(CONVERSATIONS):
+            LOG.drop(conv_id)
+            SEARCH.drop(conv_id)
+        CONVERSATIONS.clear()
+    for record in records:
+        messages = [
+            {
+                "id": f"m{i + 1}",
+                "content": m["content"],
+                "sender": {
+                    "id": m["senderId"],
+                    "displayName": m.get("displayName", "Student"),
+                    "role": m.get("role", "STUDENT"),
+                },
+            }
+            for i, m in enumerate(record.get("messages") or [])
+        ]
+        meta = {
+            "id": record["id"],
+            "title": record["title"],
+            "type": record.get("type", "GROUP"),
+            "members": list(record["members"]),
+        }
+        # seeding sets a conversation's history rather than appending to it
+        LOG.drop(record["id"])
+        SEARCH.drop(record["id"])
+        LOG.create(record["id"], meta).append_many(messages)
+        SEARCH.add_many(record["id"], ((seq, m["content"]) for seq, m in enumerate(messages)))
+        CONVERSATIONS[record["id"]] = meta
+    return {"ok": True, "seeded": len(records), "conversations": len(CONVERSATIONS)}
+
+
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "4017")), reload=False)
+    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "4017")), uds=os.getenv("UDS") or None, reload=False)
@@ -1,30 +1,54 @@
+import asyncio
 import os
+import sys
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Set
 
-import jwt
+import httpx
 from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
-
-JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
-ALGORITHM = "HS256"
-COOKIE_NAME = "access_token"
-
-app = FastAPI(title="Sessions service", version="1.0.0")
-
-origins = os.getenv(
-    "CORS_ORIGINS",
-    "http://localhost:5173,http://127.0.0.1:5173,http://localhost,http://127.0.0.1,http://172.20.95.15:5173,http://172.20.95.15",
-).split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[o.strip() for o in origins if o],
-    allow_origin_regex=".*",
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+from pydantic import BaseModel
+
+# services/ holds the shared `common` package
+SERVICES_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICES_ROOT not in sys.path:
+    sys.path.insert(0, SERVICES_ROOT)
+
+from common.admin import require_admin, seed_records  # noqa: E402
+from common.auth import add_cors, require_role, require_user_id  # noqa: E402
+from common.catalog import Catalog, browse_payload  # noqa: E402
+from common.conditional import etag_matches, not_modified  # noqa: E402
+from common.profiling import add_profiling  # noqa: E402
+from common.responses import FastJSONResponse, fast_loads  # noqa: E402
+from common.tracing import add_tracing  # noqa: E402
+from common.upstream import close_upstream_clients, upstream_client  # noqa: E402
+
+# services holding a CatalogReplica of this catalog; each gets a
+# POST /internal/catalog/invalidate after every change
+CATALOG_SUBSCRIBERS = [
+    url.strip()
+    for url in os.getenv("CATALOG_SUBSCRIBERS", os.getenv("STUDENTS_UPSTREAM", "http://localhost:4011")).split(",")
+    if url.strip()
+]
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    await close_upstream_clients()
+
+
+app = FastAPI(
+    title="Sessions service",
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
 )
 
+add_cors(app)
+add_profiling(app, "sessions")
+add_tracing(app, "sessions")
+
 
 def iso(days: int, hour: int) -> str:
     return (
@@ -115,18 +139,97 @@ def build_sessions() -> List[Dict[str, object]]:
     return sessions
 
 
-SESSIONS: List[Dict[str, object]] = build_sessions()
+CATALOG = Catalog(build_sessions(), log_limit=int(os.getenv("CATALOG_LOG_LIMIT", "1000")))
+# keeps notification tasks referenced until they finish
+PENDING_NOTIFICATIONS: Set[asyncio.Task] = set()
 
 
-def require_user(request: Request) -> str:
-    token = request.cookies.get(COOKIE_NAME)
-    if not token:
-        return "stu-001"
+async def notify_subscriber(target: str, version: int) -> None:
+    client, base_url = upstream_client(target)
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-    except jwt.InvalidTokenError:
-        return "stu-001"
-    return payload.get("sub", "stu-001")
+        await client.post(f"{base_url}/internal/catalog/invalidate", json={"version": version})
+    except httpx.HTTPError:
+        # the replica polls anyway; a missed nudge only delays it
+        pass
+
+
+def catalog_changed(version: int) -> None:
+    for target in CATALOG_SUBSCRIBERS:
+        task = asyncio.get_running_loop().create_task(notify_subscriber(target, version))
+        PENDING_NOTIFICATIONS.add(task)
+        task.add_done_callback(PENDING_NOTIFICATIONS.discard)
+
+
+CATALOG.listeners.append(catalog_changed)
+
+
+class CatalogSession(BaseModel):
+    code: str
+    title: str
+    tutor: str
+    mode: str
+    status: str = "SCHEDULED"
+    start: str
+    end: str
+    rating: float = 4.0
+    dayOfWeek: str
+
+
+class EnrollmentStore:
+    """Enrollments indexed both ways, so "my sessions" and "who is in this
+    session" cost O(k) in the size of the answer instead of a catalog scan.
+
+    Inner dicts are used as insertion-ordered sets.
+    """
+
+    def __init__(self) -> None:
+        self.by_student: Dict[str, Dict[str, None]] = {}
+        self.by_session: Dict[str, Dict[str, None]] = {}
+
+    def enroll(self, student_id: str, session_id: str) -> bool:
+        sessions = self.by_student.setdefault(student_id, {})
+        if session_id in sessions:
+            return False
+        sessions[session_id] = None
+        self.by_session.setdefault(session_id, {})[student_id] = None
+        return True
+
+    def unenroll(self, student_id: str, session_id: str) -> bool:
+        sessions = self.by_student.get(student_id)
+        if not sessions or session_id not in sessions:
+            return False
+        del sessions[session_id]
+        students = self.by_session[session_id]
+        del students[student_id]
+        if not sessions:
+            del self.by_student[student_id]
+        if not students:
+            del self.by_session[session_id]
+        return True
+
+    def sessions_of(self, student_id: str) -> List[str]:
+        return list(self.by_student.get(student_id, ()))
+
+    def students_of(self, session_id: str) -> List[str]:
+        return list(self.by_session.get(session_id, ()))
+
+
+ENROLLMENTS = EnrollmentStore()
+# keep in step with the demo bookings seeded in the students service
+ENROLLMENTS.enroll("stu-001", "sess-1")
+ENROLLMENTS.enroll("stu-001", "sess-2")
+
+
+def find_session(session_id: str) -> Dict[str, object]:
+    session = CATALOG.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="not found")
+    return session
+
+
+require_admin_role = require_role("ADMIN")
+# enrolment lists name other students; only tutors and admins see them
+require_staff = require_role("TUTOR", "ADMIN")
 
 
 @app.get("/health")
@@ -135,16 +238,88 @@ async def health():
 
 
 @app.get("/student/list")
-async def list_sessions(user_id=Depends(require_user)):
-    return {"sessions": [s for s in SESSIONS if s["studentId"] == user_id]}
+async def list_sessions(user_id=Depends(require_user_id)):
+    sessions = [s for s in map(CATALOG.get, ENROLLMENTS.sessions_of(user_id)) if s is not None]
+    return {"sessions": sessions}
+
+
+@app.post("/session/{session_id}/enroll")
+async def enroll(session_id: str, user_id=Depends(require_user_id)):
+    find_session(session_id)
+    changed = ENROLLMENTS.enroll(user_id, session_id)
+    return {"ok": True, "sessionId": session_id, "enrolled": True, "changed": changed}
+
+
+@app.delete("/session/{session_id}/enroll")
+async def unenroll(session_id: str, user_id=Depends(require_user_id)):
+    find_session(session_id)
+    changed = ENROLLMENTS.unenroll(user_id, session_id)
+    return {"ok": True, "sessionId": session_id, "enrolled": False, "changed": changed}
+
+
+@app.get("/session/{session_id}/students")
+async def session_students(session_id: str, _staff=Depends(require_staff)):
+    find_session(session_id)
+    students = ENROLLMENTS.students_of(session_id)
+    return {"sessionId": session_id, "students": students, "count": len(students)}
 
 
 @app.get("/browse")
-async def browse_sessions(_user_id=Depends(require_user)):
-    return {"ok": True, "sessions": SESSIONS}
+async def browse_sessions(request: Request, _user_id=Depends(require_user_id)):
+    etag = CATALOG.etag()
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    payload = browse_payload(CATALOG, request.query_params.get("sinceVersion"))
+    return FastJSONResponse(payload, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+@app.get("/catalog")
+async def catalog_feed(request: Request):
+    # read by the catalog replicas in other services; same body as /browse
+    etag = CATALOG.etag()
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    payload = browse_payload(CATALOG, request.query_params.get("sinceVersion"))
+    return FastJSONResponse(payload, headers={"ETag": etag})
+
+
+@app.put("/catalog/{session_id}")
+async def upsert_catalog_session(session_id: str, body: CatalogSession, _admin=Depends(require_admin_role)):
+    session = {"id": session_id, **body.model_dump()}
+    version = CATALOG.upsert(session)
+    return {"ok": True, "version": version, "session": session}
+
+
+@app.delete("/catalog/{session_id}")
+async def delete_catalog_session(session_id: str, _admin=Depends(require_admin_role)):
+    if not CATALOG.remove(session_id):
+        raise HTTPException(status_code=404, detail="not found")
+    return {"ok": True, "version": CATALOG.version}
+
+
+# what the browse filters and the students service read from every session
+SESSION_FIELDS = ("id", "code", "title", "mode", "start", "end", "dayOfWeek")
+
+
+@app.post("/admin/seed")
+async def admin_seed(request: Request, _admin=Depends(require_admin)):
+    body = fast_loads(await request.body())
+    sessions = seed_records(body, "sessions", SESSION_FIELDS)
+    enrollments = body.get("enrollments") or {}
+    if not isinstance(enrollments, dict) or not all(isinstance(ids, list) for ids in enrollments.values()):
+        raise HTTPException(status_code=400, detail="enrollments must map student ids to lists of session ids")
+    if body.get("sessions") is not None:
+        CATALOG.replace(sessions)
+    if body.get("replace"):
+        ENROLLMENTS.by_student.clear()
+        ENROLLMENTS.by_session.clear()
+    for student_id, session_ids in enrollments.items():
+        for sid in session_ids:
+            ENROLLMENTS.enroll(student_id, sid)
+    return {"ok": True, "sessions": len(CATALOG), "version": CATALOG.version, "students": len(ENROLLMENTS.by_student)}
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "4016")), reload=False)
+    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "4016")), uds=os.getenv("UDS") or None, reload=False)
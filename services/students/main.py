@@ -1,33 +1,66 @@
-import base64
 import os
+import sys
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-import jwt
+import httpx
 from fastapi import Depends, FastAPI, File, HTTPException, Request, UploadFile
-from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
+# services/ holds the shared `common` package
+SERVICES_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICES_ROOT not in sys.path:
+    sys.path.insert(0, SERVICES_ROOT)
 
-JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
-ALGORITHM = "HS256"
-COOKIE_NAME = "access_token"
+from common.admin import require_admin, seed_records  # noqa: E402
+from common.auth import add_cors, require_role  # noqa: E402
+from common.avatars import AvatarStore, add_upload_limit, avatar_stats, process_avatar, shutdown_pool  # noqa: E402
+from common.catalog import Catalog, CatalogReplica, browse_payload  # noqa: E402
+from common.conditional import body_etag, etag_matches, not_modified  # noqa: E402
+from common.idempotency import add_idempotency  # noqa: E402
+from common.profiling import add_profiling  # noqa: E402
+from common.recommend import SessionRanker  # noqa: E402
+from common.responses import FastJSONResponse, fast_loads  # noqa: E402
+from common.schedule import ScheduleIndex  # noqa: E402
+from common.search import MessageIndex  # noqa: E402
+from common.tracing import add_tracing  # noqa: E402
+from common.upstream import close_upstream_clients  # noqa: E402
 
-app = FastAPI(title="Students service", version="1.0.0")
 
-origins = os.getenv(
-    "CORS_ORIGINS",
-    "http://localhost:5173,http://127.0.0.1:5173,http://localhost,http://127.0.0.1,http://172.20.95.15:5173",
-).split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[o.strip() for o in origins if o],
-    allow_origin_regex=".*",
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+SESSIONS_UPSTREAM = os.getenv("SESSIONS_UPSTREAM", "http://localhost:4016")
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    try:
+        await CATALOG_REPLICA.refresh()
+    except httpx.HTTPError:
+        # sessions not up yet; the background loop keeps retrying
+        pass
+    CATALOG_REPLICA.start()
+    SEARCH.start()
+    yield
+    await CATALOG_REPLICA.stop()
+    await SEARCH.stop()
+    await close_upstream_clients()
+    shutdown_pool()
+
+
+app = FastAPI(
+    title="Students service",
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
 )
 
+# inside CORS, so replayed responses get the current CORS headers
+IDEMPOTENCY = add_idempotency(app)
+add_upload_limit(app)
+add_cors(app)
+add_profiling(app, "students")
+add_tracing(app, "students")
+
 
 class UpdateProfile(BaseModel):
     fullName: Optional[str] = None
@@ -36,22 +69,10 @@ class UpdateProfile(BaseModel):
     bio: Optional[str] = None
 
 
-def decode_token(request: Request) -> Dict:
-    token = request.cookies.get(COOKIE_NAME)
-    if not token:
-        raise HTTPException(status_code=401, detail="unauthorized")
-    try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-    except jwt.InvalidTokenError as exc:
-        raise HTTPException(status_code=401, detail="unauthorized") from exc
-
-
-def require_student(request: Request) -> Dict:
-    payload = decode_token(request)
-    role = payload.get("role")
-    if role != "STUDENT":
-        raise HTTPException(status_code=403, detail="forbidden")
-    return payload
+require_student = require_role("STUDENT")
+MAX_BATCH_IDS = 100
+MAX_ALTERNATIVES = 20
+MAX_RECOMMENDED = 50
 
 
 def iso(days_from_now: int, hour: int = 9) -> str:
@@ -76,89 +97,13 @@ def format_phone(value: str) -> str:
         rest = rest[3:]
     return " ".join(chunks)
 
-def build_sessions() -> List[Dict[str, object]]:
-    tutors = [
-        "Nguyen Tuan Anh",
-        "Tran Hong Tai",
-        "Tran Tuan Anh",
-        "Tran Ngoc Bao Duy",
-        "Vo Thanh Hung",
-        "Tran Huy",
-        "Nguyen An Khuong",
-        "Nguyen Hua Phung",
-        "Le Thanh Sach",
-        "Tran Giang Son",
-        "Vuong Ba Thinh",
-        "Luong Minh Hien",
-        "Vu Van Tien",
-        "Le Binh Dang",
-        "Tran Nguyen Minh Duy",
-        "Nguyen Quang Duc",
-        "Mai Xuan Toan",
-        "Thi Khac Quan",
-        "Nguyen Quoc Minh",
-        "Duong Duc Tin",
-        "Nguyen Duc Dung",
-        "Le Hong Trang",
-    ]
-
-    subjects = [
-        ("CO1005", "Introduction to Computing"),
-        ("CO1023", "Digital Systems"),
-        ("CO1007", "Programming Fundamentals"),
-        ("CO2003", "Data Structures and Algorithms"),
-        ("CO2011", "Computer Architecture"),
-        ("CO2013", "Operating Systems"),
-        ("CO2017", "Advanced Programming"),
-        ("CO2001", "Computer Networks"),
-        ("CO3005", "Software Engineering"),
-        ("CO3001", "Probability and Statistics"),
-        ("CO3011", "Compiler Construction"),
-        ("CO3013", "Software Testing"),
-        ("CO3001A", "Web Programming"),
-        ("CO3041", "Computer Graphics"),
-        ("CO3047", "Computer Vision"),
-        ("CO3045", "Mobile Development"),
-        ("CO3033", "Information Security"),
-        ("CO3059", "Cryptography"),
-        ("CO3061", "Distributed Systems"),
-        ("CO3083", "Parallel Computing"),
-        ("CO3115", "Machine Learning"),
-        ("CO3089", "NLP"),
-    ]
-
-    days = ["MON", "TUE", "WED", "THU", "FRI", "SAT"]
-    slots = [("07:00", "09:00"), ("09:00", "11:00"), ("13:00", "15:00"), ("15:00", "17:00"), ("18:00", "20:00")]
-    modes = ["Online", "On campus"]
-
-    sessions: List[Dict[str, object]] = []
-    idx = 0
-    for subj_code, subj_title in subjects:
-        for day in days:
-            for start, end in slots:
-                if len(sessions) >= 90:
-                    return sessions
-                tutor = tutors[idx % len(tutors)]
-                mode = modes[(idx + len(day)) % 2]
-                rating = 4.0 + (idx % 10) * 0.1
-                sessions.append(
-                    {
-                        "id": f"sess-{idx+1}",
-                        "code": subj_code,
-                        "title": subj_title,
-                        "tutor": tutor,
-                        "mode": mode,
-                        "start": start,
-                        "end": end,
-                        "rating": round(rating, 1),
-                        "dayOfWeek": day,
-                    }
-                )
-                idx += 1
-    return sessions
-
-
-SESSIONS: List[Dict[str, object]] = build_sessions()
+# the sessions service owns the catalog; this is a replica of it
+CATALOG = Catalog(log_limit=int(os.getenv("CATALOG_LOG_LIMIT", "1000")))
+CATALOG_REPLICA = CatalogReplica(
+    CATALOG,
+    SESSIONS_UPSTREAM,
+    refresh_seconds=float(os.getenv("CATALOG_REFRESH_SECONDS", "30")),
+)
 
 
 def january_date(day: int, hour: int = 9) -> str:
@@ -302,6 +247,11 @@ CONVERSATIONS: Dict[str, Dict[str, object]] = {
 }
 
 
+SEARCH = MessageIndex()
+for _conv in CONVERSATIONS.values():
+    SEARCH.add_many(_conv["id"], ((seq, m["content"]) for seq, m in enumerate(_conv["messages"])))
+
+
 def ensure_student(student_id: str) -> Dict[str, object]:
     if student_id not in STUDENTS:
         STUDENTS[student_id] = {
@@ -333,6 +283,9 @@ async def health():
 @app.get("/sessions/browse")
 async def browse_sessions(request: Request, payload=Depends(require_student)):
     _ = payload
+    etag = CATALOG.etag()
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
     q = request.query_params
     code = (q.get("code") or "").strip().upper()
     from_hour = int(q.get("fromHour") or 0)
@@ -342,23 +295,23 @@ async def browse_sessions(request: Request, payload=Depends(require_student)):
     days_raw = (q.get("days") or "").split(",")
     days = [d.strip().upper() for d in days_raw if d.strip()]
 
-    filtered: List[Dict[str, object]] = []
-    for c in SESSIONS:
+    def keep(c: Dict[str, object]) -> bool:
         if code and code not in str(c["code"]).upper():
-            continue
+            return False
         start_h = int(str(c["start"]).split(":")[0])
         end_h = int(str(c["end"]).split(":")[0])
         if start_h < from_hour or end_h > to_hour:
-            continue
+            return False
         if c["mode"] == "Online" and not allow_online:
-            continue
+            return False
         if c["mode"] == "On campus" and not allow_oncampus:
-            continue
+            return False
         if days and c["dayOfWeek"] not in days:
-            continue
-        filtered.append(c)
+            return False
+        return True
 
-    return {"ok": True, "sessions": filtered}
+    body = browse_payload(CATALOG, q.get("sinceVersion"), keep)
+    return FastJSONResponse(body, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
 
 
 @app.get("/courses/browse")
@@ -395,7 +348,7 @@ async def conversation_messages(conv_id: str, payload=Depends(require_student)):
     conv = CONVERSATIONS.get(conv_id)
     if not conv or student_id not in conv["members"]:
         raise HTTPException(status_code=403, detail="forbidden")
-    return {"messages": conv.get("messages", [])}
+    return FastJSONResponse({"messages": conv.get("messages", [])})
 
 
 @app.post("/messaging/conversations/{conv_id}/messages")
@@ -421,60 +374,116 @@ async def post_message(conv_id: str, request: Request, payload=Depends(require_s
             "role": "STUDENT",
         },
     }
-    conv.setdefault("messages", []).append(msg)
+    messages = conv.setdefault("messages", [])
+    messages.append(msg)
+    SEARCH.enqueue(conv_id, len(messages) - 1, msg["content"])
     return {"message": msg}
 
 
+@app.get("/messaging/search")
+async def search_messages(q: str, offset: int = 0, limit: int = 20, payload=Depends(require_student)):
+    student_id = payload.get("sub")
+    mine = [conv_id for conv_id, conv in CONVERSATIONS.items() if student_id in conv["members"]]
+    offset = max(0, offset)
+    hits, total = SEARCH.search(q, mine, offset, max(1, min(limit, 100)))
+    results = [
+        {
+            "conversationId": conv_id,
+            "conversationTitle": CONVERSATIONS[conv_id]["title"],
+            "message": CONVERSATIONS[conv_id]["messages"][seq],
+            "score": round(score, 3),
+        }
+        for score, conv_id, seq in hits
+    ]
+    end = offset + len(results)
+    return {"results": results, "total": total, "next": end if end < total else None}
+
+
+def book_session(data: Dict[str, object], course: Dict[str, object]) -> Dict[str, object]:
+    sid = course["id"]
+    start_hour = int(str(course["start"]).split(":")[0])
+    end_hour = int(str(course["end"]).split(":")[0])
+    entry = {
+        "id": f"reg-{sid}-{len(data.get('bookedSessions', []))}",
+        "sessionId": sid,
+        "code": course["code"],
+        "title": course["title"],
+        "addedAt": now_iso(),
+        "scheduledAt": january_date(10, start_hour),
+        "startDate": january_date(10, start_hour),
+        "endDate": january_date(25, end_hour),
+    }
+    data.setdefault("bookedSessions", []).append(entry)
+    data.setdefault("progress", []).append(
+        {
+            "id": entry["id"],
+            "sessionId": sid,
+            "code": course["code"],
+            "title": course["title"],
+            "startDate": entry["startDate"],
+            "endDate": entry["endDate"],
+        }
+    )
+    data.setdefault("history", {}).setdefault("bookings", []).append(
+        {
+            "id": entry["id"],
+            "date": now_iso(),
+            "courseCode": course["code"],
+            "courseTitle": course["title"],
+            "mode": course["mode"],
+            "status": "SCHEDULED",
+        }
+    )
+    return entry
+
+
+# student id -> (catalog version it was built at, index of active bookings)
+SCHEDULES: Dict[str, Tuple[int, ScheduleIndex]] = {}
+
+
+def schedule_for(student_id: str, data: Dict[str, object]) -> ScheduleIndex:
+    """The student's booked time slots, rebuilt when the catalog has changed."""
+    cached = SCHEDULES.get(student_id)
+    if cached is not None and cached[0] == CATALOG.version:
+        return cached[1]
+    index = ScheduleIndex()
+    for booking in data.get("bookedSessions", []):
+        course = CATALOG.get(booking.get("sessionId"))
+        if course and booking.get("status") != "CANCELLED":
+            index.add(course["id"], course["dayOfWeek"], course["start"], course["end"])
+    SCHEDULES[student_id] = (CATALOG.version, index)
+    return index
+
+
+def bookings_changed(student_id: str) -> None:
+    RECOMMENDED.pop(student_id, None)
+
+
 @app.post("/register")
 async def register_sessions(request: Request, payload=Depends(require_student)):
     student_id = payload.get("sub")
     data = ensure_student(student_id)
     body = await request.json()
     ids = body.get("sessionIds") or []
-    now = now_iso()
+    schedule = schedule_for(student_id, data)
+    booked = {bs.get("sessionId") for bs in data.get("bookedSessions", [])}
     added = []
+    conflicts = []
     for sid in ids:
-        course = next((c for c in SESSIONS if c["id"] == sid), None)
-        if not course:
+        course = CATALOG.get(sid)
+        if not course or sid in booked:
             continue
-        already = any(bs.get("sessionId") == sid for bs in data.get("bookedSessions", []))
-        if already:
+        # also catches clashes between sessions of this same request
+        clashes = schedule.conflicts(course["dayOfWeek"], course["start"], course["end"])
+        if clashes:
+            conflicts.append({"sessionId": sid, "conflictsWith": clashes})
             continue
-        start_hour = int(str(course["start"]).split(":")[0])
-        end_hour = int(str(course["end"]).split(":")[0])
-        entry = {
-            "id": f"reg-{sid}-{len(data.get('bookedSessions', []))}",
-            "sessionId": sid,
-            "code": course["code"],
-            "title": course["title"],
-            "addedAt": now_iso(),
-            "scheduledAt": january_date(10, start_hour),
-            "startDate": january_date(10, start_hour),
-            "endDate": january_date(25, end_hour),
-        }
-        data.setdefault("bookedSessions", []).append(entry)
-        data.setdefault("progress", []).append(
-            {
-                "id": entry["id"],
-                "sessionId": sid,
-                "code": course["code"],
-                "title": course["title"],
-                "startDate": entry["startDate"],
-                "endDate": entry["endDate"],
-            }
-        )
-        data.setdefault("history", {}).setdefault("bookings", []).append(
-            {
-                "id": entry["id"],
-                "date": now_iso(),
-                "courseCode": course["code"],
-                "courseTitle": course["title"],
-                "mode": course["mode"],
-                "status": "SCHEDULED",
-            }
-        )
-        added.append(entry)
-    return {"ok": True, "added": added}
+        added.append(book_session(data, course))
+        booked.add(sid)
+        schedule.add(sid, course["dayOfWeek"], course["start"], course["end"])
+    if added:
+        bookings_changed(student_id)
+    return {"ok": True, "added": added, "conflicts": conflicts}
 
 # alias to keep compatibility
 @app.post("/students/register")
@@ -483,7 +492,7 @@ async def register_sessions_alias(request: Request, payload=Depends(require_stud
 
 
 @app.get("/profile")
-async def profile(payload=Depends(require_student)):
+async def profile(request: Request, payload=Depends(require_student)):
     student_id = payload.get("sub")
     data = ensure_student(student_id)
     # compute simple progress from attendance
@@ -508,45 +517,127 @@ async def profile(payload=Depends(require_student)):
                     "percent": 80,
                 }
             )
-    return {
-        "ok": True,
-        "student": data["me"],
-        "stats": data["stats"],
-        "preferences": data["preferences"],
-        "bookings": data.get("bookedSessions", []),
-        "history": data["history"],
-        "announcements": data["announcements"],
-        "status": "Students service ready",
-    }
+    response = FastJSONResponse(
+        {
+            "ok": True,
+            "student": data["me"],
+            "stats": data["stats"],
+            "preferences": data["preferences"],
+            "bookings": data.get("bookedSessions", []),
+            "history": data["history"],
+            "announcements": data["announcements"],
+            "status": "Students service ready",
+        }
+    )
+    # the profile is assembled from several stores, so tag the rendered bytes
+    etag = body_etag(response.body)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 
 @app.get("/students/profile")
-async def profile_students(payload=Depends(require_student)):
-    return await profile(payload)
+async def profile_students(request: Request, payload=Depends(require_student)):
+    return await profile(request, payload)
+
+
+def bookings_by_session(data: Dict[str, object]) -> Dict[str, Dict[str, object]]:
+    # the last booking of a session wins, as it always has
+    return {str(b.get("sessionId")): b for b in data.get("bookedSessions", [])}
+
+
+def session_with_status(session: Dict[str, object], booking: Optional[Dict[str, object]]) -> Dict[str, object]:
+    if not booking:
+        return {"session": session, "status": "AVAILABLE"}
+    merged = {**session, **booking}
+    merged["originalCode"] = session.get("code")
+    merged["originalTitle"] = session.get("title")
+    merged["code"] = session.get("code")
+    merged["title"] = session.get("title")
+    return {"session": merged, "status": "SCHEDULED"}
 
 
 @app.get("/session/{session_id}")
 async def session_detail(session_id: str, payload=Depends(require_student)):
     student_id = payload.get("sub")
     data = ensure_student(student_id)
-    session = next((s for s in SESSIONS if s["id"] == session_id), None)
+    session = CATALOG.get(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="not found")
-    # attach status if booked
-    status = "AVAILABLE"
-    booking_info: Optional[Dict[str, object]] = None
-    for b in data.get("bookedSessions", []):
-        if b.get("sessionId") == session_id:
-            status = "SCHEDULED"
-            booking_info = b
-    if booking_info:
-        merged = {**session, **booking_info}
-        merged["originalCode"] = session.get("code")
-        merged["originalTitle"] = session.get("title")
-        merged["code"] = session.get("code")
-        merged["title"] = session.get("title")
-        return {"session": merged, "status": status}
-    return {"session": session, "status": status}
+    return session_with_status(session, bookings_by_session(data).get(session_id))
+
+
+@app.get("/sessions")
+async def session_details(ids: str = "", alternatives: int = 0, payload=Depends(require_student)):
+    """Detail and booking status of several sessions in one call.
+
+    `alternatives=n` adds up to n (at most MAX_ALTERNATIVES) other sessions
+    of each one's course (any sessions when the course has no others), for
+    the reschedule picker.
+    """
+    alternatives = min(alternatives, MAX_ALTERNATIVES)
+    wanted = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if len(wanted) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BATCH_IDS} ids")
+    data = ensure_student(payload.get("sub"))
+    bookings = bookings_by_session(data)
+    found: List[Dict[str, object]] = []
+    missing: List[str] = []
+    others: Dict[str, List[Dict[str, object]]] = {}
+    for session_id in wanted:
+        session = CATALOG.get(session_id)
+        if not session:
+            missing.append(session_id)
+            continue
+        found.append(session_with_status(session, bookings.get(session_id)))
+        if alternatives > 0:
+            candidates = [s for s in CATALOG.with_code(str(session.get("code"))) if s["id"] != session_id]
+            if not candidates:
+                candidates = [s for s in CATALOG.sessions()[:alternatives + 1] if s["id"] != session_id]
+            others[session_id] = candidates[:alternatives]
+    body: Dict[str, object] = {"ok": True, "sessions": found, "missing": missing}
+    if alternatives > 0:
+        body["alternatives"] = others
+    return FastJSONResponse(body)
+
+
+RANKER = SessionRanker(CATALOG)
+# student id -> ((catalog version, k, preferences), response body)
+RECOMMENDED: Dict[str, Tuple[Tuple, Dict[str, object]]] = {}
+
+
+@app.get("/sessions/recommended")
+async def recommended_sessions(k: int = 10, payload=Depends(require_student)):
+    """The k best sessions for the student, highest score first.
+
+    See common/recommend.py for the score. Sessions already booked, and
+    those clashing with a booked time slot, are left out. The answer is
+    kept per student until their bookings, preferences or the catalog change.
+    """
+    k = max(1, min(k, MAX_RECOMMENDED))
+    student_id = payload.get("sub")
+    data = ensure_student(student_id)
+    preferences = list(data.get("preferences") or [])
+    key = (CATALOG.version, k, tuple(preferences))
+    cached = RECOMMENDED.get(student_id)
+    if cached is not None and cached[0] == key:
+        return FastJSONResponse(cached[1])
+    history = data.get("history", {})
+    codes = {h.get("courseCode") for h in (*history.get("attendance", []), *history.get("bookings", []))}
+    booked = {b.get("sessionId") for b in data.get("bookedSessions", [])}
+    schedule = schedule_for(student_id, data)
+
+    def skip(session: Dict[str, object]) -> bool:
+        if session["id"] in booked or session.get("status") == "CANCELLED":
+            return True
+        return bool(schedule.conflicts(session["dayOfWeek"], session["start"], session["end"]))
+
+    ranked = RANKER.top(k, preferences, codes, skip)
+    body = {"ok": True, "sessions": [{**session, "score": score} for score, session in ranked]}
+    RECOMMENDED[student_id] = (key, body)
+    return FastJSONResponse(body)
 
 
 @app.post("/session/{session_id}/cancel")
@@ -558,6 +649,8 @@ async def cancel_session(session_id: str, request: Request, payload=Depends(requ
         if b.get("sessionId") == session_id:
             b["status"] = "CANCELLED"
             b["cancelReason"] = reason
+    schedule_for(student_id, data).remove(session_id)
+    bookings_changed(student_id)
     return {"ok": True}
 
 
@@ -573,13 +666,30 @@ async def reschedule_session(session_id: str, request: Request, payload=Depends(
     if not booking:
         raise HTTPException(status_code=404, detail="booking not found")
 
-    booking["rescheduleReason"] = reason
-    booking["rescheduleNotes"] = notes
-
+    # validate the new session first: a 404 or 409 leaves the booking as it was
+    new_session = None
     if new_session_id:
-        new_session = next((s for s in SESSIONS if s["id"] == new_session_id), None)
+        new_session = CATALOG.get(new_session_id)
         if not new_session:
             raise HTTPException(status_code=404, detail="new session not found")
+        schedule = schedule_for(student_id, data)
+        clashes = schedule.conflicts(
+            new_session["dayOfWeek"], new_session["start"], new_session["end"], ignore=session_id
+        )
+        if clashes:
+            return FastJSONResponse(
+                {
+                    "ok": False,
+                    "detail": "schedule conflict",
+                    "conflicts": [{"sessionId": new_session["id"], "conflictsWith": clashes}],
+                },
+                status_code=409,
+            )
+
+    booking["rescheduleReason"] = reason
+    booking["rescheduleNotes"] = notes
+
+    if new_session is not None:
         start_hour = int(str(new_session["start"]).split(":")[0])
         end_hour = int(str(new_session["end"]).split(":")[0])
         booking["sessionId"] = new_session["id"]
@@ -637,8 +747,11 @@ async def reschedule_session(session_id: str, request: Request, payload=Depends(
                     "status": "RESCHEDULED",
                 }
             )
+        schedule.remove(session_id)
+        schedule.add(new_session["id"], new_session["dayOfWeek"], new_session["start"], new_session["end"])
     else:
         booking["status"] = "RESCHEDULED"
+    bookings_changed(student_id)
     return {"ok": True, "booking": booking}
 
 
@@ -666,14 +779,16 @@ async def student_profile(payload=Depends(require_student)):
                     "percent": 80,
                 }
             )
-    return {
-        "me": data["me"],
-        "preferences": data["preferences"],
-        "history": data["history"],
-        "bookedSessions": data.get("bookedSessions", []),
-        "progress": data.get("progress", []),
-        "stats": data["stats"],
-    }
+    return FastJSONResponse(
+        {
+            "me": data["me"],
+            "preferences": data["preferences"],
+            "history": data["history"],
+            "bookedSessions": data.get("bookedSessions", []),
+            "progress": data.get("progress", []),
+            "stats": data["stats"],
+        }
+    )
 
 
 @app.put("/users/student/profile")
@@ -706,15 +821,13 @@ async def update_profile_root(body: UpdateProfile, payload=Depends(require_stude
     return await update_profile(body, payload)
 
 
+# student id -> avatar thumbnails, kept out of the profile
+AVATARS = AvatarStore()
+
+
 @app.post("/users/student/profile/avatar")
 async def update_avatar(avatar: UploadFile = File(...), payload=Depends(require_student)):
-    student_id = payload.get("sub")
-    data = ensure_student(student_id)
-    content = await avatar.read()
-    encoded = base64.b64encode(content).decode("ascii")
-    mime = avatar.content_type or "image/png"
-    data["me"]["avatarUrl"] = f"data:{mime};base64,{encoded}"
-    return {"ok": True, "avatarUrl": data["me"]["avatarUrl"]}
+    return await update_avatar_students(avatar, payload)
 
 @app.post("/students/profile/avatar")
 async def update_avatar_students(file: UploadFile = File(None), payload=Depends(require_student)):
@@ -722,11 +835,10 @@ async def update_avatar_students(file: UploadFile = File(None), payload=Depends(
         raise HTTPException(status_code=400, detail="file required")
     student_id = payload.get("sub")
     data = ensure_student(student_id)
-    content = await file.read()
-    encoded = base64.b64encode(content).decode("ascii")
-    mime = file.content_type or "image/png"
-    data["me"]["avatarUrl"] = f"data:{mime};base64,{encoded}"
-    return {"ok": True, "avatarUrl": data["me"]["avatarUrl"]}
+    avatar = await process_avatar(file)
+    sizes = AVATARS.put(student_id, avatar["mime"], avatar["variants"])
+    data["me"]["avatarUrl"] = avatar["avatarUrl"]
+    return {"ok": True, "avatarUrl": avatar["avatarUrl"], "thumbnailSizes": sizes, "stats": avatar["stats"]}
 
 @app.get("/students/profile/avatar")
 async def get_avatar_students(payload=Depends(require_student)):
@@ -743,6 +855,85 @@ async def update_avatar_root(file: UploadFile = File(None), payload=Depends(requ
 async def get_avatar_root(payload=Depends(require_student)):
     return await get_avatar_students(payload)
 
+@app.get("/students/profile/avatar/{size}")
+async def avatar_thumbnail_students(size: int, request: Request, payload=Depends(require_student)):
+    return AVATARS.response(str(payload.get("sub")), size, request.headers.get("if-none-match"))
+
+@app.get("/profile/avatar/{size}")
+async def avatar_thumbnail_root(size: int, request: Request, payload=Depends(require_student)):
+    return await avatar_thumbnail_students(size, request, payload)
+
+
+def seed_student(record: Dict[str, object]) -> Dict[str, object]:
+    """Builds a student from a compact generator record (see tools/synth.py)."""
+    student_id = str(record["id"])
+    STUDENTS.pop(student_id, None)
+    SCHEDULES.pop(student_id, None)
+    AVATARS.drop(student_id)
+    bookings_changed(student_id)
+    data = ensure_student(student_id)
+    me = data["me"]
+    for field in ("fullName", "email", "studentId", "major", "phone", "bio"):
+        if record.get(field) is not None:
+            me[field] = record[field]
+    data["preferences"] = list(record.get("preferences") or [])
+    for sid in record.get("bookings") or []:
+        course = CATALOG.get(sid)
+        if course:
+            book_session(data, course)
+    attendance = data["history"]["attendance"]
+    for sid, days_ago in record.get("attended") or []:
+        course = CATALOG.get(sid)
+        if course:
+            attendance.append(
+                {
+                    "id": f"att-{sid}-{len(attendance)}",
+                    "sessionId": sid,
+                    "date": iso(-int(days_ago), int(str(course["start"]).split(":")[0])),
+                    "courseCode": course["code"],
+                    "courseTitle": course["title"],
+                    "mode": course["mode"],
+                }
+            )
+    data["stats"] = {"hoursStudied": 2.0 * len(attendance), "sessionsAttended": len(attendance)}
+    return data
+
+
+@app.post("/internal/catalog/invalidate")
+async def invalidate_catalog():
+    # sent by the sessions service after a catalog change
+    CATALOG_REPLICA.invalidate()
+    return {"ok": True}
+
+
+@app.get("/admin/avatars/stats")
+async def avatar_upload_stats(_admin=Depends(require_admin)):
+    return avatar_stats()
+
+
+@app.post("/admin/seed")
+async def admin_seed(request: Request, _admin=Depends(require_admin)):
+    body = fast_loads(await request.body())
+    records = seed_records(body, "students", ("id",))
+    for i, record in enumerate(records):
+        bookings = record.get("bookings") or []
+        attended = record.get("attended") or []
+        if not isinstance(bookings, list) or not isinstance(attended, list):
+            raise HTTPException(status_code=400, detail=f"students[{i}]: bookings and attended must be lists")
+        for entry in attended:
+            if not (isinstance(entry, list) and len(entry) == 2 and isinstance(entry[1], int)):
+                raise HTTPException(status_code=400, detail=f"students[{i}]: attended entries are [sessionId, daysAgo]")
+    # bookings are checked against the catalog; make sure it is current
+    await CATALOG_REPLICA.refresh()
+    if body.get("replace"):
+        STUDENTS.clear()
+        SCHEDULES.clear()
+        AVATARS.by_owner.clear()
+        RECOMMENDED.clear()
+    for record in records:
+        seed_student(record)
+    return {"ok": True, "seeded": len(records), "students": len(STUDENTS), "sessions": len(CATALOG)}
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -751,5 +942,6 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=int(os.getenv("PORT", "4011")),
+        uds=os.getenv("UDS") or None,
         reload=False,
-    )
+    )
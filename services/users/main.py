@@ -1,30 +1,43 @@
 import os
-from typing import Dict
+import sys
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
 
-import jwt
 from fastapi import Depends, FastAPI, HTTPException, Request, UploadFile, File
-from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
-JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
-ALGORITHM = "HS256"
-COOKIE_NAME = "access_token"
-
-app = FastAPI(title="Users service", version="1.0.0")
-
-origins = os.getenv(
-    "CORS_ORIGINS",
-    "http://localhost:5173,http://127.0.0.1:5173,http://localhost,http://127.0.0.1,http://172.20.95.15:5173,http://172.20.95.15",
-).split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[o.strip() for o in origins if o],
-    allow_origin_regex=".*",
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# services/ holds the shared `common` package
+SERVICES_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICES_ROOT not in sys.path:
+    sys.path.insert(0, SERVICES_ROOT)
+
+from common.admin import require_admin, seed_records  # noqa: E402
+from common.auth import add_cors, require_user_id  # noqa: E402
+from common.avatars import AvatarStore, add_upload_limit, avatar_stats, process_avatar, shutdown_pool  # noqa: E402
+from common.conditional import etag_matches, not_modified  # noqa: E402
+from common.profiling import add_profiling  # noqa: E402
+from common.responses import FastJSONResponse, fast_loads  # noqa: E402
+from common.tracing import add_tracing  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    shutdown_pool()
+
+
+app = FastAPI(
+    title="Users service",
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
 )
 
+add_upload_limit(app)
+add_cors(app)
+add_profiling(app, "users")
+add_tracing(app, "users")
+
 
 class UpdateProfile(BaseModel):
     fullName: str
@@ -33,6 +46,13 @@ class UpdateProfile(BaseModel):
     bio: str = ""
 
 
+class PatchProfile(BaseModel):
+    fullName: Optional[str] = None
+    phone: Optional[str] = None
+    major: Optional[str] = None
+    bio: Optional[str] = None
+
+
 USERS: Dict[str, Dict[str, str]] = {
     "stu-001": {
         "id": "stu-001",
@@ -46,54 +66,111 @@ USERS: Dict[str, Dict[str, str]] = {
 }
 
 
-def require_user(request: Request) -> Dict[str, str]:
-    token = request.cookies.get(COOKIE_NAME)
-    if not token:
-        raise HTTPException(status_code=401, detail="unauthorized")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-    except jwt.InvalidTokenError as exc:
-        raise HTTPException(status_code=401, detail="unauthorized") from exc
-    user_id = payload.get("sub")
-    if not user_id or user_id not in USERS:
+# user id -> profile version, bumped on every change
+VERSIONS: Dict[str, int] = {}
+# user id -> avatar thumbnails, kept out of the profile
+AVATARS = AvatarStore()
+
+
+def require_user(user_id: str = Depends(require_user_id)) -> Dict[str, str]:
+    if user_id not in USERS:
         raise HTTPException(status_code=401, detail="unauthorized")
     return USERS[user_id]
 
 
+def profile_etag(user: Dict[str, str]) -> str:
+    return f'"profile-{user["id"]}-{VERSIONS.get(user["id"], 0)}"'
+
+
+def check_if_match(request: Request, user: Dict[str, str]) -> None:
+    # the tag names a version, so the W/ the gateway adds when it compresses
+    # the body does not make it ambiguous; compare the opaque part
+    header = request.headers.get("if-match")
+    if header and not etag_matches(header, profile_etag(user)):
+        raise HTTPException(status_code=412, detail="profile changed")
+
+
+def saved(user: Dict[str, str], body: Dict[str, object]) -> FastJSONResponse:
+    VERSIONS[user["id"]] = VERSIONS.get(user["id"], 0) + 1
+    return FastJSONResponse(body, headers={"ETag": profile_etag(user)})
+
+
 @app.get("/health")
 async def health():
     return {"ok": True, "svc": "users"}
 
 
 @app.get("/student/profile")
-async def profile(user=Depends(require_user)):
-    return {"me": user}
+async def profile(request: Request, user=Depends(require_user)):
+    etag = profile_etag(user)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    return FastJSONResponse({"me": user}, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
 
 
 @app.put("/student/profile")
-async def update_profile(body: UpdateProfile, user=Depends(require_user)):
+async def update_profile(body: UpdateProfile, request: Request, user=Depends(require_user)):
+    check_if_match(request, user)
     user["fullName"] = body.fullName.strip()
     user["phone"] = body.phone.strip()
     user["major"] = body.major.strip()
     user["bio"] = body.bio.strip()
-    return {"ok": True, "me": user}
+    return saved(user, {"ok": True, "me": user})
+
+
+@app.patch("/student/profile")
+async def patch_profile(body: PatchProfile, request: Request, user=Depends(require_user)):
+    check_if_match(request, user)
+    for field, value in body.model_dump(exclude_unset=True).items():
+        if value is not None:
+            user[field] = value.strip()
+    return saved(user, {"ok": True, "me": user})
 
 
 @app.post("/student/profile/avatar")
-async def update_avatar(file: UploadFile = File(None), user=Depends(require_user)):
+async def update_avatar(request: Request, file: UploadFile = File(None), user=Depends(require_user)):
+    check_if_match(request, user)
     if not file:
         raise HTTPException(status_code=400, detail="file required")
-    content = await file.read()
-    mime = file.content_type or "image/png"
-    import base64
-
-    encoded = base64.b64encode(content).decode("ascii")
-    data_url = f"data:{mime};base64,{encoded}"
-    user["avatarUrl"] = data_url
-    return {"ok": True, "avatarUrl": data_url}
+    avatar = await process_avatar(file)
+    sizes = AVATARS.put(user["id"], avatar["mime"], avatar["variants"])
+    user["avatarUrl"] = avatar["avatarUrl"]
+    return saved(user, {"ok": True, "avatarUrl": avatar["avatarUrl"], "thumbnailSizes": sizes, "stats": avatar["stats"]})
+
+
+@app.get("/student/profile/avatar/{size}")
+async def avatar_thumbnail(size: int, request: Request, user=Depends(require_user)):
+    return AVATARS.response(user["id"], size, request.headers.get("if-none-match"))
+
+
+@app.get("/admin/avatars/stats")
+async def avatar_upload_stats(_admin=Depends(require_admin)):
+    return avatar_stats()
+
+
+@app.post("/admin/seed")
+async def admin_seed(request: Request, _admin=Depends(require_admin)):
+    body = fast_loads(await request.body())
+    records = seed_records(body, "users", ("id",))
+    if body.get("replace"):
+        USERS.clear()
+        AVATARS.by_owner.clear()
+    for record in records:
+        USERS[record["id"]] = {
+            "id": record["id"],
+            "fullName": record.get("fullName", ""),
+            "email": record.get("email", ""),
+            "studentId": record.get("studentId", ""),
+            "major": record.get("major", ""),
+            "phone": record.get("phone", ""),
+            "avatarUrl": None,
+        }
+        AVATARS.drop(record["id"])
+        VERSIONS[record["id"]] = VERSIONS.get(record["id"], 0) + 1
+    return {"ok": True, "seeded": len(records), "users": len(USERS)}
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "4015")), reload=False)
+    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "4015")), uds=os.getenv("UDS") or None, reload=False)
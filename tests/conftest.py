@@ -0,0 +1,65 @@
+"""Services run in-process (as the monolith gateway loads them) under TestClient.
+
+    python -m pytest -q tests
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import ModuleType
+from typing import Dict
+
+import jwt
+import pytest
+
+SERVICES_DIR = Path(__file__).resolve().parents[1] / "services"
+if str(SERVICES_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICES_DIR))
+
+# keep the messages service's log out of the repo's data/ directory
+os.environ.setdefault("MESSAGE_LOG_DIR", tempfile.mkdtemp(prefix="cnpm-tests-"))
+
+from common import admin, auth  # noqa: E402
+
+_LOADED: Dict[str, ModuleType] = {}
+
+
+def load_service(name: str) -> ModuleType:
+    """services/<name>/main.py, imported once per test run."""
+    if name not in _LOADED:
+        spec = importlib.util.spec_from_file_location(f"cnpm_{name}_main", SERVICES_DIR / name / "main.py")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        _LOADED[name] = module
+    return _LOADED[name]
+
+
+def token(role: str = "STUDENT", sub: str = "stu-001", **extra: object) -> str:
+    claims = {
+        "sub": sub,
+        "role": role,
+        "jti": uuid.uuid4().hex,
+        "exp": datetime.utcnow() + timedelta(minutes=15),
+        **extra,
+    }
+    return jwt.encode(claims, auth.JWT_SECRET, algorithm=auth.ALGORITHM)
+
+
+def signed_in(role: str = "STUDENT", sub: str = "stu-001", **extra: object) -> Dict[str, str]:
+    """Request headers carrying an access cookie for `sub`."""
+    return {"cookie": f"{auth.COOKIE_NAME}={token(role, sub, **extra)}"}
+
+
+@pytest.fixture
+def sessions_service() -> ModuleType:
+    return load_service("sessions")
+
+
+@pytest.fixture
+def admin_headers(monkeypatch) -> Dict[str, str]:
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "test-admin")
+    return {"x-admin-token": "test-admin"}
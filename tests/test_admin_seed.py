@@ -0,0 +1,31 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import load_service
+
+MALFORMED = [
+    ("auth", {"users": [{"id": "u1", "email": "u1@example.edu"}]}),
+    ("users", {"users": [{"fullName": "No Id"}]}),
+    ("sessions", {"sessions": [{"id": "s1", "code": "CS1"}]}),
+    ("sessions", {"enrollments": {"stu-001": "sess-1"}}),
+    ("students", {"students": [{"id": "syn-1", "attended": [["sess-1"]]}]}),
+    ("messages", {"conversations": [{"id": "c1", "title": "t", "members": ["a"], "messages": [{"content": "x"}]}]}),
+    ("messages", {"conversations": ["not an object"]}),
+]
+
+
+@pytest.mark.parametrize("service,body", MALFORMED)
+def test_malformed_seed_records_are_rejected(service, body, admin_headers):
+    client = TestClient(load_service(service).app)
+    resp = client.post("/admin/seed", json=body, headers=admin_headers)
+    assert resp.status_code == 400, resp.text
+
+
+def test_rejected_batch_changes_nothing(admin_headers):
+    users = load_service("users")
+    before = dict(users.USERS)
+    body = {"replace": True, "users": [{"id": "ok-1"}, {"fullName": "No Id"}]}
+    resp = TestClient(users.app).post("/admin/seed", json=body, headers=admin_headers)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "users[1]: id required"
+    assert users.USERS == before
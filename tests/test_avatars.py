@@ -0,0 +1,43 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import load_service, signed_in
+
+PIL = pytest.importorskip("PIL.Image")
+
+
+def png() -> bytes:
+    out = io.BytesIO()
+    PIL.new("RGB", (300, 200), (40, 120, 200)).save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.mark.parametrize(
+    "service, profile, field, upload",
+    [
+        ("users", "/student/profile", "me", "/student/profile/avatar"),
+        ("students", "/students/profile", "student", "/students/profile/avatar"),
+    ],
+)
+def test_thumbnails_are_served_apart_from_the_profile(service, profile, field, upload):
+    with TestClient(load_service(service).app) as client:
+        headers = signed_in("STUDENT")
+        resp = client.post(upload, headers=headers, files={"file": ("me.png", png(), "image/png")})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["avatarUrl"].startswith("data:image/jpeg;base64,")
+        assert body["thumbnailSizes"] == [256, 64]
+
+        me = client.get(profile, headers=headers).json()[field]
+        assert "avatarThumbnails" not in me
+        assert me["avatarUrl"] == body["avatarUrl"]
+
+        thumb = client.get(f"{upload}/64", headers=headers)
+        assert thumb.status_code == 200
+        assert thumb.headers["content-type"] == "image/jpeg"
+        etag = thumb.headers["etag"]
+        again = client.get(f"{upload}/64", headers={**headers, "if-none-match": etag})
+        assert again.status_code == 304
+        assert client.get(f"{upload}/32", headers=headers).status_code == 404
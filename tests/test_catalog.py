@@ -0,0 +1,37 @@
+from common.catalog import Catalog, CatalogReplica, browse_payload
+
+
+def session(sid: str, title: str = "Calculus") -> dict:
+    return {"id": sid, "code": "MATH101", "title": title}
+
+
+def test_replica_carries_the_owners_version_and_etag():
+    owner = Catalog([session("s1"), session("s2")])
+    replica = CatalogReplica(Catalog(), "http://unused")
+    # a replica created later starts on a higher clock than the owner
+    replica.catalog.version = owner.version + 10_000
+
+    replica._apply(browse_payload(owner, None))
+    assert replica.catalog.version == owner.version
+    assert replica.catalog.etag() == owner.etag()
+
+    since = str(owner.version)
+    owner.upsert(session("s1", "Calculus I"))
+    owner.upsert(session("s3"))
+    owner.remove("s2")
+    replica._apply(browse_payload(owner, since))
+    assert replica.catalog.etag() == owner.etag()
+    assert sorted(replica.catalog.by_id) == ["s1", "s3"]
+    # a client holding the owner's version gets the same delta from the replica
+    assert browse_payload(replica.catalog, since)["removed"] == ["s2"]
+
+
+def test_empty_delta_still_moves_the_replica_version():
+    owner = Catalog([session("s1")])
+    replica = CatalogReplica(Catalog(), "http://unused")
+    replica._apply(browse_payload(owner, None))
+    since = str(owner.version)
+    owner.upsert(session("s9"))
+    owner.remove("s9")
+    replica._apply(browse_payload(owner, since))
+    assert replica.catalog.version == owner.version
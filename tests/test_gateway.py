@@ -0,0 +1,17 @@
+from fastapi.testclient import TestClient
+
+from conftest import load_service, signed_in
+
+PROFILE = {"email": "stu@example.edu", "name": "Student One"}
+
+
+def test_refresh_token_is_not_an_access_token():
+    client = TestClient(load_service("api-gateway").app)
+    refresh = signed_in("STUDENT", typ="refresh", **PROFILE)
+
+    assert client.get("/students/profile", headers=refresh).status_code == 401
+    assert client.get("/auth/me", headers=refresh).status_code == 401
+
+    resp = client.get("/auth/me", headers=signed_in("STUDENT", **PROFILE))
+    assert resp.status_code == 200
+    assert resp.json()["user"]["id"] == "stu-001"
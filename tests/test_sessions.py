@@ -0,0 +1,16 @@
+from fastapi.testclient import TestClient
+
+from conftest import signed_in
+
+
+def test_session_students_is_for_tutors_and_admins(sessions_service):
+    client = TestClient(sessions_service.app)
+    session_id = sessions_service.CATALOG.sessions()[0]["id"]
+    url = f"/session/{session_id}/students"
+
+    assert client.get(url, headers=signed_in("STUDENT")).status_code == 403
+    assert client.get(url).status_code == 401
+    for role in ("TUTOR", "ADMIN"):
+        resp = client.get(url, headers=signed_in(role, sub=f"{role.lower()}-1"))
+        assert resp.status_code == 200
+        assert resp.json()["sessionId"] == session_id
@@ -0,0 +1,58 @@
+from fastapi.testclient import TestClient
+
+from common.catalog import Catalog
+from conftest import load_service, signed_in
+
+
+def test_session_batch_clamps_alternatives(monkeypatch):
+    students = load_service("students")
+    course = [{"id": f"s{i}", "code": "CS101", "title": "Intro"} for i in range(students.MAX_ALTERNATIVES + 10)]
+    monkeypatch.setattr(students, "CATALOG", Catalog(course))
+    client = TestClient(students.app)
+
+    resp = client.get("/sessions?ids=s0&alternatives=100000", headers=signed_in("STUDENT"))
+    assert resp.status_code == 200
+    assert len(resp.json()["alternatives"]["s0"]) == students.MAX_ALTERNATIVES
+
+
+def week() -> Catalog:
+    # b overlaps a; c is on another day
+    slots = {"a": ("MON", "09:00", "11:00"), "b": ("MON", "10:00", "12:00"), "c": ("TUE", "09:00", "11:00")}
+    return Catalog(
+        {"id": sid, "code": sid.upper(), "title": sid, "mode": "Online", "dayOfWeek": day, "start": start, "end": end}
+        for sid, (day, start, end) in slots.items()
+    )
+
+
+def test_rejected_reschedule_leaves_the_booking_alone(monkeypatch):
+    students = load_service("students")
+    monkeypatch.setattr(students, "CATALOG", week())
+    data = students.seed_student({"id": "stu-resched", "bookings": ["a", "c"]})
+    booking = next(b for b in data["bookedSessions"] if b["sessionId"] == "c")
+    before = dict(booking)
+    client = TestClient(students.app)
+    headers = signed_in("STUDENT", sub="stu-resched")
+
+    for new_session, status in (("b", 409), ("missing", 404)):
+        body = {"newSessionId": new_session, "reason": "clash", "notes": "n"}
+        resp = client.post("/session/c/reschedule", json=body, headers=headers)
+        assert resp.status_code == status
+        assert booking == before
+
+
+def test_only_a_changed_booking_drops_cached_recommendations(monkeypatch):
+    students = load_service("students")
+    monkeypatch.setattr(students, "CATALOG", week())
+    students.seed_student({"id": "stu-recs", "bookings": ["c"]})
+    client = TestClient(students.app)
+    headers = signed_in("STUDENT", sub="stu-recs")
+    cached = ("key", {"ok": True})
+
+    monkeypatch.setitem(students.RECOMMENDED, "stu-recs", cached)
+    resp = client.post("/session/c/reschedule", json={"newSessionId": "missing"}, headers=headers)
+    assert resp.status_code == 404
+    assert students.RECOMMENDED["stu-recs"] is cached
+
+    resp = client.post("/session/c/reschedule", json={"reason": "later"}, headers=headers)
+    assert resp.status_code == 200
+    assert "stu-recs" not in students.RECOMMENDED
@@ -0,0 +1,106 @@
+"""Shared helpers for the benchmarks in tools/bench.
+
+Services are started as real uvicorn processes on a separate port range
+(BENCH_PORT_BASE, default 5400) so a benchmark never clobbers a dev stack
+started by run-services.sh.
+"""
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[2]
+SERVICES_DIR = ROOT / "services"
+PORT_BASE = int(os.getenv("BENCH_PORT_BASE", "5400"))
+
+# same offsets as run-services.sh (4000/4010/4011/4015/4016/4017)
+PORTS: Dict[str, int] = {
+    "api-gateway": PORT_BASE,
+    "auth": PORT_BASE + 10,
+    "students": PORT_BASE + 11,
+    "users": PORT_BASE + 15,
+    "sessions": PORT_BASE + 16,
+    "messages": PORT_BASE + 17,
+}
+UPSTREAM_ENV = {
+    "auth": "AUTH_UPSTREAM",
+    "students": "STUDENTS_UPSTREAM",
+    "users": "USERS_UPSTREAM",
+    "sessions": "SESSIONS_UPSTREAM",
+    "messages": "MESSAGES_UPSTREAM",
+}
+DEMO_LOGIN = {"email": "student@hcmut.edu.vn", "password": "demo123"}
+
+
+def load_service_module(name: str) -> ModuleType:
+    """Imports services/<name>/main.py in-process (as the monolith gateway does)."""
+    spec = importlib.util.spec_from_file_location(f"cnpm_{name}_main", SERVICES_DIR / name / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def gateway_env() -> Dict[str, str]:
+    return {env: f"http://127.0.0.1:{PORTS[name]}" for name, env in UPSTREAM_ENV.items()}
+
+
+def start_service(name: str, env: Optional[Dict[str, str]] = None, args: Iterable[str] = ()) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--log-level", "warning", *args]
+    if "--uds" not in args:
+        cmd += ["--host", "127.0.0.1", "--port", str(PORTS[name])]
+    return subprocess.Popen(
+        cmd,
+        cwd=SERVICES_DIR / name,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.STDOUT,
+    )
+
+
+def wait_healthy(url: str, timeout: float = 20.0, uds: Optional[str] = None) -> None:
+    transport = httpx.HTTPTransport(uds=uds) if uds else None
+    deadline = time.monotonic() + timeout
+    with httpx.Client(transport=transport, timeout=1.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                if client.get(url).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become healthy within {timeout}s")
+
+
+def stop_all(procs: Iterable[subprocess.Popen]) -> None:
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def cpu_seconds(pid: int) -> float:
+    """User+system CPU time of a process (Linux /proc; 0.0 elsewhere)."""
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    except OSError:
+        return 0.0
+    # fields[11] / fields[12] are utime / stime once pid and comm are stripped
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
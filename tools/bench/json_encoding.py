@@ -0,0 +1,113 @@
+"""Response encoding cost: FastAPI's default path vs. FastJSONResponse.
+
+    python tools/bench/json_encoding.py --rounds 2000
+
+"default" is what a handler returning a dict pays: jsonable_encoder over the
+whole payload, then JSONResponse.render (json.dumps). The other rows return a
+FastJSONResponse directly, rendered with the stdlib or with orjson.
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+import _harness as h
+
+students = h.load_service_module("students")  # also puts services/ on sys.path
+from common import responses as fast  # noqa: E402
+
+
+CATALOG = h.load_service_module("sessions").CATALOG
+
+
+def browse_payload() -> Dict[str, object]:
+    return {"ok": True, "sessions": CATALOG.sessions()}
+
+
+def profile_payload(bookings: int) -> Dict[str, object]:
+    data = students.ensure_student("stu-bench")
+    catalog = CATALOG.sessions()
+    for i in range(bookings):
+        course = catalog[i % len(catalog)]
+        entry = {
+            "id": f"reg-{course['id']}-{i}",
+            "sessionId": course["id"],
+            "code": course["code"],
+            "title": course["title"],
+            "addedAt": students.now_iso(),
+            "scheduledAt": students.january_date(10, 9),
+            "startDate": students.january_date(10, 9),
+            "endDate": students.january_date(25, 11),
+        }
+        data["bookedSessions"].append(entry)
+        data["history"]["bookings"].append(
+            {
+                "id": entry["id"],
+                "date": entry["addedAt"],
+                "courseCode": course["code"],
+                "courseTitle": course["title"],
+                "mode": course["mode"],
+                "status": "SCHEDULED",
+            }
+        )
+    return {
+        "ok": True,
+        "student": data["me"],
+        "stats": data["stats"],
+        "preferences": data["preferences"],
+        "bookings": data["bookedSessions"],
+        "history": data["history"],
+        "announcements": data["announcements"],
+    }
+
+
+def time_it(fn: Callable[[], bytes], rounds: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def run(payload: Dict[str, object], rounds: int) -> Dict[str, float]:
+    results = {
+        "default": time_it(lambda: JSONResponse(jsonable_encoder(payload)).body, rounds),
+    }
+    fast.USE_ORJSON = False
+    results["fast-stdlib"] = time_it(lambda: fast.FastJSONResponse(payload).body, rounds)
+    if fast.orjson is not None:
+        fast.USE_ORJSON = True
+        results["fast-orjson"] = time_it(lambda: fast.FastJSONResponse(payload).body, rounds)
+    return {k: round(v, 1) for k, v in results.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--bookings", type=int, default=1000)
+    parser.add_argument("--json", action="store_true", help="print raw JSON only")
+    args = parser.parse_args()
+
+    cases = {
+        "browse (90 sessions)": browse_payload(),
+        f"profile ({args.bookings} bookings)": profile_payload(args.bookings),
+    }
+    results = {}
+    for name, payload in cases.items():
+        rounds = args.rounds if "browse" in name else max(1, args.rounds // 10)
+        results[name] = {"bytes": len(json.dumps(payload)), "us_per_response": run(payload, rounds)}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    if fast.orjson is None:
+        print("orjson not installed: only the stdlib fallback is measured")
+    for name, r in results.items():
+        timings = "  ".join(f"{k}={v}us" for k, v in r["us_per_response"].items())
+        print(f"{name:<26}{r['bytes']:>9} B  {timings}")
+
+
+if __name__ == "__main__":
+    main()
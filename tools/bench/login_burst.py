@@ -0,0 +1,87 @@
+"""Event-loop lag during a login burst: scrypt inline vs. on the hash pool.
+
+    python tools/bench/login_burst.py --logins 200 --concurrency 50
+
+The auth app runs in-process behind an ASGI transport. While the burst is in
+flight a ticker wakes every --tick-ms and records how late it was woken; that
+lateness is what every other request on the same loop (health checks,
+/auth/me) waits on top of its own work.
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import httpx
+
+import _harness as h
+
+auth = h.load_service_module("auth")
+
+
+async def measure(logins: int, concurrency: int, tick_ms: float) -> Dict[str, float]:
+    lags: List[float] = []
+    latencies: List[float] = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        interval = tick_ms / 1000
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append((time.perf_counter() - start - interval) * 1000)
+
+    transport = httpx.ASGITransport(app=auth.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://auth") as client:
+        slots = asyncio.Semaphore(concurrency)
+
+        async def login() -> None:
+            async with slots:
+                start = time.perf_counter()
+                resp = await client.post("/login", json=h.DEMO_LOGIN)
+                resp.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        tick = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        seconds = time.perf_counter() - start
+        done.set()
+        await tick
+
+    return {
+        "logins_per_s": round(logins / seconds, 1),
+        "login_p50_ms": round(h.percentile(latencies, 50), 1),
+        "login_p95_ms": round(h.percentile(latencies, 95), 1),
+        "lag_p50_ms": round(h.percentile(lags, 50), 2),
+        "lag_p99_ms": round(h.percentile(lags, 99), 2),
+        "lag_max_ms": round(max(lags, default=0.0), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=auth.HASH_WORKERS or 4, help="hash pool threads")
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true", help="print raw JSON only")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("inline", "pool"):
+        auth.HASH_EXECUTOR = None if mode == "inline" else ThreadPoolExecutor(max_workers=args.workers)
+        results[mode] = asyncio.run(measure(args.logins, args.concurrency, args.tick_ms))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    keys = list(results["inline"])
+    print(f"{'':<8}" + "".join(f"{k:>15}" for k in keys))
+    for mode, row in results.items():
+        print(f"{mode:<8}" + "".join(f"{row[k]:>15}" for k in keys))
+
+
+if __name__ == "__main__":
+    main()
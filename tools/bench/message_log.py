@@ -0,0 +1,88 @@
+"""Send and history-page latency of the message log as a conversation grows.
+
+    python tools/bench/message_log.py --sizes 10000,100000,1000000
+
+One conversation is filled to each size in a temp directory, then timed:
+single appends (what a send costs), the newest page, and random older pages
+(memory-mapped reads located through the offset index).
+"""
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import _harness as h
+
+h.load_service_module("sessions")  # puts services/ on sys.path
+from common.messagelog import MessageLog  # noqa: E402
+
+
+def message(i: int) -> Dict[str, object]:
+    return {
+        "id": f"m{i + 1}",
+        "content": f"message {i} about the lab deadline and tomorrow's review session",
+        "sender": {"id": "syn-000001", "displayName": "Synthetic Student 1", "role": "STUDENT"},
+    }
+
+
+def timed_us(fn, rounds: int) -> List[float]:
+    out = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - start) * 1e6)
+    return out
+
+
+def run(size: int, rounds: int, page: int) -> Dict[str, float]:
+    root = tempfile.mkdtemp(prefix="cnpm-msglog-")
+    try:
+        log = MessageLog(root)
+        conv = log.create("bench", {"id": "bench"})
+        batch = 10000
+        for start in range(0, size, batch):
+            conv.append_many([message(i) for i in range(start, min(size, start + batch))])
+        rng = random.Random(1)
+        appends = timed_us(lambda: conv.append(message(conv.count)), rounds)
+        newest = timed_us(lambda: conv.page(None, page), rounds)
+        older = timed_us(lambda: conv.page(rng.randrange(page, conv.count), page), rounds)
+        reopen_start = time.perf_counter()
+        log.close()
+        MessageLog(root).close()
+        reopen_ms = (time.perf_counter() - reopen_start) * 1000
+        return {
+            "segments": len(conv.segments),
+            "append_p50_us": round(h.percentile(appends, 50), 1),
+            "append_p99_us": round(h.percentile(appends, 99), 1),
+            "newest_page_p50_us": round(h.percentile(newest, 50), 1),
+            "older_page_p50_us": round(h.percentile(older, 50), 1),
+            "older_page_p99_us": round(h.percentile(older, 99), 1),
+            "reopen_ms": round(reopen_ms, 1),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="print raw JSON only")
+    args = parser.parse_args()
+
+    results = {int(size): run(int(size), args.rounds, args.page) for size in args.sizes.split(",")}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    keys = list(next(iter(results.values())))
+    print(f"{'messages':>10}" + "".join(f"{k:>20}" for k in keys))
+    for size, row in results.items():
+        print(f"{size:>10}" + "".join(f"{row[k]:>20}" for k in keys))
+
+
+if __name__ == "__main__":
+    main()
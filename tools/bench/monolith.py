@@ -0,0 +1,82 @@
+"""Latency and CPU per request through the gateway: proxied vs. monolith mode.
+
+    python tools/bench/monolith.py --requests 2000
+
+Proxied mode starts every service plus the gateway; monolith mode starts only
+the gateway with GATEWAY_MODE=monolith. CPU is summed over every server
+process involved, so the proxied figure includes the upstream services.
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import httpx
+
+import _harness as h
+
+ENDPOINTS = ["/auth/me", "/sessions/browse", "/students/profile", "/messaging/sidebar"]
+SERVICES = ["auth", "students", "users", "sessions", "messages"]
+
+
+def run_mode(mode: str, requests: int) -> Dict[str, object]:
+    procs = []
+    try:
+        if mode == "proxy":
+            for name in SERVICES:
+                procs.append(h.start_service(name))
+            for name in SERVICES:
+                h.wait_healthy(f"http://127.0.0.1:{h.PORTS[name]}/health")
+        procs.append(h.start_service("api-gateway", env={**h.gateway_env(), "GATEWAY_MODE": mode}))
+        base = f"http://127.0.0.1:{h.PORTS['api-gateway']}"
+        h.wait_healthy(f"{base}/health")
+
+        latencies: Dict[str, List[float]] = {ep: [] for ep in ENDPOINTS}
+        with httpx.Client(base_url=base) as client:
+            client.post("/auth/login", json=h.DEMO_LOGIN).raise_for_status()
+            for ep in ENDPOINTS * 20:
+                client.get(ep)
+
+            cpu_before = sum(h.cpu_seconds(p.pid) for p in procs)
+            wall_start = time.perf_counter()
+            for i in range(requests):
+                ep = ENDPOINTS[i % len(ENDPOINTS)]
+                t0 = time.perf_counter()
+                client.get(ep).raise_for_status()
+                latencies[ep].append((time.perf_counter() - t0) * 1000)
+            wall = time.perf_counter() - wall_start
+            cpu = sum(h.cpu_seconds(p.pid) for p in procs) - cpu_before
+    finally:
+        h.stop_all(procs)
+
+    every = [v for vals in latencies.values() for v in vals]
+    return {
+        "mode": mode,
+        "requests": requests,
+        "rps": round(requests / wall, 1),
+        "p50_ms": round(h.percentile(every, 50), 3),
+        "p99_ms": round(h.percentile(every, 99), 3),
+        "cpu_ms_per_request": round(cpu * 1000 / requests, 3),
+        "endpoints": {ep: round(h.percentile(vals, 50), 3) for ep, vals in latencies.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print raw JSON only")
+    args = parser.parse_args()
+
+    results = [run_mode("proxy", args.requests), run_mode("monolith", args.requests)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<10}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'cpu ms/req':>12}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['rps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['cpu_ms_per_request']:>12}")
+    for r in results:
+        print(f"  {r['mode']} p50 per endpoint (ms): {r['endpoints']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Latency of /students/sessions/recommended as the catalog grows.
+
+    python tools/bench/recommendations.py --sessions 5000,50000
+
+A synthetic catalog (tools/synth.py) of each size and --students seeded
+students. Each student's top k is timed three ways:
+
+- scoring every session and taking `heapq.nlargest` (the full scan);
+- through the ranker's precomputed lists with the answer cache cleared;
+- from the per-student cache.
+
+The handler is called directly, so HTTP overhead is not included.
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import random
+import sys
+import time
+from typing import Dict, List
+
+import _harness as h
+
+students = h.load_service_module("students")  # also puts services/ on sys.path
+sys.path.insert(0, str(h.ROOT / "tools"))
+import synth  # noqa: E402
+from common.recommend import KNOWN_COURSE, PREFERRED_MODE  # noqa: E402
+
+
+def full_scan(student_id: str, k: int) -> List[Dict[str, object]]:
+    data = students.ensure_student(student_id)
+    modes = set(data["preferences"])
+    history = data["history"]
+    codes = {h["courseCode"] for h in (*history["attendance"], *history["bookings"])}
+    booked = {b["sessionId"] for b in data["bookedSessions"]}
+    schedule = students.schedule_for(student_id, data)
+    scored = []
+    for s in students.CATALOG.sessions():
+        if s["id"] in booked or schedule.conflicts(s["dayOfWeek"], s["start"], s["end"]):
+            continue
+        score = (PREFERRED_MODE if s["mode"] in modes else 0) + (KNOWN_COURSE if s["code"] in codes else 0)
+        scored.append((score + float(s["rating"]) / 5, s["id"], s))
+    return [s for _score, _id, s in heapq.nlargest(k, scored)]
+
+
+def timed_ms(fn, ids: List[str]) -> List[float]:
+    out = []
+    for sid in ids:
+        start = time.perf_counter()
+        fn(sid)
+        out.append((time.perf_counter() - start) * 1000)
+    return out
+
+
+def run(size: int, population: int, k: int) -> Dict[str, float]:
+    rng = random.Random(size)
+    catalog = synth.generate_catalog(size, rng)
+    students.CATALOG.replace(catalog)
+    students.STUDENTS.clear()
+    students.SCHEDULES.clear()
+    students.RECOMMENDED.clear()
+    records = synth.generate_students(population, [str(s["id"]) for s in catalog], rng)
+    for record in records:
+        students.seed_student(record)
+    ids = [str(r["id"]) for r in records]
+    loop = asyncio.new_event_loop()
+
+    def recommend(sid: str) -> None:
+        loop.run_until_complete(students.recommended_sessions(k, payload={"sub": sid}))
+
+    def uncached(sid: str) -> None:
+        students.RECOMMENDED.pop(sid, None)
+        recommend(sid)
+
+    start = time.perf_counter()
+    recommend(ids[0])  # builds the ranker's lists for this catalog version
+    build_ms = (time.perf_counter() - start) * 1000
+    scan = timed_ms(lambda sid: full_scan(sid, k), ids)
+    ranked = timed_ms(uncached, ids)
+    cached = timed_ms(recommend, ids)
+    loop.close()
+    return {
+        "first_call_ms": round(build_ms, 1),
+        "full_scan_p50_ms": round(h.percentile(scan, 50), 3),
+        "ranked_p50_ms": round(h.percentile(ranked, 50), 3),
+        "ranked_p99_ms": round(h.percentile(ranked, 99), 3),
+        "cached_p50_ms": round(h.percentile(cached, 50), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="5000,50000")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print raw JSON only")
+    args = parser.parse_args()
+
+    results = {int(n): run(int(n), args.students, args.k) for n in args.sessions.split(",")}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    keys = list(next(iter(results.values())))
+    print(f"{'sessions':>10}" + "".join(f"{k:>20}" for k in keys))
+    for size, row in results.items():
+        print(f"{size:>10}" + "".join(f"{row[k]:>20}" for k in keys))
+
+
+if __name__ == "__main__":
+    main()
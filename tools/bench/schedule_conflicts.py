@@ -0,0 +1,121 @@
+"""Cost of schedule-conflict checks as a student's bookings grow.
+
+    python tools/bench/schedule_conflicts.py --bookings 100,300,1000
+
+Each student gets that many non-overlapping weekly slots, then a bulk
+registration of --batch candidates is checked two ways: pairwise against
+every booking (and every earlier candidate of the batch), and through the
+students service's per-weekday interval index.
+"""
+import argparse
+import json
+import random
+import time
+from typing import Dict, List, Tuple
+
+import _harness as h
+
+h.load_service_module("sessions")  # puts services/ on sys.path
+from common.schedule import ScheduleIndex, minutes  # noqa: E402
+
+DAYS = ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"]
+# (key, day, "HH:MM", "HH:MM")
+Slot = Tuple[str, str, str, str]
+
+
+def hhmm(total: int) -> str:
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+
+def bookings(count: int) -> List[Slot]:
+    # back-to-back 5-minute slots from 06:00, spread over the week
+    per_day = -(-count // len(DAYS))
+    out = []
+    for i in range(count):
+        start = 6 * 60 + (i % per_day) * 5
+        out.append((f"b{i}", DAYS[i // per_day], hhmm(start), hhmm(start + 5)))
+    return out
+
+
+def candidates(count: int, rng: random.Random) -> List[Slot]:
+    out = []
+    for i in range(count):
+        start = rng.randrange(6 * 60, 22 * 60, 5)
+        out.append((f"c{i}", rng.choice(DAYS), hhmm(start), hhmm(start + rng.choice((30, 60, 120)))))
+    return out
+
+
+def naive(booked: List[Slot], batch: List[Slot]) -> int:
+    taken = list(booked)
+    conflicts = 0
+    for key, day, start, end in batch:
+        lo, hi = minutes(start), minutes(end)
+        if any(d == day and minutes(s) < hi and minutes(e) > lo for _, d, s, e in taken):
+            conflicts += 1
+            continue
+        taken.append((key, day, start, end))
+    return conflicts
+
+
+def indexed(booked: List[Slot], batch: List[Slot]) -> int:
+    index = ScheduleIndex()
+    for key, day, start, end in booked:
+        index.add(key, day, start, end)
+    conflicts = 0
+    for key, day, start, end in batch:
+        if index.conflicts(day, start, end):
+            conflicts += 1
+            continue
+        index.add(key, day, start, end)
+    return conflicts
+
+
+def timed_ms(fn, rounds: int) -> List[float]:
+    out = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - start) * 1000)
+    return out
+
+
+def run(count: int, batch: int, rounds: int) -> Dict[str, float]:
+    rng = random.Random(count)
+    booked = bookings(count)
+    batch_slots = candidates(batch, rng)
+    assert naive(booked, batch_slots) == indexed(booked, batch_slots)
+    pairwise = timed_ms(lambda: naive(booked, batch_slots), rounds)
+    index = timed_ms(lambda: indexed(booked, batch_slots), rounds)
+    # what a request pays once the student's index is cached
+    warm = ScheduleIndex()
+    for key, day, start, end in booked:
+        warm.add(key, day, start, end)
+    checks = timed_ms(lambda: [warm.conflicts(d, s, e) for _, d, s, e in batch_slots], rounds)
+    return {
+        "pairwise_p50_ms": round(h.percentile(pairwise, 50), 3),
+        "index_build_and_check_p50_ms": round(h.percentile(index, 50), 3),
+        "cached_index_check_p50_ms": round(h.percentile(checks, 50), 3),
+        "speedup": round(h.percentile(pairwise, 50) / max(h.percentile(checks, 50), 1e-9), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", default="100,300,1000")
+    parser.add_argument("--batch", type=int, default=50, help="sessions in one registration")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="print raw JSON only")
+    args = parser.parse_args()
+
+    results = {int(n): run(int(n), args.batch, args.rounds) for n in args.bookings.split(",")}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    keys = list(next(iter(results.values())))
+    print(f"{'bookings':>10}" + "".join(f"{k:>32}" for k in keys))
+    for count, row in results.items():
+        print(f"{count:>10}" + "".join(f"{row[k]:>32}" for k in keys))
+
+
+if __name__ == "__main__":
+    main()
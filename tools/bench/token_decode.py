@@ -0,0 +1,60 @@
+"""Per-request cost of verifying the auth cookie: jwt.decode vs. the token cache.
+
+    python tools/bench/token_decode.py --rounds 20000
+
+A page view sends the same cookie to the gateway and three or four services;
+"cached" is what every request after the first one pays.
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+import _harness as h
+
+h.load_service_module("sessions")  # puts services/ on sys.path
+import jwt  # noqa: E402
+from common import auth  # noqa: E402
+
+
+def per_call_us(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--json", action="store_true", help="print raw JSON only")
+    args = parser.parse_args()
+
+    claims = {
+        "sub": "stu-001",
+        "role": "STUDENT",
+        "name": "Alex Student",
+        "email": "student@hcmut.edu.vn",
+        "jti": "0" * 32,
+        "exp": datetime.utcnow() + timedelta(minutes=15),
+    }
+    token = jwt.encode(claims, auth.JWT_SECRET, algorithm=auth.ALGORITHM)
+    cache = auth.TokenCache()
+    cache.verify(token)
+
+    results = {
+        "jwt.decode": per_call_us(lambda: jwt.decode(token, auth.JWT_SECRET, algorithms=[auth.ALGORITHM]), args.rounds),
+        "cached": per_call_us(lambda: cache.verify(token), args.rounds),
+    }
+    results = {name: round(us, 2) for name, us in results.items()}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'':<12}{'us/request':>12}")
+    for name, us in results.items():
+        print(f"{name:<12}{us:>12}")
+    print(f"speedup: {results['jwt.decode'] / results['cached']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
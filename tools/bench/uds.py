@@ -0,0 +1,95 @@
+"""Requests/second to a service over loopback TCP vs. a Unix domain socket.
+
+    python tools/bench/uds.py --seconds 5 --concurrency 32
+
+The sessions service is started twice (once per transport) and hammered with
+a pooled keep-alive client, the same way the gateway talks to its upstreams.
+/browse needs a signed-in user, so the client sends a student cookie minted
+with the services' JWT_SECRET.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+
+import _harness as h
+
+h.load_service_module("sessions")  # puts services/ on sys.path
+import jwt  # noqa: E402
+from common import auth  # noqa: E402
+
+PATHS = ["/health", "/browse"]
+
+
+def student_cookie() -> Dict[str, str]:
+    claims = {
+        "sub": "stu-001",
+        "role": "STUDENT",
+        "jti": "0" * 32,
+        "exp": datetime.utcnow() + timedelta(hours=1),
+    }
+    return {auth.COOKIE_NAME: jwt.encode(claims, auth.JWT_SECRET, algorithm=auth.ALGORITHM)}
+
+
+async def hammer(base_url: str, path: str, uds: Optional[str], seconds: float, concurrency: int) -> float:
+    transport = httpx.AsyncHTTPTransport(uds=uds) if uds else httpx.AsyncHTTPTransport()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    done = 0
+    cookies = student_cookie()
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, cookies=cookies) as client:
+        for _ in range(50):
+            await client.get(path)
+        deadline = time.perf_counter() + seconds
+
+        async def worker() -> None:
+            nonlocal done
+            while time.perf_counter() < deadline:
+                (await client.get(path)).raise_for_status()
+                done += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return done / (time.perf_counter() - start)
+
+
+def run_transport(transport: str, seconds: float, concurrency: int) -> Dict[str, float]:
+    sock_dir = tempfile.mkdtemp(prefix="cnpm-bench-")
+    sock = str(Path(sock_dir) / "sessions.sock")
+    if transport == "uds":
+        proc = h.start_service("sessions", args=["--uds", sock])
+        base, uds = "http://localhost", sock
+    else:
+        proc = h.start_service("sessions")
+        base, uds = f"http://127.0.0.1:{h.PORTS['sessions']}", None
+    try:
+        h.wait_healthy(f"{base}/health", uds=uds)
+        return {path: round(asyncio.run(hammer(base, path, uds, seconds, concurrency)), 1) for path in PATHS}
+    finally:
+        h.stop_all([proc])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--json", action="store_true", help="print raw JSON only")
+    args = parser.parse_args()
+
+    results = {t: run_transport(t, args.seconds, args.concurrency) for t in ("tcp", "uds")}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'path':<12}{'tcp rps':>12}{'uds rps':>12}{'gain':>8}")
+    for path in PATHS:
+        tcp, uds = results["tcp"][path], results["uds"][path]
+        print(f"{path:<12}{tcp:>12}{uds:>12}{(uds / tcp - 1) * 100:>7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
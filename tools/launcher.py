@@ -0,0 +1,241 @@
+"""Start, health-gate and supervise the services described in infra/services.json.
+
+    python tools/launcher.py                        # everything, TCP
+    python tools/launcher.py --transport uds        # services on $SOCKDIR/<name>.sock
+    python tools/launcher.py --monolith             # only the gateway, services in-process
+    python tools/launcher.py --only auth sessions   # a subset (plus what they depend on)
+
+Services start in dependency order. All services of one dependency level
+start together, and the next level waits until each one answers /health.
+Per-service settings are workers, loop (auto/uvloop/asyncio), http
+(auto/httptools/h11), port, depends and extra env. When a service
+process exits, it is restarted with backoff. With workers > 1, uvicorn's
+own supervisor already replaces crashed workers. Ctrl-C or SIGTERM stops
+everything in reverse order. Output goes to logs/<name>.log.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPSTREAM_ENV = {
+    "auth": "AUTH_UPSTREAM",
+    "students": "STUDENTS_UPSTREAM",
+    "users": "USERS_UPSTREAM",
+    "sessions": "SESSIONS_UPSTREAM",
+    "messages": "MESSAGES_UPSTREAM",
+}
+# a process that stayed up this long is considered healthy again
+STABLE_SECONDS = 60
+MAX_BACKOFF = 30.0
+
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+class Service:
+    def __init__(self, name: str, config: Dict[str, object], uds: Optional[str]) -> None:
+        self.name = name
+        self.config = config
+        self.uds = uds
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.backoff = 1.0
+        self.restart_at: Optional[float] = None
+        # uvicorn's "auto" picks these when installed; resolved here so the
+        # startup report says what actually runs
+        loop = str(config["loop"])
+        self.loop = ("uvloop" if installed("uvloop") else "asyncio") if loop == "auto" else loop
+        http = str(config["http"])
+        self.http = ("httptools" if installed("httptools") else "h11") if http == "auto" else http
+        for module in (self.loop, self.http):
+            if module in ("uvloop", "httptools") and not installed(module):
+                sys.exit(f"[launch] {name}: {module} is not installed (pip install 'uvicorn[standard]')")
+
+    @property
+    def address(self) -> str:
+        return self.uds or f":{self.config['port']}"
+
+    def command(self) -> List[str]:
+        cmd = [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--workers", str(self.config["workers"]),
+            "--loop", self.loop,
+            "--http", self.http,
+        ]
+        if self.uds:
+            return cmd + ["--uds", self.uds]
+        return cmd + ["--host", str(self.config["host"]), "--port", str(self.config["port"])]
+
+    def start(self, env: Dict[str, str], log_dir: str) -> None:
+        log = open(os.path.join(log_dir, f"{self.name}.log"), "ab")
+        self.process = subprocess.Popen(
+            self.command(),
+            cwd=os.path.join(ROOT, "services", self.name),
+            env={**env, **{k: str(v) for k, v in dict(self.config.get("env") or {}).items()}},
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            # keeps Ctrl-C in the terminal from hitting the services directly;
+            # the launcher stops them itself, in order
+            start_new_session=True,
+        )
+        log.close()
+        self.started_at = time.monotonic()
+        self.restart_at = None
+
+    def health_url(self) -> str:
+        host = "127.0.0.1" if self.uds or self.config["host"] in ("0.0.0.0", "::") else self.config["host"]
+        return f"http://{host}:{self.config['port']}{self.config['health']}"
+
+    def wait_healthy(self) -> bool:
+        transport = httpx.HTTPTransport(uds=self.uds) if self.uds else None
+        deadline = time.monotonic() + float(self.config["health_timeout"])
+        with httpx.Client(transport=transport, timeout=1.0) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    return False
+                try:
+                    if client.get(self.health_url()).status_code == 200:
+                        return True
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.05)
+        return False
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def load_config(path: str) -> Dict[str, Dict[str, object]]:
+    with open(path, encoding="utf-8") as fh:
+        raw = json.load(fh)
+    defaults = raw.get("defaults", {})
+    return {name: {**defaults, **(cfg or {})} for name, cfg in raw["services"].items()}
+
+
+def levels(configs: Dict[str, Dict[str, object]], wanted: List[str]) -> List[List[str]]:
+    """Groups `wanted` and their dependencies into startable levels."""
+    needed: Dict[str, None] = {}
+
+    def visit(name: str, path: List[str]) -> None:
+        if name in path:
+            sys.exit(f"[launch] dependency cycle: {' -> '.join(path + [name])}")
+        if name not in configs:
+            sys.exit(f"[launch] unknown service {name!r}")
+        for dep in configs[name].get("depends", []):
+            visit(dep, path + [name])
+        needed.setdefault(name)
+
+    for name in wanted:
+        visit(name, [])
+    out: List[List[str]] = []
+    done: set = set()
+    while len(done) < len(needed):
+        level = [n for n in needed if n not in done and set(configs[n].get("depends", [])) <= done]
+        out.append(level)
+        done.update(level)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default=os.path.join(ROOT, "infra", "services.json"))
+    parser.add_argument("--transport", choices=["tcp", "uds"], default=os.getenv("TRANSPORT", "tcp"))
+    parser.add_argument("--sockdir", default=os.getenv("SOCKDIR", os.path.join(ROOT, "run")))
+    parser.add_argument("--monolith", action="store_true", default=os.getenv("GATEWAY_MODE", "proxy") == "monolith")
+    parser.add_argument("--only", nargs="*", help="services to start, with their dependencies")
+    parser.add_argument("--log-dir", default=os.path.join(ROOT, "logs"))
+    args = parser.parse_args()
+
+    configs = load_config(args.config)
+    env = dict(os.environ)
+    if args.monolith:
+        # each worker would import its own copy of every service's state
+        configs = {"api-gateway": {**configs["api-gateway"], "depends": [], "workers": 1}}
+        env["GATEWAY_MODE"] = "monolith"
+    os.makedirs(args.log_dir, exist_ok=True)
+
+    services: Dict[str, Service] = {}
+    for name, config in configs.items():
+        uds = None
+        if args.transport == "uds" and not config.get("tcp_only"):
+            os.makedirs(args.sockdir, exist_ok=True)
+            uds = os.path.join(args.sockdir, f"{name}.sock")
+        services[name] = Service(name, config, uds)
+    for name, var in UPSTREAM_ENV.items():
+        if name in services:
+            svc = services[name]
+            env[var] = f"unix:{svc.uds}" if svc.uds else f"http://127.0.0.1:{svc.config['port']}"
+
+    stopping = False
+
+    def request_stop(*_args) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    order: List[Service] = []
+    launch_start = time.monotonic()
+    try:
+        for level in levels(configs, args.only or list(configs)):
+            batch = [services[name] for name in level]
+            for svc in batch:
+                svc.start(env, args.log_dir)
+            for svc in batch:
+                order.append(svc)
+                if stopping:
+                    return
+                if not svc.wait_healthy():
+                    print(f"[launch] {svc.name} did not become healthy; see {args.log_dir}/{svc.name}.log")
+                    return
+                print(
+                    f"[launch] {svc.name:<12} ready in {time.monotonic() - svc.started_at:5.2f}s "
+                    f"({svc.config['workers']} worker(s), {svc.loop}/{svc.http}, {svc.address})"
+                )
+        print(f"[launch] all up in {time.monotonic() - launch_start:.2f}s; Ctrl-C stops everything")
+
+        while not stopping:
+            time.sleep(0.5)
+            now = time.monotonic()
+            for svc in order:
+                if svc.restart_at is not None:
+                    if now >= svc.restart_at:
+                        svc.start(env, args.log_dir)
+                        svc.restarts += 1
+                        print(f"[launch] {svc.name} restarted ({svc.restarts} so far)")
+                    continue
+                code = svc.process.poll()
+                if code is None:
+                    if now - svc.started_at > STABLE_SECONDS:
+                        svc.backoff = 1.0
+                    continue
+                print(f"[launch] {svc.name} exited with {code}; restarting in {svc.backoff:.0f}s")
+                svc.restart_at = now + svc.backoff
+                svc.backoff = min(MAX_BACKOFF, svc.backoff * 2)
+    finally:
+        for svc in reversed(order):
+            svc.stop()
+        print("[launch] stopped")
+
+
+if __name__ == "__main__":
+    main()
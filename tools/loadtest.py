@@ -0,0 +1,291 @@
+"""Async load generator for the real user journeys through the gateway.
+
+    # against a running stack (seed it first with tools/synth.py for --students > 0)
+    python tools/loadtest.py --base-url http://localhost:4000 --concurrency 50 --duration 30
+
+    # start services + gateway on the bench ports, seed them, run, tear down
+    python tools/loadtest.py --launch --students 10000 --sessions 2000 --out run.json
+
+    # compare against an earlier run (exit code 1 if p95 regressed > 10%)
+    python tools/loadtest.py --launch --compare baseline.json
+
+Each virtual user logs in and then loops over weighted journeys: re-logins,
+dashboard loads, catalog browsing with random filters, registration,
+reschedule/cancel and messaging send/read. Results are RPS plus
+p50/p95/p99 per endpoint, written as JSON for comparing commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench"))
+
+import _harness as h  # noqa: E402
+import synth  # noqa: E402
+
+SERVICES = ["auth", "students", "users", "sessions", "messages"]
+JOURNEYS = {
+    "login": 2,
+    "dashboard": 30,
+    "browse": 30,
+    "register": 10,
+    "reschedule": 5,
+    "cancel": 5,
+    "messaging": 20,
+}
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.recording = False
+
+    async def call(
+        self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs
+    ) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            resp = None
+        elapsed = (time.perf_counter() - start) * 1000
+        if self.recording:
+            self.latencies.setdefault(name, []).append(elapsed)
+            if resp is None or resp.status_code >= 400:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        return resp if resp is not None and resp.status_code < 400 else None
+
+    def report(self, seconds: float) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for name, values in sorted(self.latencies.items()):
+            out[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "rps": round(len(values) / seconds, 2),
+                "p50_ms": round(h.percentile(values, 50), 3),
+                "p95_ms": round(h.percentile(values, 95), 3),
+                "p99_ms": round(h.percentile(values, 99), 3),
+                "max_ms": round(max(values), 3),
+            }
+        return out
+
+
+class VirtualUser:
+    def __init__(
+        self, base_url: str, email: str, password: str, rec: Recorder, rng: random.Random, session_ids: List[str]
+    ) -> None:
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=30.0)
+        self.email = email
+        self.password = password
+        self.rec = rec
+        self.rng = rng
+        self.session_ids = session_ids
+        self.booked: List[str] = []
+        self.conversations: List[str] = []
+
+    async def login(self) -> bool:
+        payload = {"email": self.email, "password": self.password}
+        return await self.rec.call(self.client, "POST /auth/login", "POST", "/auth/login", json=payload) is not None
+
+    async def dashboard(self) -> None:
+        await self.rec.call(self.client, "GET /auth/me", "GET", "/auth/me")
+        resp = await self.rec.call(self.client, "GET /students/profile", "GET", "/students/profile")
+        if resp is not None:
+            self.booked = [b["sessionId"] for b in resp.json().get("bookings", []) if b.get("status") != "CANCELLED"]
+        resp = await self.rec.call(self.client, "GET /messaging/sidebar", "GET", "/messaging/sidebar")
+        if resp is not None:
+            body = resp.json()
+            self.conversations = [c["id"] for c in body.get("groups", []) + body.get("directs", [])]
+
+    async def browse(self) -> None:
+        rng = self.rng
+        params = {
+            "fromHour": rng.choice([0, 7, 9, 13]),
+            "toHour": rng.choice([24, 20, 17]),
+            "online": rng.choice(["true", "true", "false"]),
+            "onCampus": rng.choice(["true", "true", "false"]),
+        }
+        if rng.random() < 0.5:
+            params["days"] = ",".join(rng.sample(synth.DAYS, rng.randint(1, 3)))
+        await self.rec.call(self.client, "GET /sessions/browse", "GET", "/sessions/browse", params=params)
+
+    async def register(self) -> None:
+        ids = self.rng.sample(self.session_ids, min(len(self.session_ids), self.rng.randint(1, 3)))
+        resp = await self.rec.call(
+            self.client, "POST /students/register", "POST", "/students/register", json={"sessionIds": ids}
+        )
+        if resp is not None:
+            self.booked.extend(entry["sessionId"] for entry in resp.json().get("added", []))
+
+    async def reschedule(self) -> None:
+        if not self.booked:
+            return await self.register()
+        current = self.rng.choice(self.booked)
+        target = self.rng.choice(self.session_ids)
+        body = {"reason": "load test", "notes": "", "newSessionId": target}
+        name = "POST /students/session/{id}/reschedule"
+        resp = await self.rec.call(self.client, name, "POST", f"/students/session/{current}/reschedule", json=body)
+        if resp is not None:
+            self.booked = [target if sid == current else sid for sid in self.booked]
+
+    async def cancel(self) -> None:
+        if not self.booked:
+            return await self.register()
+        current = self.booked.pop(self.rng.randrange(len(self.booked)))
+        name = "POST /students/session/{id}/cancel"
+        await self.rec.call(self.client, name, "POST", f"/students/session/{current}/cancel", json={"reason": "load test"})
+
+    async def messaging(self) -> None:
+        if not self.conversations:
+            return await self.dashboard()
+        conv = self.rng.choice(self.conversations)
+        url = f"/messaging/conversations/{conv}/messages"
+        await self.rec.call(self.client, "GET /messaging/conversations/{id}/messages", "GET", url)
+        if self.rng.random() < 0.3:
+            content = " ".join(self.rng.choice(synth.WORDS) for _ in range(8))
+            name = "POST /messaging/conversations/{id}/messages"
+            await self.rec.call(self.client, name, "POST", url, data={"content": content})
+
+    async def run(self, deadline: float) -> None:
+        names = list(JOURNEYS)
+        weights = list(JOURNEYS.values())
+        try:
+            if not await self.login():
+                return
+            await self.dashboard()
+            while time.perf_counter() < deadline:
+                await getattr(self, self.rng.choices(names, weights)[0])()
+        finally:
+            await self.client.aclose()
+
+
+async def run_load(
+    base_url: str,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    students: int,
+    session_ids: List[str],
+    seed: int,
+) -> Dict[str, object]:
+    rec = Recorder()
+    rng = random.Random(seed)
+    users = []
+    for i in range(concurrency):
+        if students:
+            index = rng.randint(1, students)
+            email, password = synth.student_email(index), synth.SYNTH_PASSWORD
+        else:
+            email, password = h.DEMO_LOGIN["email"], h.DEMO_LOGIN["password"]
+        users.append(VirtualUser(base_url, email, password, rec, random.Random(seed + i), session_ids))
+
+    start = time.perf_counter()
+    deadline = start + warmup + duration
+    tasks = [asyncio.create_task(u.run(deadline)) for u in users]
+    await asyncio.sleep(warmup)
+    rec.recording = True
+    measured_from = time.perf_counter()
+    await asyncio.gather(*tasks)
+    seconds = time.perf_counter() - measured_from
+
+    endpoints = rec.report(seconds)
+    total = sum(e["count"] for e in endpoints.values())
+    return {"rps": round(total / seconds, 2), "seconds": round(seconds, 2), "endpoints": endpoints}
+
+
+def launch(args: argparse.Namespace) -> List[subprocess.Popen]:
+    token = "loadtest"
+    env = {**h.gateway_env(), "ADMIN_TOKEN": token}
+    procs = [h.start_service(name, env=env) for name in SERVICES]
+    for name in SERVICES:
+        h.wait_healthy(f"http://127.0.0.1:{h.PORTS[name]}/health")
+    procs.append(h.start_service("api-gateway", env=h.gateway_env()))
+    h.wait_healthy(f"http://127.0.0.1:{h.PORTS['api-gateway']}/health")
+    if args.students:
+        dataset = synth.generate(args.sessions, args.students, args.conversations, args.messages, args.seed)
+        urls = {name: f"http://127.0.0.1:{h.PORTS[name]}" for name in SERVICES}
+        asyncio.run(synth.load(dataset, token, urls=urls))
+    return procs
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=h.ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(current: Dict[str, object], baseline_path: str, threshold: float) -> bool:
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    ok = True
+    print(f"{'endpoint':<48}{'p95 base':>10}{'p95 now':>10}{'delta':>9}")
+    for name, now in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base or not base["p95_ms"]:
+            continue
+        delta = (now["p95_ms"] / base["p95_ms"] - 1) * 100
+        flag = "  REGRESSION" if delta > threshold else ""
+        ok = ok and not flag
+        print(f"{name:<48}{base['p95_ms']:>10}{now['p95_ms']:>10}{delta:>8.1f}%{flag}")
+    print(f"total rps: {baseline.get('rps')} -> {current['rps']}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:4000")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--students", type=int, default=0, help="synthetic students to log in as (0 = demo student)")
+    parser.add_argument("--sessions", type=int, default=90, help="catalog size (ids sess-1..N)")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--launch", action="store_true", help="start and seed services on the bench ports")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare p95s against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    procs: List[subprocess.Popen] = []
+    base_url = args.base_url
+    try:
+        if args.launch:
+            procs = launch(args)
+            base_url = f"http://127.0.0.1:{h.PORTS['api-gateway']}"
+        session_ids = [f"sess-{i}" for i in range(1, args.sessions + 1)]
+        result = asyncio.run(
+            run_load(base_url, args.concurrency, args.duration, args.warmup, args.students, session_ids, args.seed)
+        )
+    finally:
+        h.stop_all(procs)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {k: v for k, v in vars(args).items() if k not in {"out", "compare"}},
+        **result,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    if args.compare and not compare(report, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
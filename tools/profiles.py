@@ -0,0 +1,63 @@
+"""Aggregate the request profiles written with PROFILE_REQUESTS / PROFILE_SAMPLE_RATE.
+
+    # top functions across every dump
+    python tools/profiles.py
+
+    # only slow profile requests, by own time
+    python tools/profiles.py --match students-GET-profile --min-ms 200 --sort tottime
+
+Prints how many dumps there are per service and route with their latency,
+then the combined pstats table of the selected dumps.
+"""
+import argparse
+import glob
+import os
+import pstats
+import re
+import statistics
+import sys
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# <service>-<METHOD>-<route>-<ms>ms-<time_ns>.prof
+NAME = re.compile(r"^(?P<key>.+)-(?P<ms>\d+)ms-\d+\.prof$")
+
+
+def select(directory: str, match: str, min_ms: int) -> List[Tuple[str, str, int]]:
+    """(path, service-method-route, ms) of the dumps that pass the filters."""
+    out = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.prof"))):
+        m = NAME.match(os.path.basename(path))
+        if not m or match not in m.group("key") or int(m.group("ms")) < min_ms:
+            continue
+        out.append((path, m.group("key"), int(m.group("ms"))))
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dir", default=os.getenv("PROFILE_DIR", os.path.join(REPO_ROOT, "logs", "profiles")))
+    parser.add_argument("--match", default="", help="substring of <service>-<METHOD>-<route>")
+    parser.add_argument("--min-ms", type=int, default=0, help="skip requests faster than this")
+    parser.add_argument("--sort", default="cumulative", choices=["cumulative", "tottime", "ncalls"])
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    dumps = select(args.dir, args.match, args.min_ms)
+    if not dumps:
+        sys.exit(f"no profiles in {args.dir}")
+
+    by_route: Dict[str, List[int]] = {}
+    for _, key, ms in dumps:
+        by_route.setdefault(key, []).append(ms)
+    print(f"{'route':<50}{'dumps':>8}{'p50 ms':>10}{'max ms':>10}")
+    for key, times in sorted(by_route.items(), key=lambda kv: -len(kv[1])):
+        print(f"{key:<50}{len(times):>8}{statistics.median(times):>10.0f}{max(times):>10}")
+    print()
+
+    stats = pstats.Stats(*(path for path, _, _ in dumps))
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Deterministic synthetic catalog, population and message backlog for load tests.
+
+    # generate and push into services started with ADMIN_TOKEN=secret
+    ADMIN_TOKEN=secret python tools/synth.py --sessions 5000 --students 100000 \\
+        --conversations 2000 --messages 50 --load
+
+    # or just write the dataset out
+    python tools/synth.py --students 1000 --dump /tmp/synth.json
+
+The same --seed always yields the same dataset. Students are `syn-000001`...,
+log in as `syn000001@hcmut.edu.vn` / SYNTH_PASSWORD, and never collide with
+the hand-written demo data. Records are compact (booked session ids rather
+than full booking rows); each service's /admin/seed expands them into its own
+store format.
+
+Importable: `generate(...)` returns the dataset, `load(dataset, ...)` seeds it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+SYNTH_PASSWORD = "synth123"
+DAYS = ["MON", "TUE", "WED", "THU", "FRI", "SAT"]
+SLOTS = [("07:00", "09:00"), ("09:00", "11:00"), ("13:00", "15:00"), ("15:00", "17:00"), ("18:00", "20:00")]
+MODES = ["Online", "On campus"]
+MAJORS = ["Computer Science", "Computer Engineering", "Data Science", "Information Systems", "Undeclared"]
+WORDS = (
+    "lab quiz deadline exam review slides homework question answer project group meeting "
+    "tomorrow today room online link thanks please help graph tree sort heap proof bai tap "
+    "kiem tra lich hoc phong"
+).split()
+DEFAULT_URLS = {
+    "auth": os.getenv("AUTH_UPSTREAM", "http://localhost:4010"),
+    "students": os.getenv("STUDENTS_UPSTREAM", "http://localhost:4011"),
+    "users": os.getenv("USERS_UPSTREAM", "http://localhost:4015"),
+    "sessions": os.getenv("SESSIONS_UPSTREAM", "http://localhost:4016"),
+    "messages": os.getenv("MESSAGES_UPSTREAM", "http://localhost:4017"),
+}
+
+
+def student_id(index: int) -> str:
+    return f"syn-{index:06d}"
+
+
+def student_email(index: int) -> str:
+    return f"syn{index:06d}@hcmut.edu.vn"
+
+
+def generate_catalog(count: int, rng: random.Random) -> List[Dict[str, object]]:
+    """Sessions in the sessions service's catalog format, ~30 per course code."""
+    courses = max(1, count // 30)
+    tutors = max(1, count // 20)
+    sessions: List[Dict[str, object]] = []
+    for i in range(count):
+        course = i % courses
+        start, end = rng.choice(SLOTS)
+        sessions.append(
+            {
+                "id": f"sess-{i + 1}",
+                "code": f"SY{course:04d}",
+                "title": f"Synthetic Course {course}",
+                "tutor": f"Tutor {rng.randrange(tutors):04d}",
+                "mode": rng.choice(MODES),
+                "status": "SCHEDULED",
+                "start": start,
+                "end": end,
+                "rating": round(4.0 + rng.randrange(11) / 10, 1),
+                "dayOfWeek": rng.choice(DAYS),
+            }
+        )
+    return sessions
+
+
+def generate_students(
+    count: int,
+    session_ids: Sequence[str],
+    rng: random.Random,
+    bookings: Sequence[int] = (1, 5),
+    attended: Sequence[int] = (0, 4),
+) -> List[Dict[str, object]]:
+    students: List[Dict[str, object]] = []
+    for i in range(1, count + 1):
+        booked = rng.sample(session_ids, min(len(session_ids), rng.randint(*bookings)))
+        past = rng.sample(session_ids, min(len(session_ids), rng.randint(*attended)))
+        students.append(
+            {
+                "id": student_id(i),
+                "fullName": f"Synthetic Student {i}",
+                "email": student_email(i),
+                "studentId": f"9{i:06d}",
+                "major": rng.choice(MAJORS),
+                "preferences": rng.sample(MODES, rng.randint(1, len(MODES))),
+                "bookings": booked,
+                "attended": [[sid, rng.randint(1, 90)] for sid in past],
+            }
+        )
+    return students
+
+
+def generate_conversations(
+    count: int,
+    student_ids: Sequence[str],
+    rng: random.Random,
+    messages: int = 20,
+    members: Sequence[int] = (2, 30),
+) -> List[Dict[str, object]]:
+    conversations: List[Dict[str, object]] = []
+    for i in range(1, count + 1):
+        direct = rng.random() < 0.3
+        size = 1 if direct else rng.randint(*members)
+        people = rng.sample(student_ids, min(len(student_ids), size))
+        other = "support" if direct else f"tutor-{rng.randrange(max(1, count // 10))}"
+        backlog = []
+        for _ in range(messages):
+            sender = rng.choice(people + [other])
+            backlog.append(
+                {
+                    "senderId": sender,
+                    "displayName": sender,
+                    "role": "STUDENT" if sender.startswith("syn-") else "TUTOR",
+                    "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 16))),
+                }
+            )
+        conversations.append(
+            {
+                "id": f"{'direct' if direct else 'group'}-syn-{i}",
+                "title": f"Synthetic {'support' if direct else 'group'} {i}",
+                "type": "DIRECT" if direct else "GROUP",
+                "members": people + [other],
+                "messages": backlog,
+            }
+        )
+    return conversations
+
+
+def generate(
+    sessions: int = 90,
+    students: int = 1000,
+    conversations: int = 100,
+    messages: int = 20,
+    seed: int = 42,
+    bookings: Sequence[int] = (1, 5),
+) -> Dict[str, object]:
+    rng = random.Random(seed)
+    catalog = generate_catalog(sessions, rng)
+    people = generate_students(students, [str(s["id"]) for s in catalog], rng, bookings=bookings)
+    convs = generate_conversations(conversations, [str(p["id"]) for p in people], rng, messages=messages)
+    return {"seed": seed, "sessions": catalog, "students": people, "conversations": convs}
+
+
+def dumps(payload: object) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def batches(items: List[Dict[str, object]], size: int) -> List[List[Dict[str, object]]]:
+    return [items[i:i + size] for i in range(0, len(items), size)] or [[]]
+
+
+async def load(
+    dataset: Dict[str, object],
+    admin_token: str,
+    urls: Optional[Dict[str, str]] = None,
+    batch_size: int = 10000,
+    replace: bool = False,
+) -> Dict[str, float]:
+    """Seeds running services through their /admin/seed endpoints.
+
+    The catalog goes first: the students service refreshes its replica
+    from the sessions service before validating bookings. The remaining stores are loaded in parallel, one batch stream per service.
+    Returns seconds spent per service.
+    """
+    urls = {**DEFAULT_URLS, **(urls or {})}
+    headers = {"x-admin-token": admin_token, "content-type": "application/json"}
+    students: List[Dict[str, object]] = dataset["students"]  # type: ignore[assignment]
+    timings: Dict[str, float] = {}
+
+    async with httpx.AsyncClient(headers=headers, timeout=300.0) as client:
+
+        async def post(service: str, payloads: List[Dict[str, object]]) -> None:
+            start = time.perf_counter()
+            for payload in payloads:
+                resp = await client.post(f"{urls[service].rstrip('/')}/admin/seed", content=dumps(payload))
+                resp.raise_for_status()
+            timings[service] = round(time.perf_counter() - start, 3)
+
+        enrollments = {str(s["id"]): s["bookings"] for s in students}
+        await post("sessions", [{"sessions": dataset["sessions"], "enrollments": enrollments, "replace": replace}])
+
+        student_batches = batches(students, batch_size)
+        account_batches = [
+            [
+                {
+                    "id": s["id"],
+                    "email": s["email"],
+                    "password": SYNTH_PASSWORD,
+                    "role": "STUDENT",
+                    "name": s["fullName"],
+                    "major": s["major"],
+                }
+                for s in chunk
+            ]
+            for chunk in student_batches
+        ]
+        await asyncio.gather(
+            post(
+                "students",
+                [{"students": chunk, "replace": replace and i == 0} for i, chunk in enumerate(student_batches)],
+            ),
+            post("auth", [{"users": chunk} for chunk in account_batches]),
+            post("users", [{"users": chunk} for chunk in student_batches]),
+            post(
+                "messages",
+                [
+                    {"conversations": chunk, "replace": replace and i == 0}
+                    for i, chunk in enumerate(batches(dataset["conversations"], max(1, batch_size // 10)))
+                ],
+            ),
+        )
+    return timings
+
+
+def parse_range(value: str) -> List[int]:
+    low, _, high = value.partition("-")
+    return [int(low), int(high or low)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=90)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=20, help="messages per conversation")
+    parser.add_argument("--bookings", type=parse_range, default=[1, 5], help="bookings per student, e.g. 1-5")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dump", help="write the dataset to this JSON file")
+    parser.add_argument("--load", action="store_true", help="seed the running services")
+    parser.add_argument("--replace", action="store_true", help="drop existing data before loading")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--admin-token", default=os.getenv("ADMIN_TOKEN", ""))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset = generate(args.sessions, args.students, args.conversations, args.messages, args.seed, args.bookings)
+    print(f"[synth] generated {args.sessions} sessions, {args.students} students, "
+          f"{args.conversations} conversations in {time.perf_counter() - start:.2f}s")
+
+    if args.dump:
+        with open(args.dump, "wb") as fh:
+            fh.write(dumps(dataset))
+        print(f"[synth] wrote {args.dump}")
+    if args.load:
+        if not args.admin_token:
+            sys.exit("[synth] --load needs --admin-token or ADMIN_TOKEN (matching the services' ADMIN_TOKEN)")
+        start = time.perf_counter()
+        timings = asyncio.run(load(dataset, args.admin_token, batch_size=args.batch_size, replace=args.replace))
+        print(f"[synth] loaded in {time.perf_counter() - start:.2f}s {timings}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Per-request waterfalls from the JSON access logs of the gateway and services.
+
+    # one request, by the X-Request-ID the gateway returned
+    python tools/waterfall.py 3f9c0e...
+
+    # the 5 slowest gateway requests, optionally for one path
+    python tools/waterfall.py --slowest 5 --path /students/profile
+
+Services started with ACCESS_LOG=1 write logs/<service>.access.log (see
+common/tracing.py); lines sharing a request id are placed on one time axis,
+each service's request followed by its spans (handler, auth, serialize,
+upstream).
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WIDTH = 50
+
+Record = Dict[str, object]
+
+
+def load(directory: str) -> Dict[str, List[Record]]:
+    by_request: Dict[str, List[Record]] = {}
+    for path in glob.glob(os.path.join(directory, "*.access.log")):
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                by_request.setdefault(record["requestId"], []).append(record)
+    return by_request
+
+
+def bar(start_ms: float, duration_ms: float, total_ms: float) -> str:
+    scale = WIDTH / max(total_ms, 0.001)
+    left = min(WIDTH - 1, int(start_ms * scale))
+    length = max(1, int(round(duration_ms * scale)))
+    return " " * left + "#" * min(length, WIDTH - left)
+
+
+def render(request_id: str, records: List[Record]) -> None:
+    records = sorted(records, key=lambda r: r["ts"])
+    origin = records[0]["ts"]
+    total = max((r["ts"] - origin) * 1000 + r["durationMs"] for r in records)
+    print(f"request {request_id}  {total:.1f} ms")
+    for record in records:
+        offset = (record["ts"] - origin) * 1000
+        label = f"{record['service']} {record['method']} {record['path']} {record['status']}"
+        print(f"  {label[:46]:<46} {offset:>8.1f} {record['durationMs']:>8.1f}  |{bar(offset, record['durationMs'], total):<{WIDTH}}|")
+        for entry in sorted(record["spans"], key=lambda e: e["startMs"]):
+            extra = entry.get("target") or ""
+            label = f"  {entry['name']} {extra}".rstrip()
+            start = offset + entry["startMs"]
+            print(f"  {label[:46]:<46} {start:>8.1f} {entry['durationMs']:>8.1f}  |{bar(start, entry['durationMs'], total):<{WIDTH}}|")
+    print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("request_id", nargs="?")
+    parser.add_argument("--dir", default=os.getenv("ACCESS_LOG_DIR", os.path.join(REPO_ROOT, "logs")))
+    parser.add_argument("--slowest", type=int, default=5, help="without a request id: show the N slowest")
+    parser.add_argument("--path", default="", help="only gateway requests whose path starts with this")
+    args = parser.parse_args()
+
+    by_request = load(args.dir)
+    if args.request_id:
+        if args.request_id not in by_request:
+            sys.exit(f"request {args.request_id} not found in {args.dir}")
+        render(args.request_id, by_request[args.request_id])
+        return
+
+    roots = [
+        r
+        for records in by_request.values()
+        for r in records
+        if r["service"] == "gateway" and str(r["path"]).startswith(args.path)
+    ]
+    if not roots:
+        sys.exit(f"no gateway requests in {args.dir}")
+    print(f"{'':<2}{'':<46} {'start ms':>8} {'ms':>8}")
+    for root in sorted(roots, key=lambda r: -r["durationMs"])[: args.slowest]:
+        render(root["requestId"], by_request[root["requestId"]])
+
+
+if __name__ == "__main__":
+    main()